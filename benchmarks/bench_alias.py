@@ -0,0 +1,84 @@
+"""Benchmark loading configurations that alias one block many times.
+
+Compares a document referring to a block through YAML aliases with the
+same document where the block is repeated. Aliased blocks are parsed
+once and the resulting objects are shared.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_alias [num_refs]
+"""
+import sys
+import time
+import tracemalloc
+
+from hyperconf import ConfigDefs, HyperConfig
+
+SCHEMA = """
+limits:
+  cpu: float
+  memory: int
+  timeout:
+    type: int
+    default: 30
+
+probe:
+  path: str
+  period: int
+  limits: limits
+
+service:
+  image: str
+  replicas: int
+  probes:
+    type: probe
+    allow_many: True
+  limits: limits
+"""
+
+BLOCK = """
+  image: registry/app:1.0
+  replicas: 3
+  probes:
+    - live: {path: /live, period: 10, limits: {cpu: 0.1, memory: 64}}
+    - ready: {path: /ready, period: 5, limits: {cpu: 0.1, memory: 64}}
+  limits: {cpu: 2.0, memory: 4096}
+"""
+
+
+def document(num_refs: int, aliased: bool) -> str:
+    if aliased:
+        lines = ["template=service: &template" + BLOCK]
+        lines += [f"s{i}=service: *template" for i in range(num_refs)]
+    else:
+        lines = [f"s{i}=service:" + BLOCK for i in range(num_refs)]
+    return "\n".join(lines)
+
+
+def measure(text: str):
+    start = time.perf_counter()
+    config = HyperConfig.load_str(text)
+    load_time = time.perf_counter() - start
+
+    del config
+    tracemalloc.start()
+    config = HyperConfig.load_str(text)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Kept until the memory is measured.
+    del config
+    return load_time, memory
+
+
+def main(num_refs: int = 2000):
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(SCHEMA)
+    print(f"references: {num_refs}")
+    for label, aliased in [("repeated", False), ("aliased", True)]:
+        load_time, memory = measure(document(num_refs, aliased))
+        print(f"{label:<10} load {load_time * 1000:9.1f} ms  "
+              f"memory {memory / 2 ** 20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
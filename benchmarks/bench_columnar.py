@@ -0,0 +1,76 @@
+"""Benchmark columnar allow_many lists against lists of objects.
+
+Measures the construction time and memory of a list of small records
+stored as HyperConfig objects and as columns, and the time to read one
+option of all the records.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_columnar [num_records]
+"""
+import sys
+import time
+import tracemalloc
+
+from hyperconf import ConfigDefs, HyperConfig
+
+SCHEMA = """
+reading:
+  sensor: str
+  value: float
+  count: int
+
+series:
+  readings:
+    type: reading
+    allow_many: True
+    columnar: {columnar}
+"""
+
+
+def values(num_records: int) -> dict:
+    return {"series": {"readings": [
+        {"reading": {"sensor": f"s{i % 100}", "value": i * 0.5,
+                     "count": i}}
+        for i in range(num_records)]}}
+
+
+def measure(columnar: bool, num_records: int):
+    ConfigDefs.clear()
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(SCHEMA.format(columnar=columnar))
+    decls = values(num_records)
+    start = time.perf_counter()
+    config = HyperConfig(None, decls)
+    load_time = time.perf_counter() - start
+
+    # Tracing slows loading down, measure memory with a second load.
+    del config
+    decls = values(num_records)
+    tracemalloc.start()
+    config = HyperConfig(None, decls)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    readings = config.series.readings
+    start = time.perf_counter()
+    if columnar:
+        total = sum(readings.column("value"))
+    else:
+        total = sum(r.value for r in readings)
+    read_time = time.perf_counter() - start
+    assert total == sum(i * 0.5 for i in range(num_records))
+    return load_time, memory, read_time
+
+
+def main(num_records: int = 500000):
+    print(f"records: {num_records}")
+    for label, columnar in [("objects", False), ("columnar", True)]:
+        load_time, memory, read_time = measure(columnar, num_records)
+        print(f"{label:<10} load {load_time * 1000:9.1f} ms  "
+              f"memory {memory / 2 ** 20:8.1f} MiB  "
+              f"sum(value) {read_time * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,71 @@
+"""Benchmark constructing deeply nested and very wide configurations.
+
+Configurations are built from parsed values, YAML parsing is not
+measured. Depths that exceed the recursion limit of a recursive
+construction are reported as failing.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_deep [depth] [width]
+"""
+import sys
+import time
+
+from hyperconf import ConfigDefs, HyperConfig
+
+SCHEMA = """
+link:
+  value: int
+  next:
+    type: link
+    allow_many: True
+
+item:
+  value: int
+
+bag:
+  items:
+    type: item
+    allow_many: True
+"""
+
+
+def chain(depth: int) -> dict:
+    """Return a 'link' declaration nested depth levels deep."""
+    decl = {"value": depth, "next": []}
+    for i in range(depth - 1, 0, -1):
+        decl = {"value": i, "next": [{"link": decl}]}
+    return {"chain=link": decl}
+
+
+def bag(width: int) -> dict:
+    """Return a 'bag' declaration with width items."""
+    return {"bag": {"items": [{"item": {"value": i}}
+                              for i in range(width)]}}
+
+
+def timed(make_values, runs: int = 3) -> str:
+    """Return the mean construction time or 'fails'."""
+    total = 0.0
+    for _ in range(runs):
+        values = make_values()
+        start = time.perf_counter()
+        try:
+            HyperConfig(None, values)
+        except RecursionError:
+            return "fails (RecursionError)"
+        total += time.perf_counter() - start
+    return f"{total / runs * 1000:10.1f} ms"
+
+
+def main(depth: int = 5000, width: int = 1000000):
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(SCHEMA)
+
+    for levels in sorted({100, 250, 1000, depth}):
+        print(f"depth {levels:>8}: {timed(lambda: chain(levels))}")
+    print(f"width {width:>8}: {timed(lambda: bag(width), runs=1)}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,52 @@
+"""Benchmark HyperConfig.diff on large configurations.
+
+Each ship object has six options, so a configuration of n ships has
+about 7 * n nodes. Separate loads are compared once their content hashes
+are computed, which is timed apart: hashing is proportional to the size
+of a configuration and done once, diff then only visits the objects on
+the changed paths. Run from the repository root with:
+
+    python -m benchmarks.bench_diff [num_ships]
+"""
+import sys
+import time
+
+import yaml
+
+from hyperconf import HyperConfig
+
+
+def ship(i: int) -> dict:
+    return {"captain": f"Captain {i}", "crew": 100 + i, "class": "galaxy",
+            "color": "gray", "shields": 1.0, "engines": 100 + i % 900}
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<36}{(time.perf_counter() - start) * 1000:10.3f} ms")
+    return result
+
+
+def main(num_ships: int = 150000):
+    text = yaml.safe_dump({"use": "tests/ships",
+                           **{f"s{i}=ship": ship(i)
+                              for i in range(num_ships)}})
+    base = timed("load", lambda: HyperConfig.load_str(text))
+    other = HyperConfig.load_str(text.replace("Captain 7\n", "Kirk\n"))
+    variant = HyperConfig.overlay(base, {"s7": {"crew": 1}})
+    print(f"nodes: {num_ships * 7}")
+
+    diff = timed("diff overlay (shared nodes)",
+                 lambda: HyperConfig.diff(base, variant))
+    assert diff.changed == [("s7", "crew")]
+    timed("content hashes of both loads",
+          lambda: (base.content_hash, other.content_hash))
+    diff = timed("diff separate loads",
+                 lambda: HyperConfig.diff(base, other))
+    assert diff.changed == [("s7", "captain")]
+    timed("reference: base == other", lambda: base == other)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
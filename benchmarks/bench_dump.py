@@ -0,0 +1,55 @@
+"""Benchmark dumping HyperConfig trees.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_dump [num_ships]
+"""
+import io
+import sys
+import time
+
+import yaml
+
+from hyperconf import HyperConfig
+
+
+def ship(i: int) -> dict:
+    return {"captain": f"Captain {i}", "crew": 100 + i, "class": "galaxy",
+            "color": "gray", "shields": 1.0, "engines": 100 + i % 900}
+
+
+def by_hand(value):
+    """Generic recursive conversion, the reference."""
+    if isinstance(value, dict):
+        return {k: by_hand(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [by_hand(v) for v in value]
+    return value
+
+
+def timed(label: str, func, runs: int = 3):
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"{label:<28}{elapsed * 1000:10.3f} ms")
+
+
+def main(num_ships: int = 5000):
+    text = yaml.safe_dump({"use": "tests/ships",
+                           **{f"s{i}=ship": ship(i)
+                              for i in range(num_ships)}})
+    config = HyperConfig.load_str(text)
+
+    print(f"ships: {num_ships}")
+    timed("to_dict by hand", lambda: by_hand(config))
+    timed("to_dict", lambda: config.to_dict())
+    timed("to_dict(typed=True)", lambda: config.to_dict(typed=True))
+    timed("yaml.safe_dump by hand",
+          lambda: yaml.safe_dump(by_hand(config), io.StringIO()))
+    timed("dump_yaml", lambda: config.dump_yaml(io.StringIO()))
+    timed("dump_json", lambda: config.dump_json(io.StringIO()))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,91 @@
+"""Benchmark reading a configuration while it is reloaded.
+
+Compares readers of a ConfigHandle, which do not lock, against readers
+that lock a mutable configuration shared with the reloading thread.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_handle [num_readers] [seconds]
+"""
+import sys
+import threading
+import time
+
+import yaml
+
+from hyperconf import ConfigHandle, HyperConfig
+
+
+def ship(i: int) -> dict:
+    return {"captain": f"Captain {i}", "crew": 100 + i, "class": "galaxy",
+            "color": "gray", "shields": 1.0, "engines": 100 + i % 900}
+
+
+def run(read, reload, num_readers: int, seconds: float):
+    """Return the reads and reloads per second."""
+    done = threading.Event()
+    counts = [0] * num_readers
+    reloads = [0]
+
+    def reader(n):
+        count = 0
+        while not done.is_set():
+            read()
+            count += 1
+        counts[n] = count
+
+    def writer():
+        while not done.is_set():
+            reload(reloads[0])
+            reloads[0] += 1
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=reader, args=(n,))
+               for n in range(num_readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    done.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, reloads[0] / seconds
+
+
+def main(num_readers: int = 4, seconds: float = 2.0):
+    text = yaml.safe_dump({"use": "tests/ships",
+                           **{f"s{i}=ship": ship(i) for i in range(100)}})
+
+    # Reference: every read and reload holds a lock.
+    lock = threading.Lock()
+    shared = HyperConfig.load_str(text)
+
+    def locked_read():
+        with lock:
+            return shared.s1.crew + shared.s2.engines
+
+    def locked_reload(n):
+        new = HyperConfig.overlay(shared, {"s1": {"crew": n + 1}})
+        with lock:
+            dict.__setitem__(shared, "s1", new.s1)
+
+    handle = ConfigHandle(HyperConfig.load_str(text))
+
+    def handle_read():
+        config = handle.config
+        return config.s1.crew + config.s2.engines
+
+    def handle_reload(n):
+        handle.overlay({"s1": {"crew": n + 1}})
+
+    print(f"readers: {num_readers}")
+    for label, read, reload in [("locked", locked_read, locked_reload),
+                                ("ConfigHandle", handle_read,
+                                 handle_reload)]:
+        reads, reloads = run(read, reload, num_readers, seconds)
+        print(f"{label:<14} {reads:12,.0f} reads/s {reloads:8,.0f} reloads/s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]],
+         *[float(a) for a in sys.argv[2:3]])
@@ -0,0 +1,75 @@
+"""Benchmark configuration files sharing a large block of values.
+
+Loads num_files configuration files that declare the same pool
+settings, copied in every file or included from a fragment file, which
+is parsed and validated once.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_include [num_files] [num_pools]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from hyperconf import ConfigDefs, HyperConfig
+
+SCHEMA = """
+pool:
+  size: pos_int
+  timeout: float
+  name: str
+
+pools:
+  entries:
+    type: pool
+    allow_many: True
+
+app:
+  name: str
+  pools: pools
+"""
+
+
+def pools_yaml(num_pools: int, indent: str) -> str:
+    lines = [f"{indent}entries:"]
+    for i in range(num_pools):
+        lines.append(f"{indent}  - p{i}: {{size: {i + 1}, "
+                     f"timeout: 2.5, name: pool{i}}}")
+    return "\n".join(lines) + "\n"
+
+
+def main(num_files: int = 200, num_pools: int = 200):
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        os.chdir(root)
+        try:
+            (root / "pools.yaml").write_text(pools_yaml(num_pools, ""))
+            for i in range(num_files):
+                (root / f"copy{i}.yaml").write_text(
+                    f"service=app:\n  name: s{i}\n  pools:\n" +
+                    pools_yaml(num_pools, "    "))
+                (root / f"include{i}.yaml").write_text(
+                    f"service=app:\n  name: s{i}\n"
+                    "  pools: {include: pools}\n")
+            print(f"files: {num_files}, pools: {num_pools}")
+            for label in ["copy", "include"]:
+                ConfigDefs.clear()
+                ConfigDefs.load_builtins()
+                ConfigDefs.parse_str(SCHEMA)
+                start = time.perf_counter()
+                configs = [HyperConfig.load_yaml(f"{label}{i}.yaml")
+                           for i in range(num_files)]
+                elapsed = time.perf_counter() - start
+                assert configs[-1].service.pools.entries[-1].size ==\
+                    num_pools
+                print(f"{label:<8} {elapsed * 1000:9.1f} ms")
+        finally:
+            os.chdir(previous)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,63 @@
+"""Benchmark HyperDef.infer_type on wide objects.
+
+Compares the cached, dict based lookup against the previous
+implementation that matched the tag and scanned all options of the
+parent definition on every call.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_infer_type [num_options] [num_objects]
+"""
+import sys
+import timeit
+
+from hyperconf import HyperConfig
+from hyperconf.dsl import ConfigDefs, HyperDef, _id_synth
+
+
+def legacy_infer_type(decl_tag, decl=None, hdef=None):
+    """infer_type before caching, kept for comparison."""
+    ident, htype = _id_synth.match(decl_tag).groups()
+    if not htype and ConfigDefs.contains(ident):
+        htype = ident
+    if not htype and hdef:
+        opt = [o for o_name, o in hdef.options.items() if o.name == ident]
+        if opt:
+            htype = opt[0].typename
+    if not htype:
+        htype = decl.__class__.__name__
+    return ident, ConfigDefs.get(htype) if htype else None
+
+
+def main(num_options: int = 500, num_objects: int = 20):
+    ConfigDefs.load_builtins()
+    schema = ["wide:"] + [f"  opt{i}: int" for i in range(num_options)]
+    ConfigDefs.parse_str("\n".join(schema))
+    wide = ConfigDefs.get("wide")
+    tags = [f"opt{i}" for i in range(num_options)]
+
+    def run(infer):
+        for tag in tags:
+            infer(tag, 1, wide)
+
+    rounds = 5
+    legacy = min(timeit.repeat(lambda: run(legacy_infer_type),
+                               number=num_objects, repeat=rounds))
+    cached = min(timeit.repeat(lambda: run(HyperDef.infer_type),
+                               number=num_objects, repeat=rounds))
+    print(f"options: {num_options}, objects: {num_objects}")
+    print(f"legacy infer_type: {legacy * 1000:8.2f} ms")
+    print(f"cached infer_type: {cached * 1000:8.2f} ms "
+          f"({legacy / cached:.1f}x faster)")
+
+    config = "\n".join(
+        [f"w{n}=wide:\n" + "\n".join(f"  opt{i}: {i}"
+                                     for i in range(num_options))
+         for n in range(num_objects)])
+    load = min(timeit.repeat(lambda: HyperConfig.load_str(config),
+                             number=1, repeat=rounds))
+    print(f"load_str of {num_objects} wide objects: {load * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,69 @@
+"""Benchmark HyperMap.instantiate against hand-written construction.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_instantiate [num_objects]
+"""
+import sys
+import timeit
+
+from hyperconf import HyperConfig, HyperMap
+from hyperconf.dsl import ConfigDefs
+
+SCHEMA = """
+point:
+  px: int
+  py: int
+  label: str
+
+path:
+  name: str
+  points:
+    type: point
+    allow_many: True
+"""
+
+
+class Point:
+    def __init__(self, px, py, label):
+        self.px = px
+        self.py = py
+        self.label = label
+
+
+class Path:
+    def __init__(self, name, points):
+        self.name = name
+        self.points = points
+
+
+def by_hand(config):
+    """Typical consumer code building the object graph."""
+    return Path(config.path.name,
+                [Point(p.px, p.py, p.label) for p in config.path.points])
+
+
+def main(num_objects: int = 10000):
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(SCHEMA)
+    HyperMap.register("point", Point)
+    HyperMap.register("path", Path)
+
+    lines = ["path:", "  name: p", "  points:"]
+    for i in range(num_objects):
+        lines.append(f"    - point: {{px: {i}, py: {i}, label: p{i}}}")
+    config = HyperConfig.load_str("\n".join(lines))
+
+    rounds = 10
+    hand = min(timeit.repeat(lambda: by_hand(config),
+                             number=1, repeat=rounds))
+    mapped = min(timeit.repeat(lambda: HyperMap.instantiate(config),
+                               number=1, repeat=rounds))
+    print(f"objects:      {num_objects}")
+    print(f"hand-written: {hand * 1000:8.2f} ms")
+    print(f"instantiate:  {mapped * 1000:8.2f} ms "
+          f"({mapped / hand:.2f}x)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
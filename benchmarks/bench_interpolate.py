@@ -0,0 +1,66 @@
+"""Benchmark interpolating derived values.
+
+Compares URLs built by the consumer after loading, as before `${path}`
+references were supported, with values interpolated when the
+configuration is loaded and with lazy interpolation, where only the
+values that are read are interpolated.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_interpolate [num_services] [num_read]
+"""
+import sys
+import time
+
+from hyperconf import ConfigDefs, HyperConfig
+
+SCHEMA = """
+service:
+  host: str
+  port: int
+  url: str
+"""
+
+
+def values(num_services: int, url: str) -> dict:
+    return {f"s{i}=service": {"host": f"host{i}.example.com",
+                              "port": 8000 + i,
+                              "url": url.format(i=i)}
+            for i in range(num_services)}
+
+
+def measure(label: str, num_services: int, num_read: int):
+    ConfigDefs.clear()
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(SCHEMA)
+    if label == "after load":
+        decls = values(num_services, "")
+    else:
+        decls = values(num_services,
+                       "https://${{s{i}.host}}:${{s{i}.port}}/api")
+    start = time.perf_counter()
+    config = HyperConfig(None, decls, lazy=label == "lazy",
+                         interpolate=label != "after load")
+    if label == "after load":
+        for service in config.values():
+            service["url"] = f"https://{service.host}:{service.port}/api"
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    urls = [config[f"s{i}"].url for i in range(num_read)]
+    read_time = time.perf_counter() - start
+    assert urls[-1] == f"https://host{num_read - 1}.example.com:" \
+        f"{8000 + num_read - 1}/api"
+    return load_time, read_time
+
+
+def main(num_services: int = 20000, num_read: int = 100):
+    print(f"services: {num_services}, read: {num_read}")
+    for label in ["after load", "eager", "lazy"]:
+        load_time, read_time = measure(label, num_services, num_read)
+        print(f"{label:<10} load {load_time * 1000:9.1f} ms  "
+              f"read {read_time * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
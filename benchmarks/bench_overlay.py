@@ -0,0 +1,53 @@
+"""Benchmark HyperConfig.overlay against reloading merged configs.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_overlay [num_ships] [num_variants]
+"""
+import sys
+import time
+
+import yaml
+
+from hyperconf import HyperConfig
+
+
+def ship(i: int) -> dict:
+    return {"captain": f"Captain {i}", "crew": 100 + i, "class": "galaxy",
+            "color": "gray", "shields": 1.0, "engines": 100 + i % 900}
+
+
+def main(num_ships: int = 1000, num_variants: int = 200):
+    base_values = {f"s{i}=ship": ship(i) for i in range(num_ships)}
+    base_text = yaml.safe_dump({"use": "tests/ships", **base_values})
+    base = HyperConfig.load_str(base_text)
+    overlays = [{f"s{v % num_ships}": {"crew": 5 + v, "color": "red"},
+                 f"s{(v * 7) % num_ships}": {"engines": 200}}
+                for v in range(num_variants)]
+
+    start = time.perf_counter()
+    variants = [HyperConfig.overlay(base, o) for o in overlays]
+    overlay_time = time.perf_counter() - start
+    assert len(variants) == num_variants
+
+    # Reference: merge raw YAML values and load each variant in full.
+    full_runs = min(num_variants, 5)
+    start = time.perf_counter()
+    for overlay in overlays[:full_runs]:
+        merged = {k: dict(v) for k, v in base_values.items()}
+        for key, override in overlay.items():
+            merged[f"{key}=ship"].update(override)
+        HyperConfig.load_str(yaml.safe_dump({"use": "tests/ships",
+                                             **merged}))
+    full_time = (time.perf_counter() - start) / full_runs
+
+    print(f"ships: {num_ships}, variants: {num_variants}")
+    print(f"full reload per variant: {full_time * 1000:10.3f} ms")
+    print(f"overlay per variant:     "
+          f"{overlay_time / num_variants * 1000:10.3f} ms")
+    print(f"{num_variants} variants: overlay {overlay_time:.3f} s, "
+          f"full reload (estimated) {full_time * num_variants:.3f} s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
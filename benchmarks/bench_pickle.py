@@ -0,0 +1,77 @@
+"""Benchmark pickling HyperConfig trees.
+
+Compares HyperConfig.__reduce__ against the default pickling of dict
+subclasses, which also pickles the definitions of every node.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_pickle [num_ships]
+"""
+import copyreg
+import io
+import pickle
+import sys
+import time
+
+import yaml
+
+from hyperconf import HyperConfig
+
+
+def ship(i: int) -> dict:
+    return {"captain": f"Captain {i}", "crew": 100 + i, "class": "galaxy",
+            "color": "gray", "shields": 1.0, "engines": 100 + i % 900}
+
+
+class DefaultPickler(pickle.Pickler):
+    """Pickle HyperConfig objects like any other dict subclass."""
+
+    def reducer_override(self, obj):
+        if type(obj) is HyperConfig:
+            return (copyreg._reconstructor, (HyperConfig, dict, dict(obj)),
+                    obj.__dict__)
+        return NotImplemented
+
+
+def default_dumps(obj) -> bytes:
+    out = io.BytesIO()
+    DefaultPickler(out, pickle.HIGHEST_PROTOCOL).dump(obj)
+    return out.getvalue()
+
+
+def timed(func, runs: int = 5):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = func()
+    return result, (time.perf_counter() - start) / runs
+
+
+def main(num_ships: int = 5000):
+    text = yaml.safe_dump({"use": "tests/ships",
+                           **{f"s{i}=ship": ship(i)
+                              for i in range(num_ships)}})
+    config = HyperConfig.load_str(text)
+
+    print(f"ships: {num_ships}")
+    for label, dumps in [
+            ("default", default_dumps),
+            ("__reduce__", lambda c: pickle.dumps(c, pickle.HIGHEST_PROTOCOL))]:
+        try:
+            payload, dump_time = timed(lambda: dumps(config))
+        except (pickle.PicklingError, AttributeError):
+            # Compiled validators of the definitions cannot be pickled.
+            print(f"{label:<12} dumps fails")
+            continue
+        try:
+            restored, load_time = timed(lambda: pickle.loads(payload))
+            assert restored == config
+            loads = f"{load_time * 1000:8.2f} ms"
+        except RecursionError:
+            # __getattr__ recurses before the node attributes are set.
+            loads = "fails"
+        print(f"{label:<12} {len(payload) / 1024:10.1f} KiB  "
+              f"dumps {dump_time * 1000:8.2f} ms  loads {loads}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
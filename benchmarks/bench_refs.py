@@ -0,0 +1,72 @@
+"""Benchmark resolving references between top level objects.
+
+Compares 'ref[fleet]' options, linked when the configuration is loaded,
+with identifiers stored as strings and resolved by scanning the
+configuration, as consumers did before references were supported.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_refs [num_ships] [num_fleets]
+"""
+import sys
+import time
+
+from hyperconf import ConfigDefs, HyperConfig
+
+SCHEMA = """
+fleet:
+  name: str
+
+ship:
+  captain: str
+  fleet: {fleet_type}
+"""
+
+
+def values(num_ships: int, num_fleets: int) -> dict:
+    decls = {f"f{i}=fleet": {"name": f"Fleet {i}"}
+             for i in range(num_fleets)}
+    decls.update({f"s{i}=ship": {"captain": f"Captain {i}",
+                                 "fleet": f"f{i % num_fleets}"}
+                  for i in range(num_ships)})
+    return decls
+
+
+def scan(config: HyperConfig, ident: str) -> HyperConfig:
+    for key, val in config.items():
+        if key == ident:
+            return val
+    raise KeyError(ident)
+
+
+def measure(fleet_type: str, num_ships: int, num_fleets: int):
+    ConfigDefs.clear()
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(SCHEMA.format(fleet_type=fleet_type))
+    decls = values(num_ships, num_fleets)
+    start = time.perf_counter()
+    config = HyperConfig(None, decls)
+    load_time = time.perf_counter() - start
+
+    ships = config.find_by_type("ship")
+    start = time.perf_counter()
+    if fleet_type == "str":
+        names = [scan(config, ship.fleet).name for ship in ships]
+    else:
+        names = [ship.fleet.name for ship in ships]
+    resolve_time = time.perf_counter() - start
+    assert len(names) == num_ships
+    return load_time, resolve_time
+
+
+def main(num_ships: int = 20000, num_fleets: int = 500):
+    print(f"ships: {num_ships}, fleets: {num_fleets}")
+    for label, fleet_type in [("scanning", "str"), ("ref", "ref[fleet]")]:
+        load_time, resolve_time = measure(fleet_type, num_ships,
+                                          num_fleets)
+        print(f"{label:<10} load {load_time * 1000:9.1f} ms  "
+              f"resolve all {resolve_time * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
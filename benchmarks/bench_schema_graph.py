@@ -0,0 +1,76 @@
+"""Benchmark loading a library of schema files that use each other.
+
+Generates num_files schema files, each one using up to three of the
+previous files, and a file using all of them. The library is loaded one
+file at a time, as without an executor, and with the files parsed ahead
+by a thread pool and by a process pool. The pools are started before
+timing.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_schema_graph [num_files] [num_workers]
+"""
+import concurrent.futures
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from hyperconf import ConfigDefs
+
+
+def generate(root: Path, num_files: int, types_per_file: int = 12):
+    rand = random.Random(1)
+    for i in range(num_files):
+        deps = sorted(rand.sample(range(i), min(i, 3)))
+        lines = []
+        if deps:
+            lines.append("use: [" + ", ".join(f"s{d}" for d in deps) + "]")
+        for j in range(types_per_file):
+            lines.append(f"t{i}_{j}:")
+            for k in range(8):
+                lines.append(f"  o{k}:\n    type: int\n    default: {k}\n"
+                             "    validator: 'int(hval) >= 0'")
+            if deps:
+                lines.append(f"  ref: t{deps[0]}_{j}")
+        (root / f"s{i}.yaml").write_text("\n".join(lines) + "\n")
+    (root / "all.yaml").write_text(
+        "use: [" + ", ".join(f"s{i}" for i in range(num_files)) + "]\n")
+
+
+def measure(executor) -> float:
+    ConfigDefs.clear()
+    ConfigDefs.load_builtins()
+    ConfigDefs.set_executor(executor)
+    try:
+        start = time.perf_counter()
+        ConfigDefs.parse_yaml("all")
+        return time.perf_counter() - start
+    finally:
+        ConfigDefs.set_executor(None)
+
+
+def main(num_files: int = 300, num_workers: int = os.cpu_count()):
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(Path(tmp), num_files)
+        os.chdir(tmp)
+        try:
+            print(f"files: {num_files}, workers: {num_workers}, "
+                  f"cpus: {os.cpu_count()}")
+            print(f"{'sequential':<10} {measure(None) * 1000:9.1f} ms")
+            for label, pool in [
+                    ("threads", concurrent.futures.ThreadPoolExecutor),
+                    ("processes", concurrent.futures.ProcessPoolExecutor)]:
+                with pool(num_workers) as executor:
+                    # Start the workers.
+                    list(executor.map(abs, range(num_workers)))
+                    print(f"{label:<10} {measure(executor) * 1000:9.1f} ms")
+        finally:
+            os.chdir(previous)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,42 @@
+"""Benchmark loading a single declaration from a large config file.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_selective_load [num_declarations] [--full]
+
+Loading the whole file is only timed with --full since it takes much
+longer than loading one declaration.
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from hyperconf import HyperConfig
+
+
+def main(num_declarations: int = 100000, full: bool = False):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "big.yaml"
+        with open(path, "w") as f:
+            f.write(f"use: {Path('tests/test_defs.yaml').absolute()}\n")
+            for i in range(num_declarations):
+                f.write(f"t{i}=train: {{num_epoch: {i}, "
+                        "learning_rate: 0.1}\n")
+
+        start = time.perf_counter()
+        config = HyperConfig.load_yaml(path, only=["t500"])
+        selected = time.perf_counter() - start
+        assert config.t500.num_epoch == 500
+        print(f"declarations: {num_declarations}")
+        print(f"load only one key: {selected:8.3f} s")
+
+        if full:
+            start = time.perf_counter()
+            HyperConfig.load_yaml(path)
+            print(f"load all keys:     {time.perf_counter() - start:8.3f} s")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--full"]
+    main(*[int(a) for a in args], full="--full" in sys.argv)
@@ -0,0 +1,61 @@
+"""Benchmark validating a file with and without a validation server.
+
+Runs the hyperconf command in a new process for every validation, like
+an editor or a pre-commit hook does, first validating in process and
+then through a server started for the benchmark.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_server [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+from hyperconf import client
+
+
+def ship(i: int) -> dict:
+    return {"captain": f"Captain {i}", "crew": 100 + i, "class": "galaxy",
+            "color": "gray", "shields": 1.0, "engines": 100 + i % 900}
+
+
+def timed(command, runs: int) -> float:
+    """Return the mean run time of command."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        subprocess.run(command, check=True)
+    return (time.perf_counter() - start) / runs
+
+
+def main(runs: int = 20):
+    with tempfile.TemporaryDirectory() as tmp:
+        config = os.path.join(tmp, "fleet.yaml")
+        with open(config, "w") as out:
+            yaml.safe_dump({"use": "tests/ships",
+                            **{f"s{i}=ship": ship(i) for i in range(20)}},
+                           out)
+        socket_path = os.path.join(tmp, "hyperconf.sock")
+        command = [sys.executable, "-m", "hyperconf", "--socket",
+                   socket_path, "validate", config]
+
+        print(f"in process {timed(command, runs) * 1000:8.1f} ms")
+        server = subprocess.Popen([sys.executable, "-m", "hyperconf",
+                                   "--socket", socket_path, "serve"])
+        try:
+            while not client.ping(socket_path):
+                time.sleep(0.05)
+            # The first validation loads the schemas into the server.
+            subprocess.run(command, check=True)
+            print(f"server     {timed(command, runs) * 1000:8.1f} ms")
+        finally:
+            client.send({"op": "shutdown"}, socket_path)
+            server.wait()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
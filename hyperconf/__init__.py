@@ -1,7 +1,33 @@
-"""Package exports."""
+"""Package exports.
 
-from hyperconf.dsl import ConfigDefs
-from hyperconf.config import HyperConfig
-from hyperconf.mapping import HyperMap, hypermap
+The exports are imported when first used, so that the command line
+client can start without loading the schema machinery.
+"""
+import importlib
 
-__all__ = ["ConfigDefs", "HyperConfig", "HyperMap", "hypermap"]
+_EXPORTS = {
+    "ConfigDefs": "hyperconf.dsl",
+    "ConfigHandle": "hyperconf.handle",
+    "HyperConfig": "hyperconf.config",
+    "HyperMap": "hyperconf.mapping",
+    "hypermap": "hyperconf.mapping",
+}
+
+__all__ = ["ConfigDefs", "ConfigHandle", "HyperConfig", "HyperMap",
+           "hypermap"]
+
+
+def __getattr__(name: str):
+    """Import an export when it is first used."""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute "
+                             f"{name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the exports with the module attributes."""
+    return sorted(set(globals()) | set(__all__))
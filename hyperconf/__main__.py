@@ -0,0 +1,6 @@
+"""Run the hyperconf command, see :mod:`hyperconf.cli`."""
+import sys
+
+from hyperconf.cli import main
+
+sys.exit(main())
@@ -0,0 +1,91 @@
+"""Bounded caches used by the definition registry and configurations."""
+import threading
+import typing as t
+from collections import OrderedDict
+
+_missing = object()
+
+
+class ValueCache:
+    """Least recently used cache of validation and conversion results.
+
+    Entries are keyed by (kind, definition, value type, value). Only
+    values of the scalar types in :attr:`scalar_types` are cached, other
+    values bypass the cache.
+    """
+
+    scalar_types = frozenset([str, int, float, bool, bytes, type(None)])
+
+    def __init__(self, maxsize: int = 4096):
+        """Initialize an empty cache.
+
+        :param maxsize: maximum number of cached entries.
+        """
+        if maxsize is None or maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def cacheable(self, value) -> bool:
+        """Check if a value can be used as a cache key."""
+        return type(value) in ValueCache.scalar_types
+
+    def get(self, key: t.Tuple, default=None):
+        """Look up a key.
+
+        :param key: the cache key.
+        :param default: the value returned for unknown keys.
+        :return: the cached value or default.
+        """
+        with self._lock:
+            value = self._entries.get(key, _missing)
+            if value is _missing:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: t.Tuple, value):
+        """Store a value, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class FragmentCache(ValueCache):
+    """Least recently used cache of included configuration fragments.
+
+    Entries are keyed by (namespace, path, file stamp, definition,
+    strict) and hold the frozen objects parsed from the files, see
+    :meth:`HyperConfig.fragment_cache`.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """Initialize an empty cache.
+
+        :param maxsize: maximum number of cached fragments.
+        """
+        super().__init__(maxsize)
@@ -0,0 +1,110 @@
+"""The hyperconf command.
+
+``hyperconf serve`` runs a validation server, see
+:mod:`hyperconf.server`. ``hyperconf validate`` sends the files to the
+server if it is running and validates them in process otherwise, so it
+can be used from editors and pre-commit hooks either way::
+
+    hyperconf serve &
+    hyperconf validate app.yaml deploy/*.yaml
+    hyperconf stop
+
+Errors are printed as ``file:line: type: message``, the line is
+omitted if it is not known. The exit status is 0 if all the
+configurations are valid and 1 otherwise.
+"""
+import argparse
+import os
+import sys
+import typing as t
+
+from hyperconf import client
+
+
+def main(argv: t.List[str] = None) -> int:
+    """Run the command with argv, sys.argv by default.
+
+    :return: the exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="hyperconf", description="Validate configuration files.")
+    parser.add_argument("--socket", default=None,
+                        help="the server socket path, see "
+                        "HYPERCONF_SOCKET.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run a validation server.")
+    commands.add_parser("stop", help="stop the validation server.")
+    validate = commands.add_parser("validate",
+                                   help="validate configuration files.")
+    validate.add_argument("files", nargs="+",
+                          help="the files to validate, - for stdin.")
+    validate.add_argument("--no-server", action="store_true",
+                          help="validate in process, without a server.")
+    validate.add_argument("--interpolate", action="store_true",
+                          help="interpolate ${path} references.")
+    args = parser.parse_args(argv)
+    socket_path = args.socket or client.default_socket_path()
+
+    if args.command == "serve":
+        return _serve(socket_path)
+    if args.command == "stop":
+        if client.send({"op": "shutdown"}, socket_path) is None:
+            print(f"No server is listening on {socket_path}.",
+                  file=sys.stderr)
+            return 1
+        return 0
+    return _validate(args.files, None if args.no_server else socket_path,
+                     args.interpolate)
+
+
+def _serve(socket_path: str) -> int:
+    """Serve requests until the server is stopped."""
+    from hyperconf.server import ValidationServer
+
+    try:
+        server = ValidationServer(socket_path)
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def _validate(files: t.List[str], socket_path: t.Optional[str],
+              interpolate: bool = False) -> int:
+    """Validate files, through the server at socket_path if any."""
+    status = 0
+    cwd = os.getcwd()
+    for fname in files:
+        request = {"op": "validate", "cwd": cwd}
+        if interpolate:
+            request["interpolate"] = True
+        if fname == "-":
+            request["text"] = sys.stdin.read()
+        else:
+            request["path"] = fname
+        response = None
+        if socket_path is not None:
+            response = client.send(request, socket_path)
+        if response is None:
+            from hyperconf import server
+
+            response = server.validate(request.get("path"),
+                                       request.get("text"),
+                                       interpolate=interpolate)
+        if not response["ok"]:
+            status = 1
+            error = response["error"]
+            location = error["file"] or fname
+            if error["line"]:
+                location += f":{error['line']}"
+            print(f"{location}: {error['type']}: {error['message']}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
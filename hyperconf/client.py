@@ -0,0 +1,55 @@
+"""Send requests to a validation server.
+
+This module only uses the standard library, so that clients start
+without loading the schema machinery. See :mod:`hyperconf.server` for
+the protocol.
+"""
+import json
+import os
+import socket
+import tempfile
+import typing as t
+
+
+def default_socket_path() -> str:
+    """Return the socket path used when none is given.
+
+    The HYPERCONF_SOCKET environment variable overrides the default
+    path, a per-user file in the runtime or temporary directory.
+    """
+    path = os.environ.get("HYPERCONF_SOCKET")
+    if path:
+        return path
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"hyperconf-{os.getuid()}.sock")
+
+
+def send(request: dict, socket_path: str = None,
+         timeout: float = 30.0) -> t.Optional[dict]:
+    """Send a request to a server.
+
+    :param request: the request, see :mod:`hyperconf.server`.
+    :param socket_path: the server socket, see :func:`default_socket_path`.
+    :param timeout: the number of seconds to wait for the response.
+    :return: the response or None if no server is listening or the
+     server does not respond in time.
+    """
+    if socket_path is None:
+        socket_path = default_socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as stream:
+                line = stream.readline()
+        except OSError:
+            # No server, or the connection timed out or was reset.
+            return None
+    return json.loads(line) if line else None
+
+
+def ping(socket_path: str = None) -> bool:
+    """Return True if a server is listening on socket_path."""
+    return send({"op": "ping"}, socket_path, timeout=1.0) is not None
@@ -0,0 +1,455 @@
+"""Compile validator and converter expressions to Python callables.
+
+Validator and converter expressions are Python expressions evaluated with
+`hval` bound to the declared value and `htype` bound to its definition.
+Instead of evaluating the expression text on every value, expressions are
+analysed once and lowered to closures. Common patterns are recognised and
+replaced by specialised predicates:
+
+- chained comparisons against constants, e.g. `100 <= hval <= 1000`,
+- membership tests, e.g. `hval.lower() in ['red', 'blue']`,
+- type checks, e.g. `isinstance(hval, str)`,
+- regular expression matches, e.g. `re.match(r'^[A-Z_]+$', hval)`,
+- single argument calls, e.g. `int(hval)` or `pathlib.Path(hval)`.
+
+Any other expression is compiled to a function once and evaluated as is.
+The recognised pattern is described by :class:`Pattern` so that bulk
+validation paths can use it, e.g. to check a whole column of values
+against the bounds of a range.
+"""
+import ast
+import builtins
+import operator
+import re
+import typing as t
+
+
+class Pattern(t.NamedTuple):
+    """Describe a recognised expression pattern.
+
+    :param kind: one of 'range', 'compare', 'member', 'isinstance',
+     'regex', 'value' or 'generic'.
+    :param params: pattern parameters, e.g. bounds or the member set.
+    :param message: the constant error message of `expr, "message"`
+     validators or None.
+    """
+
+    kind: str
+    params: dict
+    message: t.Optional[str] = None
+
+
+class CompiledExpr:
+    """A validator or converter expression compiled to a callable."""
+
+    __slots__ = ("source", "func", "pattern")
+
+    def __init__(self, source: str, func: t.Callable, pattern: Pattern):
+        """Initialize a compiled expression.
+
+        :param source: the expression text.
+        :param func: a callable taking (hval, htype).
+        :param pattern: the recognised pattern.
+        """
+        self.source = source
+        self.func = func
+        self.pattern = pattern
+
+    def __call__(self, hval, htype=None):
+        """Evaluate the expression for a value."""
+        return self.func(hval, htype)
+
+    def __repr__(self):
+        """Debug str representation."""
+        return f"CompiledExpr({self.pattern.kind}: {self.source!r})"
+
+
+_compare_ops = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+_type_names = {"str", "int", "float", "bool", "list", "dict", "tuple"}
+
+_cast_names = {"int", "float", "str", "bool", "len", "abs"}
+
+_str_methods = {"lower", "upper", "strip", "casefold",
+                "isalpha", "isalnum", "isdigit", "isidentifier"}
+
+_not_constant = object()
+
+
+def _constant(node: ast.AST):
+    """Fold a constant subexpression or return _not_constant."""
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError,
+            RecursionError):
+        return _not_constant
+
+
+def _dotted_name(node: ast.AST) -> t.Optional[str]:
+    """Return 'a.b.c' for attribute chains over a name or None."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def _resolve(name: str, namespace: dict):
+    """Resolve a dotted name in the evaluation namespace."""
+    head, *attrs = name.split(".")
+    if head in namespace:
+        obj = namespace[head]
+    elif hasattr(builtins, head):
+        obj = getattr(builtins, head)
+    else:
+        return _not_constant
+    for attr in attrs:
+        obj = getattr(obj, attr, _not_constant)
+        if obj is _not_constant:
+            break
+    return obj
+
+
+def _subject(node: ast.AST, namespace: dict):
+    """Match expressions derived from hval.
+
+    Recognises `hval`, `hval.method()` and `func(hval)`.
+
+    :return: (transform name, transform callable or None) or None if the
+     node is not a supported subject expression.
+    """
+    if isinstance(node, ast.Name) and node.id == "hval":
+        return None, None
+    if not isinstance(node, ast.Call) or node.keywords:
+        return False
+    func = node.func
+    if not node.args and isinstance(func, ast.Attribute) and\
+       isinstance(func.value, ast.Name) and func.value.id == "hval" and\
+       func.attr in _str_methods:
+        return func.attr, operator.methodcaller(func.attr)
+    if len(node.args) == 1 and isinstance(node.args[0], ast.Name) and\
+       node.args[0].id == "hval":
+        name = _dotted_name(func)
+        if name is None:
+            return False
+        if "." not in name and name not in _cast_names:
+            return False
+        if name.split(".")[0] in ("hval", "htype"):
+            return False
+        target = _resolve(name, namespace)
+        if target is _not_constant or not callable(target):
+            return False
+        return name, target
+    return False
+
+
+def _lower_compare(node: ast.Compare, namespace: dict):
+    """Lower comparisons with a single subject and constant operands."""
+    operands = [node.left] + list(node.comparators)
+    subject = None
+    values = []
+    for operand in operands:
+        const = _constant(operand)
+        if const is not _not_constant:
+            values.append(const)
+            continue
+        if subject is not None:
+            return None
+        subject = _subject(operand, namespace)
+        if subject is False:
+            return None
+        values.append(_not_constant)
+    if subject is None:
+        return None
+    transform_name, transform = subject
+
+    if len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn)):
+        if values[0] is not _not_constant or\
+           not isinstance(values[1], (list, tuple, set, frozenset)):
+            return None
+        return _lower_member(values[1], isinstance(node.ops[0], ast.NotIn),
+                             transform_name, transform)
+
+    if any(type(op) not in _compare_ops for op in node.ops):
+        return None
+    ops = [_compare_ops[type(op)] for op in node.ops]
+    return _lower_chain(ops, values, node.ops, transform_name, transform)
+
+
+def _lower_member(members, negate, transform_name, transform):
+    """Lower `subject in [constants]` to a frozenset lookup."""
+    items = tuple(members)
+    try:
+        lookup = frozenset(items)
+    except TypeError:
+        return None
+
+    def contains(value):
+        try:
+            return value in lookup
+        except TypeError:
+            # Unhashable values, compare like a list would.
+            return value in items
+
+    if transform is None:
+        if negate:
+            def pred(hval, htype):
+                return not contains(hval)
+        else:
+            def pred(hval, htype):
+                return contains(hval)
+    elif negate:
+        def pred(hval, htype):
+            return not contains(transform(hval))
+    else:
+        def pred(hval, htype):
+            return contains(transform(hval))
+    return pred, Pattern("member", {"values": lookup,
+                                    "negate": negate,
+                                    "transform": transform_name})
+
+
+def _lower_chain(ops, values, op_nodes, transform_name, transform):
+    """Lower comparison chains to closures over folded constants."""
+    index = values.index(_not_constant)
+    identity = transform is None
+
+    if len(ops) == 1:
+        op = ops[0]
+        const = values[1 - index]
+        if index == 0:
+            if identity:
+                def pred(hval, htype):
+                    return op(hval, const)
+            else:
+                def pred(hval, htype):
+                    return op(transform(hval), const)
+        elif identity:
+            def pred(hval, htype):
+                return op(const, hval)
+        else:
+            def pred(hval, htype):
+                return op(const, transform(hval))
+    elif len(ops) == 2 and index == 1:
+        low_op, high_op = ops
+        low, high = values[0], values[2]
+        if identity:
+            def pred(hval, htype):
+                return low_op(low, hval) and high_op(hval, high)
+        else:
+            def pred(hval, htype):
+                value = transform(hval)
+                return low_op(low, value) and high_op(value, high)
+    else:
+        pairs = list(zip(ops, range(len(ops))))
+
+        def pred(hval, htype):
+            value = hval if identity else transform(hval)
+            operands = [value if v is _not_constant else v for v in values]
+            result = True
+            for op, i in pairs:
+                result = op(operands[i], operands[i + 1])
+                if not result:
+                    return result
+            return result
+
+    return pred, _chain_pattern(op_nodes, values, index, transform_name)
+
+
+def _chain_pattern(op_nodes, values, index, transform_name) -> Pattern:
+    """Describe a comparison chain, using 'range' for bounds checks."""
+    params = {"transform": transform_name}
+    op_types = [type(op) for op in op_nodes]
+    lower = {ast.Lt: False, ast.LtE: True}
+    upper = {ast.Gt: False, ast.GtE: True}
+
+    if len(op_types) == 2 and index == 1 and\
+       all(op in lower for op in op_types):
+        params.update(low=values[0], high=values[2],
+                      low_inclusive=lower[op_types[0]],
+                      high_inclusive=lower[op_types[1]])
+        return Pattern("range", params)
+    if len(op_types) == 2 and index == 1 and\
+       all(op in upper for op in op_types):
+        params.update(low=values[2], high=values[0],
+                      low_inclusive=upper[op_types[1]],
+                      high_inclusive=upper[op_types[0]])
+        return Pattern("range", params)
+    if len(op_types) == 1 and op_types[0] in lower or\
+       len(op_types) == 1 and op_types[0] in upper:
+        # Normalize to 'hval op const'.
+        op = op_types[0]
+        const = values[1 - index]
+        is_lower_bound = (op in upper) == (index == 0)
+        inclusive = lower.get(op, upper.get(op))
+        if is_lower_bound:
+            params.update(low=const, high=None,
+                          low_inclusive=inclusive, high_inclusive=False)
+        else:
+            params.update(low=None, high=const,
+                          low_inclusive=False, high_inclusive=inclusive)
+        return Pattern("range", params)
+
+    params.update(ops=tuple(op.__name__ for op in op_types),
+                  operands=tuple(None if v is _not_constant else v
+                                 for v in values))
+    return Pattern("compare", params)
+
+
+def _lower_isinstance(node: ast.Call):
+    """Lower `isinstance(hval, T)` for builtin types."""
+    if len(node.args) != 2 or node.keywords:
+        return None
+    value, types = node.args
+    if not isinstance(value, ast.Name) or value.id != "hval":
+        return None
+    names = types.elts if isinstance(types, ast.Tuple) else [types]
+    if not all(isinstance(n, ast.Name) and n.id in _type_names
+               for n in names):
+        return None
+    classes = tuple(getattr(builtins, n.id) for n in names)
+    check = classes[0] if len(classes) == 1 else classes
+
+    def pred(hval, htype):
+        return isinstance(hval, check)
+    return pred, Pattern("isinstance", {"types": classes})
+
+
+def _lower_regex(node: ast.AST, namespace: dict):
+    """Lower `re.match/fullmatch/search(const, hval)` tests."""
+    negate = None
+    if isinstance(node, ast.Compare) and len(node.ops) == 1 and\
+       _constant(node.comparators[0]) is None:
+        if isinstance(node.ops[0], (ast.IsNot, ast.NotEq)):
+            negate = False
+        elif isinstance(node.ops[0], (ast.Is, ast.Eq)):
+            negate = True
+        else:
+            return None
+        node = node.left
+
+    if not isinstance(node, ast.Call) or node.keywords or\
+       len(node.args) != 2:
+        return None
+    func = _dotted_name(node.func)
+    if func not in ("re.match", "re.fullmatch", "re.search") or\
+       namespace.get("re") is not re:
+        return None
+    regex = _constant(node.args[0])
+    if not isinstance(regex, str) or\
+       not isinstance(node.args[1], ast.Name) or\
+       node.args[1].id != "hval":
+        return None
+    try:
+        compiled = re.compile(regex)
+    except re.error:
+        return None
+    method = getattr(compiled, func.split(".")[1])
+
+    if negate is None:
+        def pred(hval, htype):
+            return method(hval)
+    elif negate:
+        def pred(hval, htype):
+            return method(hval) is None
+    else:
+        def pred(hval, htype):
+            return method(hval) is not None
+    return pred, Pattern("regex", {"regex": compiled,
+                                   "method": func.split(".")[1],
+                                   "negate": bool(negate),
+                                   "test": negate is not None})
+
+
+def _lower_value(node: ast.AST, namespace: dict):
+    """Lower `hval`, `hval.method()` and `func(hval)`."""
+    subject = _subject(node, namespace)
+    if subject is False:
+        return None
+    transform_name, transform = subject
+    if transform is None:
+        def pred(hval, htype):
+            return hval
+    else:
+        def pred(hval, htype):
+            return transform(hval)
+    return pred, Pattern("value", {"transform": transform_name})
+
+
+def _lower(node: ast.AST, namespace: dict):
+    """Try the specialised lowerings for an expression node."""
+    lowered = _lower_regex(node, namespace)
+    if lowered is None and isinstance(node, ast.Compare):
+        lowered = _lower_compare(node, namespace)
+    if lowered is None and isinstance(node, ast.Call) and\
+       isinstance(node.func, ast.Name) and node.func.id == "isinstance":
+        lowered = _lower_isinstance(node)
+    if lowered is None:
+        lowered = _lower_value(node, namespace)
+    return lowered
+
+
+def _generic(source: str, namespace: dict):
+    """Compile an arbitrary expression to a function of (hval, htype)."""
+    try:
+        code = compile(f"lambda hval, htype: ({source}\n)",
+                       "<hyperconf>", "eval")
+        return eval(code, dict(namespace))
+    except SyntaxError as e:
+        error = e
+
+        def raise_error(hval, htype):
+            raise error
+        return raise_error
+
+
+def compile_expr(source: str, namespace: dict = None) -> CompiledExpr:
+    """Compile a validator or converter expression.
+
+    :param source: the expression text.
+    :param namespace: the names available to the expression besides
+     `hval` and `htype`, e.g. imported modules.
+    :return: a :class:`CompiledExpr`. Evaluating it is equivalent to
+     evaluating the expression text.
+    """
+    if source is None:
+        raise ValueError("source is None")
+    namespace = namespace if namespace is not None else {}
+    text = source.strip()
+
+    try:
+        tree = ast.parse(text, mode="eval").body
+    except SyntaxError:
+        return CompiledExpr(source, _generic(text, namespace),
+                            Pattern("generic", {}))
+
+    # Validators may return (result, "error message").
+    message = None
+    expr = tree
+    if isinstance(tree, ast.Tuple) and len(tree.elts) == 2 and\
+       isinstance(_constant(tree.elts[1]), str):
+        expr, message = tree.elts[0], _constant(tree.elts[1])
+
+    lowered = _lower(expr, namespace)
+    if lowered is None:
+        return CompiledExpr(source, _generic(text, namespace),
+                            Pattern("generic", {}))
+
+    pred, pattern = lowered
+    if tree is not expr:
+        def func(hval, htype):
+            return pred(hval, htype), message
+        pattern = pattern._replace(message=message)
+    else:
+        func = pred
+    return CompiledExpr(source, func, pattern)
@@ -1,9 +1,37 @@
 """Load and access configuration data."""
+import re
+import io
+import json
 import yaml
-from pathlib import Path
+import contextvars
+import array
+import types
+import hashlib
+import datetime
+import typing as t
+from collections.abc import Sequence
+from pathlib import Path, PurePath
 
 import hyperconf.errors as err
 import hyperconf.dsl as dsl
+import hyperconf.source as source
+import hyperconf.registry as registry
+from hyperconf.cache import FragmentCache
+
+
+class ConfigDiff(t.NamedTuple):
+    """Differences between two configurations.
+
+    Paths are tuples of keys and list indexes, e.g. ('model1', 'heads', 0).
+
+    :param added: paths found only in the second configuration.
+    :param removed: paths found only in the first configuration.
+    :param changed: paths whose values or types differ.
+    """
+
+    added: t.List[tuple]
+    removed: t.List[tuple]
+    changed: t.List[tuple]
 
 
 class HyperConfig(dict):
@@ -13,10 +41,40 @@ class HyperConfig(dict):
     definitions and configuration value validation.
     Accessing values can be done in a dict-like manner on by acessing
     attributes. All top-level configuration keys are exposed as attributes.
+
+    Values of 'ref[type]' options are identifiers of top level objects.
+    Once the configuration is parsed they are replaced by the objects,
+    which must be of that type. Undefined identifiers and objects that
+    refer to themselves, directly or through other objects, are errors.
+
+    Values containing `${path}` references, e.g. 'http://${db.host}',
+    are interpolated once the configuration is parsed if it is loaded
+    with interpolate=True, see :meth:`interpolate`. Objects declared as `{include: path}` are
+    parsed from a shared file, see :meth:`fragment_cache`.
     """
 
+    # Set by freeze(), frozen objects cannot be modified.
+    _frozen = False
+    # Set on root objects whose references were linked.
+    _linked = False
+    # Set on the objects of configurations loaded with lazy=True until
+    # all their values are interpolated.
+    _interpolator = None
+    # Set on root objects loaded with interpolate=True.
+    _interpolates = False
+    # The generation _hash was computed in, see _cached_hash().
+    _hashed = -1
+    # The generation _type_index was built in, see iter_type().
+    _indexed = -1
+    # (path, _Interpolation) of the interpolated values of root objects,
+    # interpolated again by overlays.
+    _templates = ()
+
     @staticmethod
-    def load_yaml(path: str | Path, strict: bool = True) -> "HyperConfig":
+    def load_yaml(path: str | Path, strict: bool = True,
+                  only: t.Collection[str] = None,
+                  lazy: bool = False,
+                  interpolate: bool = False) -> "HyperConfig":
         """Parse a YAML file containing configuration objects.
 
         :param path: The path to the YAML file. It can be either a string or
@@ -26,6 +84,21 @@ class HyperConfig(dict):
         :param strict: If True, strict parsing is enforced. Defaults to True.
         :type strict: bool, optional
 
+        :param only: If specified, only the top level objects with these
+        identifiers, and the objects they refer to or interpolate values
+        from, are loaded. Other declarations are skipped without being
+        parsed or validated. `use` directives are always processed.
+        :type only: Collection[str], optional
+
+        :param lazy: If True, values containing `${path}` references are
+        interpolated when they are first read instead of when the file is
+        loaded, implies interpolate. See :meth:`interpolate`.
+        :type lazy: bool, optional
+
+        :param interpolate: If True, values containing `${path}` references
+        are interpolated. Otherwise they are loaded as they are.
+        :type interpolate: bool, optional
+
         :return: An instance of HyperConfig containing the parsed configuration
         :rtype: HyperConfig
 
@@ -70,20 +143,20 @@ class HyperConfig(dict):
                 "Please check that the file exists."
             )
 
-        with open(path) as tfile:
-            try:
-                config_values = yaml.load(tfile, Loader=dsl._LineInfoLoader)
-            except (yaml.scanner.ScannerError, yaml.parser.ParserError) as e:
-                raise err.HyperConfError(
-                    f"Failed to load file {path}. Cause: {repr(e)}"
-                )
+        config_values, source_map = HyperConfig._read_yaml(
+            path, only, interpolate or lazy)
         return HyperConfig(path.stem, config_values,
                            strict=strict,
                            line=0,
-                           fname=path.as_posix())
+                           fname=path.as_posix(),
+                           source_map=source_map,
+                           lazy=lazy,
+                           interpolate=interpolate)
 
     @staticmethod
-    def load_str(text: str, strict: bool = True):
+    def load_str(text: str, strict: bool = True,
+                 only: t.Collection[str] = None, lazy: bool = False,
+                 interpolate: bool = False):
         """Parse a YAML-formatted string containing configuration objects.
 
         :param text: The YAML-formatted string containing configuration data.
@@ -92,6 +165,18 @@ class HyperConfig(dict):
         :param strict: If True, strict parsing is enforced. Defaults to True.
         :type strict: bool, optional
 
+        :param only: If specified, only the top level objects with these
+        identifiers are loaded. See :meth:`load_yaml`.
+        :type only: Collection[str], optional
+
+        :param lazy: If True, values are interpolated when they are first
+        read. See :meth:`load_yaml`.
+        :type lazy: bool, optional
+
+        :param interpolate: If True, values containing `${path}` references
+        are interpolated. See :meth:`load_yaml`.
+        :type interpolate: bool, optional
+
         :return: An instance of HyperConfig containing
         the parsed configuration.
         :rtype: HyperConfig
@@ -131,96 +216,1152 @@ class HyperConfig(dict):
         dsl.ConfigDefs.load_builtins()
 
         try:
-            config_values = yaml.load(text, Loader=dsl._LineInfoLoader)
+            config_values, source_map = HyperConfig._parse_yaml(
+                text, only, interpolate=interpolate or lazy)
         except (yaml.scanner.ScannerError, yaml.parser.ParserError) as e:
             raise err.HyperConfError(
                 f"Failed to parse YAML. Cause: {repr(e)}"
             )
         return HyperConfig(None, config_values,
                            strict=strict,
-                           fname=None)
+                           fname=None,
+                           source_map=source_map,
+                           lazy=lazy,
+                           interpolate=interpolate)
 
     def __init__(self, ident: str,
                  config_values: dict,
                  hdef: dsl.HyperDef = None,
                  strict: bool = True,
                  line: int = 0,
-                 fname: str = None):
+                 fname: str = None,
+                 source_map: source.SourceMap = None,
+                 lazy: bool = False,
+                 interpolate: bool = False):
         """Parse and validate configuration objects."""
         if config_values is None or not isinstance(config_values, dict):
             raise ValueError("config_values must be a dict object.")
 
-        if dsl.Keywords.line in config_values:
-            # The loader adds a __line__: 1 for the top level node.
-            self._line = config_values[dsl.Keywords.line]
-            del config_values[dsl.Keywords.line]
-        else:
-            self._line = line
+        if source_map is not None:
+            line = source_map.line(config_values, line)
+        decls = self._setup(ident, config_values, hdef, strict, line, fname,
+                            dsl.ConfigDefs.current_namespace())
+        self._parse(decls, config_values, source_map, lazy, interpolate)
 
-        self._id = ident
-        self._strict = strict
-        self._file = fname
-        self.__def__ = hdef
+    def _parse(self, decls: t.List[tuple], config_values: dict,
+               source_map: source.SourceMap = None, lazy: bool = False,
+               interpolate: bool = False):
+        """Build a root object, then link and interpolate its values.
+
+        :param lazy: interpolate the values when they are first read,
+         implies interpolate.
+        """
+        refs = {}
+        interps = None
+        if interpolate or lazy:
+            interps = []
+            self._interpolates = True
+        self._build(decls, config_values, source_map, refs, interps)
+        self._types = dsl.ConfigDefs.intern_types(tuple(self._types.items()))
+        if refs:
+            _Linker(self, refs).link()
+        if interps:
+            _Interpolator(self, interps).start(lazy)
+
+    def _setup(self, ident: str, config_values: dict, hdef: dsl.HyperDef,
+               strict: bool, line: int, fname: str,
+               namespace: str) -> t.List[tuple]:
+        """Initialize the attributes and load the referred schemas.
+
+        :return: the (declaration tag, value) pairs to parse.
+        """
+        # Set the attributes in place, bypassing __setattr__.
+        self.__dict__.update(
+            _line=line, _id=ident, _strict=strict, _file=fname,
+            _namespace=namespace, _hash=None, _type_index=None,
+            __def__=hdef,
+            # key -> definition of the values that are not objects.
+            _types={})
 
         # Scan the entire file for use directives and
         # load referred definitions.
         objs = []
+        schemas = []
         for decl_name, val in config_values.items():
             if decl_name == dsl.Keywords.use:
-                dsl.ConfigDefs.parse_yaml(val, ref_file=fname)
+                schemas.extend(dsl.ConfigDefs.use_all(val, ref_file=fname))
             else:
                 objs.append((decl_name, val))
+        # Referred schema files stay loaded while this object is alive.
+        self.__dict__["_schemas"] = tuple(schemas)
+        if schemas:
+            dsl.ConfigDefs.acquire(self, schemas)
+        return objs
+
+    def _child(self, ident: str, config_values: dict, hdef: dsl.HyperDef,
+               source_map: source.SourceMap, filled: dict = None):
+        """Create a nested object whose declarations are not parsed yet.
+
+        :param config_values: the parsed mapping of the object.
+        :param filled: a copy of config_values with the default option
+         values, parsed instead of config_values if given.
+        :return: the object and its (declaration tag, value) pairs.
+        """
+        line = source_map.line(config_values, self._line)\
+            if source_map is not None else self._line
+        child = HyperConfig.__new__(HyperConfig)
+        decls = child._setup(ident, config_values if filled is None
+                             else filled, hdef, self._strict, line,
+                             self._file, self._namespace)
+        return child, decls
+
+    def _add_decl(self, decl_name: str, val, decls: dict = None,
+                  source_map: source.SourceMap = None, refs: dict = None,
+                  interps: list = None):
+        """Validate a declaration and add the resulting value.
+
+        :param decl_name: the declaration tag.
+        :param val: the declared value.
+        :param decls: the parsed mapping containing the declaration.
+        :param source_map: the source locations of the parsed values,
+         used to report the line of the failing declaration.
+        :param refs: the references found are added to refs, see
+         :meth:`_build`.
+        :param interps: the values to interpolate are added to interps.
+        """
+        self._build([(decl_name, val)], decls, source_map, refs, interps)
+
+    def _build(self, decls: t.List[tuple], config_values: dict,
+               source_map: source.SourceMap = None, refs: dict = None,
+               interps: list = None):
+        """Validate declarations and add the resulting values.
+
+        Nested objects are parsed depth first, in document order, with an
+        explicit stack instead of recursive calls, so that the nesting
+        depth is not limited by the recursion limit. Errors are located
+        at the innermost failing declaration.
+
+        A mapping found several times, such as a YAML anchor and its
+        aliases, is validated and parsed once for each definition and the
+        resulting object is shared by all the references. The parsed
+        values are not modified.
+
+        :param decls: the (declaration tag, value) pairs to parse.
+        :param config_values: the parsed mapping containing decls.
+        :param source_map: the source locations of the parsed values.
+        :param refs: if given, the references found are added as
+         (id(object), key) -> line, to be linked once the configuration
+         is parsed.
+        :param interps: if given, values containing `${` are not
+         validated, they are stored as :class:`_Interpolation` objects
+         and added to interps, to be interpolated once the configuration
+         is parsed.
+        """
+        infer_type = dsl.HyperDef.infer_type
+        intern_types = dsl.ConfigDefs.intern_types
+        # Shared type tuples, most objects have the same types.
+        shared_types = {}
+        # id(mapping) -> last object parsed from the mapping, for options
+        # and for list elements, which get no default values.
+        shared_options = {}
+        shared_elems = {}
+        # ids of the mappings of the objects being parsed.
+        active = {id(config_values)} if config_values is not None else set()
+        # Object frames are (_OBJECT, node, decl iterator, mapping), list
+        # frames are (_LIST, node, ident, definition, elements,
+        # enumerated item iterator, sequence, decl tag, mapping).
+        stack = [(_OBJECT, self, iter(decls), config_values)]
+        while stack:
+            frame = stack[-1]
+            if frame[0] == _OBJECT:
+                _, node, decl_iter, values = frame
+                item = next(decl_iter, None)
+                if item is None:
+                    stack.pop()
+                    active.discard(id(values))
+                    if node is not self:
+                        types = tuple(node._types.items())
+                        shared = shared_types.get(types)
+                        if shared is None:
+                            shared = shared_types[types] = \
+                                intern_types(types)
+                        node._types = shared
+                    continue
+                decl_name, val = item
+                try:
+                    ident, htype = infer_type(decl_name, val, node.__def__)
+                    if htype is None:
+                        raise err.UndefinedTagError(ident, node._line,
+                                                    node._file)
+
+                    # handle dict, list or atomic options
+                    if isinstance(val, dict) and len(val) == 1 and\
+                            dsl.Keywords.include in val:
+                        dict.__setitem__(node, ident, node._fragment(
+                            ident, val[dsl.Keywords.include], htype,
+                            interps is not None))
+                    elif isinstance(val, dict):
+                        key = id(val)
+                        if key in active:
+                            raise self._alias_error(node)
+                        child = shared_options.get(key)
+                        if child is None or child.__def__ is not htype:
+                            # set default option values in a copy.
+                            filled = val
+                            if any(name not in val
+                                   for name in htype.resolved.options):
+                                filled = htype.set_defaults(val,
+                                                            in_place=False)
+                            htype.validate(filled, node._line, node._file)
+                            child, child_decls = node._child(
+                                ident, val, htype, source_map, filled)
+                            shared_options[key] = child
+                            active.add(key)
+                            stack.append((_OBJECT, child, iter(child_decls),
+                                          val))
+                        elif child._id != ident:
+                            child = child._renamed(ident)
+                        dict.__setitem__(node, ident, child)
+                    elif isinstance(val, list):
+                        opt = node.__def__.resolved.options.get(ident)\
+                            if node.__def__ is not None else None
+                        if opt is not None and opt.columnar:
+                            dict.__setitem__(node, ident, ColumnList.build(
+                                htype, val, node, source_map))
+                            node._types[ident] = htype
+                        else:
+                            stack.append((_LIST, node, ident, htype, [],
+                                          enumerate(val), val, decl_name,
+                                          values))
+                    elif interps is not None and val.__class__ is str and\
+                            "${" in val and htype.reference is None:
+                        line = source_map.key_line(
+                            values, decl_name, node._line)\
+                            if source_map is not None else node._line
+                        interp = _Interpolation(val, htype, line, node._file)
+                        dict.__setitem__(node, ident, interp)
+                        node._types[ident] = htype
+                        interps.append(interp)
+                    else:
+                        htype.validate(val, node._line, node._file)
+                        dict.__setitem__(node, ident, htype.convert(
+                            val, node._line, node._file))
+                        node._types[ident] = htype
+                    if htype.reference is not None and refs is not None:
+                        refs[(id(node), ident)] = source_map.key_line(
+                            values, decl_name, node._line)\
+                            if source_map is not None else node._line
+                except (err.ConfigurationError, err.UndefinedTagError) as e:
+                    if source_map is not None:
+                        e.locate(source_map.key_line(values, decl_name,
+                                                     node._line),
+                                 node._file)
+                    raise
+            else:
+                (_, node, ident, htype, elems, elem_iter, seq, decl_name,
+                 values) = frame
+                item = next(elem_iter, None)
+                if item is None:
+                    stack.pop()
+                    dict.__setitem__(node, ident, elems)
+                    node._types[ident] = htype
+                    continue
+                i, elem = item
+                try:
+                    try:
+                        if isinstance(elem, dict):
+                            elem_id, elem_decl = next(iter(elem.items()))
+                            if isinstance(elem_decl, dict) and\
+                               len(elem_decl) == 1 and\
+                               dsl.Keywords.include in elem_decl:
+                                elems.append(node._fragment(
+                                    elem_id,
+                                    elem_decl[dsl.Keywords.include], htype,
+                                    interps is not None))
+                                continue
+                            key = id(elem_decl)
+                            if key in active:
+                                raise self._alias_error(node)
+                            child = shared_elems.get(key)
+                            if child is None or child.__def__ is not htype:
+                                htype.validate(elem_decl, node._line,
+                                               node._file)
+                                child, child_decls = node._child(
+                                    elem_id, elem_decl, htype, source_map)
+                                shared_elems[key] = child
+                                active.add(key)
+                                stack.append((_OBJECT, child,
+                                              iter(child_decls), elem_decl))
+                            elif child._id != elem_id:
+                                child = child._renamed(elem_id)
+                            elems.append(child)
+                        else:
+                            htype.validate(elem, node._line, node._file)
+                            elems.append(elem)
+                    except err.ConfigurationError as e:
+                        if source_map is not None:
+                            e.locate(source_map.item_line(seq, i,
+                                                          node._line),
+                                     node._file)
+                        raise
+                except (err.ConfigurationError, err.UndefinedTagError) as e:
+                    if source_map is not None:
+                        e.locate(source_map.key_line(values, decl_name,
+                                                     node._line),
+                                 node._file)
+                    raise
+
+    def _fragment(self, ident: str, ref, hdef: dsl.HyperDef,
+                  interpolate: bool = False) -> "HyperConfig":
+        """Return the frozen object of an included file.
+
+        The file is parsed and validated once for each definition and
+        cached while it is not modified, see :meth:`fragment_cache`.
+
+        :param ref: the path of the file, the '.yaml' suffix is optional.
+        :param hdef: the definition of the included object.
+        :param interpolate: if True, interpolate the values of the file.
+        """
+        if not isinstance(ref, str):
+            raise err.ConfigurationError(
+                f"The '{dsl.Keywords.include}' directive must specify a "
+                "file path.", line=self._line, fname=self._file)
+        path = Path(ref if ref.endswith(".yaml") else ref + ".yaml")
+        stamp = registry.file_stamp(path)
+        if stamp is None:
+            raise err.ConfigurationError(
+                f"Failed to include '{path.as_posix()}'. Could not find "
+                "the file.", line=self._line, fname=self._file)
+        key = (self._namespace, path.resolve().as_posix(), stamp, hdef,
+               self._strict, interpolate)
+        fragment = _fragments.get(key)
+        if fragment is None:
+            including = _including.get()
+            entry = (key[1], hdef, path.as_posix())
+            if entry in including:
+                cycle = [*including[including.index(entry):], entry]
+                raise err.ConfigurationError(
+                    "Circular include: " +
+                    " -> ".join(fname for _, _, fname in cycle) + ".",
+                    line=self._line, fname=self._file)
+            token = _including.set(including + (entry,))
+            try:
+                fragment = self._load_fragment(ident, path, hdef,
+                                               interpolate)
+            finally:
+                _including.reset(token)
+            _fragments.put(key, fragment)
+        if fragment._id != ident:
+            fragment = fragment._renamed(ident).freeze()
+        return fragment
+
+    def _load_fragment(self, ident: str, path: Path, hdef: dsl.HyperDef,
+                       interpolate: bool = False) -> "HyperConfig":
+        """Parse an included file, see :meth:`_fragment`."""
+        fname = path.as_posix()
+        values, source_map = HyperConfig._read_yaml(path)
+        if not isinstance(values, dict):
+            raise err.ConfigurationError(
+                f"The included file '{fname}' must contain the options of "
+                f"a '{hdef.name}' object.", line=1, fname=fname)
+        filled = values
+        if any(name not in values for name in hdef.resolved.options):
+            filled = hdef.set_defaults(values, in_place=False)
+        hdef.validate(filled, 1, fname)
+        fragment = HyperConfig.__new__(HyperConfig)
+        decls = fragment._setup(ident, filled, hdef, self._strict,
+                                source_map.line(values, 1), fname,
+                                self._namespace)
+        fragment._parse(decls, values, source_map, interpolate=interpolate)
+        return fragment.freeze()
+
+    @staticmethod
+    def fragment_cache() -> FragmentCache:
+        """Return the cache of included files.
+
+        An object declared as `{include: path}` is parsed from the YAML
+        file at path, which contains its options. The file is parsed
+        and validated once for each definition it is included with and
+        the frozen object is shared by the configurations that include
+        it, until the file is modified or evicted from the cache.
+        """
+        return _fragments
+
+    @staticmethod
+    def set_fragment_cache(maxsize: int = 256) -> FragmentCache:
+        """Replace the cache of included files with an empty cache.
+
+        :param maxsize: the maximum number of cached files.
+        :return: the new cache.
+        """
+        global _fragments
+        _fragments = FragmentCache(maxsize)
+        return _fragments
+
+    @staticmethod
+    def _alias_error(node: "HyperConfig") -> err.ConfigurationError:
+        """Return the error for a mapping that contains itself."""
+        return err.ConfigurationError(
+            "Recursive alias, the object contains itself.",
+            line=node._line, fname=node._file)
+
+    def _renamed(self, ident: str) -> "HyperConfig":
+        """Return a copy of this node, sharing its values, named ident."""
+        node = self._shallow_copy()
+        node._id = ident
+        return node
+
+    @staticmethod
+    def overlay(base: "HyperConfig", *overlays) -> "HyperConfig":
+        """Apply configuration overlays to a base configuration.
+
+        Overlays are applied in order. Each overlay is a dict of
+        declarations, as parsed from YAML, or the path of a YAML file.
+        Objects declared by an overlay are merged recursively into the
+        objects of the same type from the base, any other declaration
+        replaces the base value. Lists are replaced as a whole.
+
+        Only the declarations found in the overlays are validated. Objects
+        that are not changed by an overlay are shared with the base
+        configuration instead of being copied, so the base configuration
+        should not be modified afterwards. Objects referring to a changed
+        object are copied to refer to the new object.
+
+        :param base: the base configuration.
+        :param overlays: dicts or YAML file paths.
+        :return: a new HyperConfig.
+
+        :Example:
+
+        >>> base = HyperConfig.load_yaml("base.yaml")
+        >>> prod = HyperConfig.overlay(base, "prod.yaml", {"db": {"port": 5433}})
+        """
+        if base is None or not isinstance(base, HyperConfig):
+            raise ValueError("base must be a HyperConfig instance.")
+
+        base.interpolate()
+        config = base
+        with dsl.ConfigDefs.namespace(base._namespace):
+            for overlay in overlays:
+                fname = base._file
+                source_map = None
+                if isinstance(overlay, (str, Path)):
+                    fname = Path(overlay).as_posix()
+                    overlay, source_map = HyperConfig._read_yaml(
+                        Path(overlay))
+                if overlay is None or not isinstance(overlay, dict):
+                    raise ValueError(
+                        "overlays must be dicts or YAML file paths.")
+                refs = {}
+                interps = [] if base._interpolates else None
+                config = config._overlaid(overlay, fname, source_map, refs,
+                                          interps)
+                # Values interpolated in the base may refer to changed
+                # values, interpolate them again unless overridden.
+                stale = [(path, interp.copy())
+                         for path, interp in config._templates
+                         if not _declares(overlay, path) and
+                         all(key.__class__ is str for key in path)]
+                config._templates = ()
+                if stale:
+                    config = config._replaced(stale)
+                    interps += [interp for _, interp in stale]
+                if refs or config._linked:
+                    _Linker(config, refs, copy=True).link()
+                if interps:
+                    _Interpolator(config, interps).start(lazy=False)
+        return config
+
+    def _overlaid(self, values: dict, fname: str,
+                  source_map: source.SourceMap = None,
+                  refs: dict = None,
+                  interps: list = None) -> "HyperConfig":
+        """Return a copy of this node with the declarations applied."""
+        node = self._shallow_copy()
+        node._file = fname
+        node._types = dict(node._types)
+
+        for decl_name, val in values.items():
+            if decl_name == dsl.Keywords.use:
+                schemas = dsl.ConfigDefs.use_all(val, ref_file=fname)
+                node._schemas += tuple(schemas)
+                dsl.ConfigDefs.acquire(node, schemas)
+                continue
+
+            ident, htype = dsl.HyperDef.infer_type(decl_name, val,
+                                                   self.__def__)
+            current = dict.get(self, ident)
+            if isinstance(current, HyperConfig) and "=" not in decl_name:
+                # Untyped overrides keep the type of the base object.
+                htype = current.__def__
+            if isinstance(val, dict) and isinstance(current, HyperConfig)\
+               and htype is not None and current.__def__ is htype:
+                # Check the structure of the merged object, options
+                # missing from the overlay are taken from the base.
+                merged = dict(current)
+                merged.update(val)
+                try:
+                    htype.validate(merged, node._line, fname)
+                except err.ConfigurationError as e:
+                    if source_map is not None:
+                        e.locate(source_map.key_line(values, decl_name))
+                    raise
+                dict.__setitem__(node, ident, current._overlaid(
+                    val, fname, source_map, refs, interps))
+            else:
+                node._types.pop(ident, None)
+                node._add_decl(decl_name, val, values, source_map, refs,
+                               interps)
+        node._types = dsl.ConfigDefs.intern_types(tuple(node._types.items()))
+        return node
+
+    def _replaced(self, values: t.List[tuple]) -> "HyperConfig":
+        """Return a copy of this node with nested values replaced.
+
+        Only the objects on the paths of the values are copied.
+
+        :param values: (path, value) pairs, paths are tuples of keys.
+        """
+        root = self._shallow_copy()
+        copies = {(): root}
+        for path, val in values:
+            node = root
+            for i in range(1, len(path)):
+                child = copies.get(path[:i])
+                if child is None:
+                    child = dict.__getitem__(node, path[i - 1])\
+                        ._shallow_copy()
+                    dict.__setitem__(node, path[i - 1], child)
+                    copies[path[:i]] = child
+                node = child
+            dict.__setitem__(node, path[-1], val)
+        return root
+
+    def _reference_keys(self) -> t.List[str]:
+        """Return the keys of the references of this node."""
+        return [key for key, hdef in self._types
+                if hdef.reference is not None]
+
+    def _shallow_copy(self) -> "HyperConfig":
+        """Copy this node, sharing the child values."""
+        node = HyperConfig.__new__(HyperConfig)
+        dict.update(node, self)
+        node.__dict__.update(self.__dict__)
+        node._hash = None
+        node._type_index = None
+        node._frozen = False
+        if node._schemas:
+            dsl.ConfigDefs.acquire(node, node._schemas)
+        return node
+
+    @staticmethod
+    def _read_yaml(path: Path, only: t.Collection[str] = None,
+                   interpolate: bool = False):
+        """Parse a YAML configuration file, see :meth:`_parse_yaml`.
+
+        :return: the parsed values and their source map.
+        """
+        with open(path) as tfile:
+            try:
+                return HyperConfig._parse_yaml(
+                    tfile.read() if only is not None else tfile, only,
+                    path.as_posix(), interpolate)
+            except (yaml.scanner.ScannerError, yaml.parser.ParserError) as e:
+                raise err.HyperConfError(
+                    f"Failed to load file {path}. Cause: {repr(e)}"
+                )
+
+    @staticmethod
+    def _parse_yaml(stream, only: t.Collection[str] = None,
+                    fname: str = None, interpolate: bool = False):
+        """Parse YAML configuration values.
+
+        :param stream: YAML text or file.
+        :param only: the top level identifiers to load or None to load
+         all declarations.
+        :param fname: the path of the parsed file, if any.
+        :param interpolate: if True, the declarations that the values of
+         the selected ones are interpolated from are loaded too.
+        :return: the parsed values and their source map.
+        """
+        if only is None:
+            return source.load(stream, fname)
+        if isinstance(only, str):
+            only = [only]
+        config_values, found, source_map = source.load_selected(
+            stream, only, always=[dsl.Keywords.use], fname=fname,
+            depends=_dependencies if interpolate else _references)
+        missing = [ident for ident in only if ident not in found]
+        if missing:
+            raise err.HyperConfError(
+                f"Could not find the declarations {missing}."
+            )
+        return config_values, source_map
+
+    def __reduce__(self):
+        """Pickle the values and the names of their definitions.
 
-        # Parse objects
-        for decl_name, val in objs:
-            ident, htype = dsl.HyperDef.infer_type(decl_name, val, hdef)
-
-            if htype is None:
-                raise err.UndefinedTagError(ident, self._line)
-
-            # handle dict, list or atomic options
-            if isinstance(val, dict):
-                # set default option values.
-                htype.set_defaults(val)
-
-                htype.validate(val, self._line, self._file)
-                self.update({
-                    ident: HyperConfig(ident, val, htype,
-                                       strict=strict,
-                                       line=self._line,
-                                       fname=self._file)
-                })
-            elif isinstance(val, list):
-                elems = []
-
-                for elem in val:
-                    if isinstance(elem, dict):
-                        elem_id, elem_decl = next(iter(elem.items()))
-
-                        htype.validate(elem_decl, self._line, self._file)
-
-                        elems.append(HyperConfig(
-                            elem_id, elem_decl, htype,
-                            strict=strict,
-                            line=self._line,
-                            fname=self._file
-                        ))
+        Definitions are not pickled, they are looked up by name in the
+        registry of the unpickling process, which loads the schema files
+        referred by this configuration if needed. The fingerprint of each
+        definition is checked to make sure that both processes use the
+        same schemas.
+        """
+        self.interpolate()
+        hdefs = {}
+        tree = self._encode(hdefs, {})
+        return (_unpickle, (self._namespace,
+                            [schema.path for schema in self._schemas],
+                            [(h.name, h.fingerprint) for h in hdefs],
+                            self._file, self._line, self._strict,
+                            self._id, tree, self._linked))
+
+    def _encode(self, hdefs: dict, tables: dict) -> t.List[tuple]:
+        """Encode the tree as a list of nodes, each one after its children.
+
+        Nodes are (definition index, types, values[, nested]). types is a
+        tuple of (key, definition index) of the values that are not
+        objects, shared by the nodes with the same types. values is a
+        dict of the plain values and nested is a list of
+        (key, kind, encoded value) for nested objects, lists of objects,
+        whose elements are (ident, None) or (None, value), and columnar
+        lists. The nodes of the nested objects of a node precede it, in
+        order, and their encoded value is None. Nested objects have a None
+        placeholder in values to keep the key order, unless all the
+        values are objects. References are encoded as identifiers.
+        """
+        # Nodes are encoded parent first, with their children in reverse
+        # order, and the list is reversed.
+        encoded = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            hdef = node.__def__
+            index = -1 if hdef is None else\
+                hdefs.setdefault(hdef, len(hdefs))
+            types = _encode_types(node._types, hdefs, tables)
+            refs = node._reference_keys()
+            nested = []
+            for key, val in dict.items(node):
+                if key in refs:
+                    continue
+                if isinstance(val, HyperConfig):
+                    nested.append((key, _NODE, None))
+                    stack.append(val)
+                elif isinstance(val, ColumnList):
+                    nested.append((key, _NODE_COLUMNS,
+                                   val._encode(hdefs, tables)))
+                elif isinstance(val, list) and\
+                        any(isinstance(e, HyperConfig) for e in val):
+                    elems = []
+                    for elem in val:
+                        if isinstance(elem, HyperConfig):
+                            elems.append((elem._id, None))
+                            stack.append(elem)
+                        else:
+                            elems.append((None, elem))
+                    nested.append((key, _NODE_LIST, elems))
+            if nested and len(nested) == len(node):
+                encoded.append((index, types, None, nested))
+                continue
+            values = dict(node)
+            for key in refs:
+                values[key] = _ref_ids(values[key])
+            if not nested:
+                encoded.append((index, types, values))
+                continue
+            for key, _, _ in nested:
+                values[key] = None
+            encoded.append((index, types, values, nested))
+        encoded.reverse()
+        return encoded
+
+    @staticmethod
+    def _decode(ident: str, encoded: t.List[tuple], hdefs: list,
+                tables: dict, template: "HyperConfig"):
+        """Rebuild a tree encoded by :meth:`_encode`."""
+        # The objects decoded and not yet added to their parent.
+        decoded = []
+        for node in encoded:
+            config = HyperConfig.__new__(HyperConfig)
+            config.__dict__.update(template.__dict__)
+            index = node[0]
+            config.__def__ = hdefs[index] if index >= 0 else None
+            config._types = _decode_types(node[1], hdefs, tables)
+            if node[2] is not None:
+                dict.update(config, node[2])
+            if len(node) == 4:
+                nested = node[3]
+                count = 0
+                for _, kind, val in nested:
+                    if kind == _NODE:
+                        count += 1
+                    elif kind == _NODE_LIST:
+                        count += sum(elem_id is not None
+                                     for elem_id, _ in val)
+                children = iter(decoded[len(decoded) - count:])
+                del decoded[len(decoded) - count:]
+                for key, kind, val in nested:
+                    if kind == _NODE:
+                        val = next(children)
+                        val._id = key
+                    elif kind == _NODE_COLUMNS:
+                        val = ColumnList._decode(val, hdefs, tables,
+                                                 template)
                     else:
-                        htype.validate(elem, self._line, self._file)
+                        elems = []
+                        for elem_id, elem in val:
+                            if elem_id is not None:
+                                elem = next(children)
+                                elem._id = elem_id
+                            elems.append(elem)
+                        val = elems
+                    dict.__setitem__(config, key, val)
+            decoded.append(config)
+        config = decoded.pop()
+        config._id = ident
+        return config
+
+    @property
+    def content_hash(self) -> str:
+        """Return a hash of the type and values of this object.
+
+        The hash is computed from the hashes of the nested objects and is
+        cached until an object is modified, e.g. by setting a value.
+        Objects with equal hashes have the same type and equal values,
+        the order of the keys does not matter. References are hashed as
+        the identifiers of the referred objects.
+        """
+        # Nested objects are hashed first.
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if node._cached_hash() is not None:
+                stack.pop()
+                continue
+            node.interpolate()
+            refs = node._reference_keys()
+            items = []
+            pending = []
+            for key, val in dict.items(node):
+                if key in refs:
+                    val = _ref_ids(val)
+                elif isinstance(val, HyperConfig):
+                    child = val
+                    val = child._cached_hash()
+                    if val is None:
+                        pending.append(child)
+                elif isinstance(val, ColumnList):
+                    # Rows of columnar lists have no nested objects.
+                    val = [(row._id, row.content_hash) for row in val]
+                elif isinstance(val, list):
+                    elems = []
+                    for elem in val:
+                        if isinstance(elem, HyperConfig):
+                            elem_hash = elem._cached_hash()
+                            if elem_hash is None:
+                                pending.append(elem)
+                            elem = (elem._id, elem_hash)
                         elems.append(elem)
-                self.update({
-                    ident: elems
-                })
+                    val = elems
+                items.append((key, val))
+            if pending:
+                stack.extend(reversed(pending))
+                continue
+            stack.pop()
+            items.sort()
+            hdef = node.__def__
+            content = repr((hdef.name if hdef is not None else None, items))
+            node._hash = hashlib.blake2b(content.encode(),
+                                         digest_size=16).hexdigest()
+            node._hashed = _generation
+        return self._hash
+
+    def _cached_hash(self) -> t.Optional[str]:
+        """Return the cached content hash, or None if it may be stale.
+
+        Objects do not know the objects they are nested in, which can be
+        several ones, so modifying an object invalidates the hashes of
+        all the objects that are not frozen.
+        """
+        if self._frozen or self._hashed == _generation:
+            return self._hash
+        return None
+
+    @staticmethod
+    def diff(a: "HyperConfig", b: "HyperConfig") -> ConfigDiff:
+        """Compare two configurations.
+
+        Objects that are shared by both configurations, e.g. by overlays
+        and their base, or that have equal content hashes are skipped
+        without being compared. The content hashes of objects that are
+        not hashed yet are computed first, which takes time proportional
+        to their size; later diffs only visit the changed paths.
+
+        :param a: the first configuration.
+        :param b: the second configuration.
+        :return: the added, removed and changed paths.
+
+        :Example:
+
+        >>> prod = HyperConfig.overlay(base, {"db": {"port": 5433}})
+        >>> HyperConfig.diff(base, prod).changed
+        [('db', 'port')]
+        """
+        if not isinstance(a, HyperConfig) or not isinstance(b, HyperConfig):
+            raise ValueError("a and b must be HyperConfig instances.")
+        a.interpolate()
+        b.interpolate()
+        result = ConfigDiff([], [], [])
+        a_hash = a._cached_hash()
+        if a is not b and not (a_hash is not None and
+                               a_hash == b._cached_hash()):
+            HyperConfig._diff(a, b, (), result)
+        return result
+
+    @staticmethod
+    def _diff(a: "HyperConfig", b: "HyperConfig", path: tuple,
+              result: ConfigDiff):
+        """Add the differences of two objects to result."""
+        # Object frames are (a, b, path, items), list frames are
+        # (None, None, path, pairs of elements).
+        stack = []
+        HyperConfig._diff_enter(a, b, path, result, stack)
+        while stack:
+            a, b, path, items = stack[-1]
+            if a is None:
+                for i, (elem, other_elem) in items:
+                    if isinstance(elem, HyperConfig) and\
+                       isinstance(other_elem, HyperConfig) and\
+                       elem._id == other_elem._id:
+                        if _hash_of(elem) != _hash_of(other_elem) and\
+                                HyperConfig._diff_enter(elem, other_elem,
+                                                        path + (i,), result,
+                                                        stack):
+                            break
+                    elif elem != other_elem or\
+                            type(elem) is not type(other_elem):
+                        result.changed.append(path + (i,))
+                else:
+                    stack.pop()
+                continue
+            b_get = b.get
+            refs = a._reference_keys()
+            for key, val in items:
+                other = b_get(key, _missing)
+                if other is val:
+                    continue
+                if other is _missing:
+                    result.removed.append(path + (key,))
+                elif key in refs:
+                    if _ref_ids(val) != _ref_ids(other):
+                        result.changed.append(path + (key,))
+                elif isinstance(val, HyperConfig) and\
+                        isinstance(other, HyperConfig):
+                    # Skip equal objects, nested hashes are computed once.
+                    if _hash_of(val) != _hash_of(other) and\
+                            HyperConfig._diff_enter(val, other,
+                                                    path + (key,), result,
+                                                    stack):
+                        break
+                elif isinstance(val, (list, ColumnList)) and\
+                        isinstance(other, (list, ColumnList)) and\
+                        len(val) == len(other):
+                    stack.append((None, None, path + (key,),
+                                  enumerate(zip(val, other))))
+                    break
+                elif val != other or type(val) is not type(other):
+                    result.changed.append(path + (key,))
+            else:
+                stack.pop()
+                for key in dict.keys(b):
+                    if key not in a:
+                        result.added.append(path + (key,))
+
+    @staticmethod
+    def _diff_enter(a: "HyperConfig", b: "HyperConfig", path: tuple,
+                    result: ConfigDiff, stack: list) -> bool:
+        """Push the frame comparing the values of two objects.
+
+        :return: False if the objects have different types, which is
+         added to result instead.
+        """
+        if a.__def__ is not b.__def__ and (
+                a.__def__ is None or b.__def__ is None or
+                a.__def__.name != b.__def__.name):
+            result.changed.append(path)
+            return False
+        stack.append((a, b, path, iter(dict.items(a))))
+        return True
+
+    def find_by_type(self, hdef: str | dsl.HyperDef) -> list:
+        """Return the values of a type found in this object.
+
+        Values are returned in document order. Objects of lists are
+        returned one by one, as well as the elements of lists of values.
+
+        :param hdef: the definition or its name, e.g. 'ship'.
+        :return: the nested objects and values of that type.
+
+        :Example:
+
+        >>> [ship.name for ship in config.find_by_type("ship")]
+        ['enterprise', 'voyager']
+        """
+        return [val for _, val in self.iter_type(hdef)]
+
+    def iter_type(self, hdef: str | dsl.HyperDef) ->\
+            t.Iterator[t.Tuple[tuple, t.Any]]:
+        """Iterate over the paths and values of a type.
+
+        The index of the types of the nested values is built on the first
+        call and cached until an object is modified, see
+        :meth:`content_hash`. Overlays have their own index.
+
+        :param hdef: the definition or its name.
+        :return: an iterator of (path, value), where paths are tuples of
+         keys and list indexes relative to this object, e.g.
+         ('fleet', 'ships', 0).
+        """
+        if hdef is None:
+            raise ValueError("hdef is None")
+        name = hdef.name if isinstance(hdef, dsl.HyperDef) else hdef
+        index = self._type_index
+        if index is None or not (self._frozen or
+                                 self._indexed == _generation):
+            self.interpolate()
+            index = {}
+            self._index_types((), index)
+            self._type_index = index
+            self._indexed = _generation
+        return iter(index.get(name, ()))
+
+    def _index_types(self, path: tuple, index: dict):
+        """Add the paths and values of the nested values to index."""
+        # Object frames are (node, path, types, items), list frames are
+        # (None, path, element type, elements).
+        stack = [(self, path, dict(self._types), iter(dict.items(self)))]
+        while stack:
+            node, path, types, items = stack[-1]
+            if node is None:
+                for i, elem in items:
+                    if isinstance(elem, HyperConfig):
+                        if elem.__def__ is not None:
+                            index.setdefault(elem.__def__.name, []).append(
+                                (path + (i,), elem))
+                        stack.append((elem, path + (i,),
+                                      dict(elem._types),
+                                      iter(dict.items(elem))))
+                        break
+                    if types is not None:
+                        index.setdefault(types.name, []).append(
+                            (path + (i,), elem))
+                else:
+                    stack.pop()
+                continue
+            for key, val in items:
+                val_path = path + (key,)
+                htype = types.get(key)
+                if htype is not None and htype.reference is not None:
+                    # Referred objects are indexed where they are declared.
+                    entries = index.setdefault(htype.name, [])
+                    if isinstance(val, list):
+                        entries.extend((val_path + (i,), elem)
+                                       for i, elem in enumerate(val))
+                    else:
+                        entries.append((val_path, val))
+                elif isinstance(val, HyperConfig):
+                    if val.__def__ is not None:
+                        index.setdefault(val.__def__.name, []).append(
+                            (val_path, val))
+                    stack.append((val, val_path, dict(val._types),
+                                  iter(dict.items(val))))
+                    break
+                elif isinstance(val, (list, ColumnList)):
+                    stack.append((None, val_path, htype, enumerate(val)))
+                    break
+                elif htype is not None:
+                    index.setdefault(htype.name, []).append(
+                        (val_path, val))
+            else:
+                stack.pop()
+
+    def to_dict(self, view: bool = False, typed: bool = False):
+        """Return the configuration values as plain Python objects.
+
+        Nested objects are converted to dicts and lists of objects to
+        lists of single-key dicts, as they are declared in YAML. Converted
+        values, e.g. pathlib.Path objects, are returned as they are.
+
+        :param view: if True, return a read-only view of this object
+         instead of a copy. Nested objects are not converted.
+        :param typed: if True, objects whose type cannot be inferred from
+         their identifier are keyed 'ident=type', so that the result can
+         be loaded again with the same schemas.
+        :return: a dict or a read-only mapping if view is True.
+        """
+        self.interpolate()
+        if view:
+            if typed:
+                raise ValueError("typed keys are not supported by views.")
+            return types.MappingProxyType(self)
+        if not typed:
+            return self._plain(False)
+        with dsl.ConfigDefs.namespace(self._namespace):
+            return self._plain(True)
+
+    def _plain(self, typed: bool) -> dict:
+        """Copy the values of this node into plain dicts and lists."""
+        root = {}
+        # Frames are (node, items, reference keys, values) for objects
+        # and (None, elements, None, values) for lists.
+        stack = [(self, iter(dict.items(self)), self._reference_keys(),
+                  root)]
+        while stack:
+            node, items, refs, values = stack[-1]
+            if node is None:
+                for elem in items:
+                    if isinstance(elem, HyperConfig):
+                        nested = {}
+                        values.append({elem._id: nested})
+                        stack.append((elem, iter(dict.items(elem)),
+                                      elem._reference_keys(), nested))
+                        break
+                    values.append(elem)
+                else:
+                    stack.pop()
+                continue
+            for ident, val in items:
+                if ident in refs:
+                    val = _ref_ids(val)
+                elif isinstance(val, HyperConfig):
+                    if typed:
+                        ident = node._decl_key(ident, val.__def__)
+                    nested = values[ident] = {}
+                    stack.append((val, iter(dict.items(val)),
+                                  val._reference_keys(), nested))
+                    break
+                elif isinstance(val, (list, ColumnList)):
+                    if typed:
+                        ident = node._decl_key(ident, _elem_def(val))
+                    elems = values[ident] = []
+                    stack.append((None, iter(val), None, elems))
+                    break
+                values[ident] = val
+            else:
+                stack.pop()
+        return root
+
+    def _plain_events(self, typed: bool) -> t.Iterator[tuple]:
+        """Iterate over the plain values of this node, see :meth:`to_dict`.
+
+        The values are returned as events in document order, so that they
+        can be written without copying the tree. Dicts and lists start
+        with (_MAPPING, key) and (_SEQUENCE, key) and end with (_END,),
+        other values are (_VALUE, key, value). Keys are None for this
+        node and in lists.
+        """
+        yield _MAPPING, None
+        # Object frames are (node, items, reference keys), list frames
+        # are (None, elements, None).
+        stack = [(self, iter(dict.items(self)), self._reference_keys())]
+        while stack:
+            node, items, refs = stack[-1]
+            if node is None:
+                for elem in items:
+                    if isinstance(elem, HyperConfig):
+                        # Objects of lists are single key dicts.
+                        yield _MAPPING, None
+                        yield _MAPPING, elem._id
+                        stack.append((None, iter(()), None))
+                        stack.append((elem, iter(dict.items(elem)),
+                                      elem._reference_keys()))
+                        break
+                    yield _VALUE, None, elem
+                else:
+                    stack.pop()
+                    yield (_END,)
+                continue
+            for ident, val in items:
+                if ident in refs:
+                    yield _VALUE, ident, _ref_ids(val)
+                elif isinstance(val, HyperConfig):
+                    if typed:
+                        ident = node._decl_key(ident, val.__def__)
+                    yield _MAPPING, ident
+                    stack.append((val, iter(dict.items(val)),
+                                  val._reference_keys()))
+                    break
+                elif isinstance(val, (list, ColumnList)):
+                    if typed:
+                        ident = node._decl_key(ident, _elem_def(val))
+                    yield _SEQUENCE, ident
+                    stack.append((None, iter(val), None))
+                    break
+                else:
+                    yield _VALUE, ident, val
             else:
-                htype.validate(val, self._line, self._file)
-                self.update({ident: htype.convert(val)})
+                stack.pop()
+                yield (_END,)
+
+    def _decl_key(self, ident: str, hdef: dsl.HyperDef) -> str:
+        """Return the key declaring ident with the type hdef."""
+        if hdef is None:
+            return ident
+        inferred = dsl.HyperDef.infer_type(ident, None, self.__def__)[1]
+        return ident if inferred is hdef else f"{ident}={hdef.name}"
+
+    def dump_yaml(self, stream: t.IO = None, typed: bool = False):
+        """Write the configuration values as YAML.
+
+        The values are written while the tree is walked, without copying
+        it, by the libyaml emitter when available. Converted values are
+        written as strings, e.g. paths.
+
+        :param stream: a text file object or None to return a string.
+        :param typed: write 'ident=type' keys, see :meth:`to_dict`.
+        :return: the YAML text if stream is None.
+        """
+        self.interpolate()
+        out = io.StringIO() if stream is None else stream
+        dumper = _Dumper(out, default_flow_style=False, allow_unicode=True,
+                         sort_keys=False)
+        try:
+            with dsl.ConfigDefs.namespace(self._namespace):
+                _emit_yaml(self._plain_events(typed), dumper)
+        finally:
+            dumper.dispose()
+        if stream is None:
+            return out.getvalue()
+
+    def dump_json(self, stream: t.IO = None, typed: bool = False,
+                  indent: int = None):
+        """Write the configuration values as JSON.
+
+        The values are written while the tree is walked, without copying
+        it. Paths are written as strings, dates in ISO format and sets
+        as lists.
+
+        :param stream: a text file object or None to return a string.
+        :param typed: write 'ident=type' keys, see :meth:`to_dict`.
+        :param indent: the JSON indentation or None for compact output.
+        :return: the JSON text if stream is None.
+        """
+        self.interpolate()
+        chunks = []
+        with dsl.ConfigDefs.namespace(self._namespace):
+            _write_json(self._plain_events(typed),
+                        chunks.append if stream is None else stream.write,
+                        indent)
+        if stream is None:
+            return "".join(chunks)
 
     def __getattr__(self, attr: str):
         """Return attribute value."""
         if attr is None:
             raise ValueError("attr is None")
         if attr not in self:
-            if attr not in self.__def__.options:
+            if attr not in self.__def__.resolved.options:
                 raise AttributeError(
                     f"Invalid configuration key '{attr}' for "
                     f"configuration object {self.__def__}"
@@ -229,10 +1370,1200 @@ class HyperConfig(dict):
         else:
             return self[attr]
 
+    def interpolate(self) -> "HyperConfig":
+        """Interpolate the values of a configuration loaded lazily.
+
+        A value such as 'http://${db.host}:${db.port}' is replaced by
+        the values found at the paths of its `${path}` references, which
+        are keys and list indexes from the root object separated by dots.
+        A value that is a single reference takes the referred value as it
+        is, e.g. an int. Referred values are interpolated first, each
+        value once, and the results are validated and converted by the
+        definition of the option. `$${` is written as a literal `${`.
+
+        Values are interpolated when the configuration is loaded, or when
+        they are first read if it is loaded with lazy=True, in which case
+        this method interpolates the remaining values. Hashing, comparing,
+        converting, pickling and freezing the configuration interpolate
+        all the values.
+
+        :raises ConfigurationError: for undefined paths, paths of objects
+         or lists and circular references.
+        :return: this object.
+        """
+        interpolator = self._interpolator
+        if interpolator is not None:
+            interpolator.resolve_all()
+        return self
+
+    def freeze(self) -> "HyperConfig":
+        """Make this object and all nested objects and lists read-only.
+
+        Frozen objects can be shared by threads without locking, see
+        :class:`hyperconf.handle.ConfigHandle`. Overlays of frozen
+        objects are not frozen, the objects they share with the base
+        configuration are.
+
+        :return: this object.
+        """
+        # Nested objects are frozen first, skip frozen subtrees.
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if node._frozen:
+                stack.pop()
+                continue
+            node.interpolate()
+            pending = []
+            lists = []
+            for key, val in dict.items(node):
+                if isinstance(val, HyperConfig):
+                    if not val._frozen:
+                        pending.append(val)
+                elif isinstance(val, list):
+                    pending.extend(elem for elem in val
+                                   if isinstance(elem, HyperConfig) and
+                                   not elem._frozen)
+                    if not isinstance(val, FrozenList):
+                        lists.append((key, val))
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            for key, val in lists:
+                dict.__setitem__(node, key, FrozenList(val))
+            node._hash = node._cached_hash()
+            if node._indexed != _generation:
+                node._type_index = None
+            node._frozen = True
+        return self
+
+    @property
+    def frozen(self) -> bool:
+        """Check if the object is read-only, see :meth:`freeze`."""
+        return self._frozen
+
+    def _modifying(self):
+        """Invalidate the cached hashes and type indexes before the object
+        is modified.
+
+        :raises NotImplementedError: if the object is frozen.
+        """
+        if self._frozen:
+            raise NotImplementedError("HyperConfig is frozen")
+        global _generation
+        _generation += 1
+
+    def __setitem__(self, key, val):
+        """Set a value unless the object is frozen."""
+        self._modifying()
+        dict.__setitem__(self, key, val)
+
+    def __setattr__(self, attr: str, val):
+        """Set a value, like setting the item, unless the object is frozen.
+
+        Attributes starting with '_' are internal attributes.
+        """
+        if attr[0] == "_":
+            object.__setattr__(self, attr, val)
+        else:
+            self[attr] = val
+
+    def __delattr__(self, attr: str):
+        """Not supported for values, read-only."""
+        if attr[0] == "_":
+            object.__delattr__(self, attr)
+        else:
+            del self[attr]
+
+    def update(self, *args, **kwargs):
+        """Update values unless the object is frozen."""
+        self._modifying()
+        dict.update(self, *args, **kwargs)
+
+    def setdefault(self, key, default=None):
+        """Set a missing value unless the object is frozen."""
+        self._modifying()
+        return dict.setdefault(self, key, default)
+
+    def pop(self, *args):
+        """Not supported by frozen objects."""
+        self._modifying()
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        """Not supported by frozen objects."""
+        self._modifying()
+        return dict.popitem(self)
+
+    def clear(self):
+        """Not supported by frozen objects."""
+        self._modifying()
+        dict.clear(self)
+
+    def __ior__(self, other):
+        """Update values unless the object is frozen."""
+        self._modifying()
+        return dict.__ior__(self, other)
+
     def __delitem__(self, v):
         """Not supported, read-only."""
         raise NotImplementedError("HyperConfig is read-only")
 
 
+class _PendingConfig(HyperConfig):
+    """An object with values that are interpolated when first read.
+
+    The objects of configurations loaded with lazy=True that contain
+    values to interpolate have this class until all their values are
+    interpolated, so that reading other objects is not slowed down.
+    """
+
+    def __getitem__(self, key):
+        """Return a value, interpolated if needed."""
+        val = dict.__getitem__(self, key)
+        if val.__class__ is _Interpolation:
+            val = self._interpolator.resolve(val)
+        return val
+
+    def get(self, key, default=None):
+        """Return a value, interpolated if needed, or default."""
+        val = dict.get(self, key, default)
+        if val.__class__ is _Interpolation:
+            val = self._interpolator.resolve(val)
+        return val
+
+    def items(self):
+        """Return the items, interpolating the values."""
+        self._resolve_pending()
+        return dict.items(self)
+
+    def values(self):
+        """Return the values, interpolated."""
+        self._resolve_pending()
+        return dict.values(self)
+
+    def __eq__(self, other):
+        """Compare the interpolated values."""
+        self._resolve_pending()
+        return dict.__eq__(self, other)
+
+    def _resolve_pending(self):
+        """Interpolate the values of this object."""
+        interpolator = self._interpolator
+        for val in list(dict.values(self)):
+            if val.__class__ is _Interpolation:
+                interpolator.resolve(val)
+
+
+class FrozenList(list):
+    """Read-only list of values of frozen configuration objects."""
+
+    def _read_only(self, *args, **kwargs):
+        """Not supported, read-only."""
+        raise NotImplementedError("FrozenList is read-only")
+
+    append = extend = insert = remove = pop = clear = sort = reverse =\
+        __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+
+    def __reduce__(self):
+        """Copies and pickles are plain lists."""
+        return list, (list(self),)
+
+
+class ColumnList(Sequence):
+    """Read-only list of objects stored as one column per option.
+
+    Lists of `columnar` options, whose type has only scalar options, are
+    stored as columns instead of one HyperConfig per element. Int and
+    float columns are stored as arrays. Elements are HyperConfig row
+    views created on access, they are frozen since changing them would
+    not change the list.
+
+    :Example:
+
+    >>> heads = config.model1.heads
+    >>> heads[0].name
+    'head1'
+    >>> heads.column("name")
+    ['head1', 'head2']
+    """
+
+    __slots__ = ("hdef", "_size", "_ids", "_columns", "_missing", "_row")
+
+    def __init__(self, hdef: dsl.HyperDef, ids: t.List[str],
+                 columns: t.Dict[str, t.Sequence],
+                 missing: t.Dict[str, t.Collection[int]],
+                 row: HyperConfig):
+        """Initialize a list from its columns.
+
+        :param hdef: the definition of the elements.
+        :param ids: the identifiers of the elements.
+        :param columns: the values of each option, in option order.
+        :param missing: the rows that do not declare an option, by option
+         name. Their values in the columns are None.
+        :param row: an empty object whose attributes are copied by rows.
+        """
+        self.hdef = hdef
+        self._size = len(ids)
+        # Elements usually have the same identifier, e.g. 'head'.
+        self._ids = ids[0] if ids and ids.count(ids[0]) == len(ids)\
+            else list(ids)
+        self._columns = columns
+        self._missing = missing
+        self._row = row
+
+    @staticmethod
+    def build(hdef: dsl.HyperDef, seq: list, parent: HyperConfig,
+              source_map: source.SourceMap = None) -> "ColumnList":
+        """Validate a list of object declarations column by column.
+
+        The structure of every element and the validators of hdef are
+        checked first, then the values of each option are validated and
+        converted together.
+
+        :param hdef: the definition of the elements.
+        :param seq: the parsed list of single-key dicts.
+        :param parent: the object declaring the list.
+        :param source_map: the source locations of the parsed values.
+        """
+        line, fname = parent._line, parent._file
+        opt_types = []
+        for name in hdef.resolved.options:
+            opt_type = dsl.HyperDef.infer_type(name, None, hdef)[1]
+            if opt_type is None or opt_type.resolved.options:
+                raise err.TemplateDefinitionError(
+                    name=hdef.name, line=hdef.line,
+                    config_path=hdef.def_file,
+                    message=f"Option '{name}' is not a scalar, columnar "
+                    "lists require types with scalar options only.")
+            opt_types.append((name, opt_type))
+
+        ids = []
+        decls = []
+        for i, elem in enumerate(seq):
+            try:
+                if not isinstance(elem, dict) or len(elem) != 1:
+                    raise err.ConfigurationError(
+                        f"Expecting a '{hdef.name}' object declaration, "
+                        f"found '{elem}'.", line=line, fname=fname)
+                elem_id, elem_decl = next(iter(elem.items()))
+                if not isinstance(elem_decl, dict):
+                    raise err.ConfigurationError(
+                        f"Invalid declaration '{elem_decl}' for "
+                        f"columnar type {hdef}.", line=line, fname=fname)
+                hdef.validate(elem_decl, line, fname)
+            except err.ConfigurationError as e:
+                if source_map is not None:
+                    e.locate(source_map.item_line(seq, i, line), fname)
+                raise
+            ids.append(elem_id)
+            decls.append(elem_decl)
+
+        columns = {}
+        missing = {}
+        for name, opt_type in opt_types:
+            rows = []
+            values = []
+            absent = []
+            for i, decl in enumerate(decls):
+                val = decl.get(name, _missing)
+                if val is _missing:
+                    absent.append(i)
+                else:
+                    rows.append(i)
+                    values.append(val)
+            try:
+                scalars = [v for v in values if not isinstance(v, list)]
+                if len(scalars) == len(values):
+                    opt_type.validate_many(values, line, fname)
+                    values = opt_type.convert_many(values, line, fname)
+                else:
+                    # Lists of values are validated, not converted.
+                    for j, val in enumerate(values):
+                        try:
+                            for elem in (val if isinstance(val, list)
+                                         else [val]):
+                                opt_type.validate(elem, line, fname)
+                            if not isinstance(val, list):
+                                values[j] = opt_type.convert(val, line,
+                                                             fname)
+                        except err.ConfigurationError as e:
+                            e.index = j
+                            raise
+            except err.ConfigurationError as e:
+                if source_map is not None:
+                    decl = decls[rows[e.index]]
+                    e.locate(source_map.key_line(decl, name, line), fname)
+                raise
+            if absent:
+                missing[name] = frozenset(absent)
+                column = [None] * len(decls)
+                for i, val in zip(rows, values):
+                    column[i] = val
+            else:
+                column = _typed_column(values)
+            columns[name] = column
+
+        row = HyperConfig.__new__(HyperConfig)
+        row.__dict__.update(parent.__dict__)
+        row.__dict__.update(_id=None, _hash=None, _type_index=None,
+                            _schemas=(), _frozen=True, __def__=hdef,
+                            _types=dsl.ConfigDefs.intern_types(
+                                tuple(opt_types)))
+        return ColumnList(hdef, ids, columns, missing, row)
+
+    def __len__(self):
+        """Return the number of elements."""
+        return self._size
+
+    def __getitem__(self, index):
+        """Return a row view or a list of row views for slices."""
+        if isinstance(index, slice):
+            return [self._make_row(i)
+                    for i in range(*index.indices(len(self)))]
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("ColumnList index out of range")
+        return self._make_row(index)
+
+    def __iter__(self):
+        """Iterate over row views."""
+        return (self._make_row(i) for i in range(len(self)))
+
+    def __eq__(self, other):
+        """Compare the rows with another list of objects."""
+        if not isinstance(other, (list, ColumnList)):
+            return NotImplemented
+        return len(self) == len(other) and\
+            all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Debug str representation."""
+        return f"ColumnList({self.hdef.name!r}, {len(self)} rows)"
+
+    def __reduce__(self):
+        """Not supported, ColumnList is pickled by HyperConfig."""
+        raise TypeError("ColumnList cannot be pickled by itself, pickle "
+                        "the configuration containing it.")
+
+    @property
+    def ids(self) -> t.List[str]:
+        """Return the identifiers of the elements."""
+        if isinstance(self._ids, list):
+            return list(self._ids)
+        return [self._ids] * len(self)
+
+    def column(self, name: str) -> t.Sequence:
+        """Return the values of an option.
+
+        Int and float columns are arrays, other columns are lists, in
+        which rows that do not declare the option have None values. The
+        returned column must not be modified.
+
+        :raises KeyError: if name is not an option of the elements.
+        """
+        return self._columns[name]
+
+    def to_numpy(self, name: str = None):
+        """Return columns as NumPy arrays.
+
+        Int and float columns are returned as read-only views of the
+        stored arrays, without copying, other columns are copied to
+        object arrays.
+
+        :param name: the option name or None for all the columns.
+        :return: an array or a dict of arrays by option name.
+        :raises ImportError: if NumPy is not installed.
+        """
+        import numpy
+
+        def convert(column):
+            if isinstance(column, array.array):
+                values = numpy.frombuffer(column, dtype=column.typecode)
+                values.flags.writeable = False
+                return values
+            return numpy.array(column, dtype=object)
+
+        if name is not None:
+            return convert(self._columns[name])
+        return {key: convert(column) for key, column in self._columns.items()}
+
+    def _encode(self, hdefs: dict, tables: dict) -> tuple:
+        """Encode the columns for pickling, see HyperConfig._encode."""
+        return (hdefs.setdefault(self.hdef, len(hdefs)),
+                _encode_types(self._row._types, hdefs, tables),
+                self._size, self._ids, self._columns, self._missing)
+
+    @staticmethod
+    def _decode(payload: tuple, hdefs: list, tables: dict,
+                template: HyperConfig) -> "ColumnList":
+        """Rebuild a list encoded by :meth:`_encode`."""
+        index, types, size, ids, columns, missing = payload
+        row = HyperConfig.__new__(HyperConfig)
+        row.__dict__.update(template.__dict__)
+        row.__dict__.update(_frozen=True, __def__=hdefs[index],
+                            _types=_decode_types(types, hdefs, tables))
+        columns_list = ColumnList.__new__(ColumnList)
+        columns_list.hdef = hdefs[index]
+        columns_list._size = size
+        columns_list._ids = ids
+        columns_list._columns = columns
+        columns_list._missing = missing
+        columns_list._row = row
+        return columns_list
+
+    def _make_row(self, index: int) -> HyperConfig:
+        """Return a frozen object holding the values of a row."""
+        row = HyperConfig.__new__(HyperConfig)
+        row.__dict__.update(self._row.__dict__)
+        row._id = self._ids[index] if isinstance(self._ids, list)\
+            else self._ids
+        missing = self._missing
+        for name, column in self._columns.items():
+            if name not in missing or index not in missing[name]:
+                dict.__setitem__(row, name, column[index])
+        return row
+
+
+# Typecodes of the arrays storing int and float columns.
+_ARRAY_TYPES = {int: "q", float: "d"}
+
+
+class _Linker:
+    """Replace the identifiers of references by the referred objects.
+
+    The top level objects of the root are the targets of references.
+    Objects are linked after the objects they refer to, which detects
+    circular references and makes sure that copied objects are referred
+    to by their copies.
+    """
+
+    def __init__(self, root: HyperConfig, lines: dict, copy: bool = False):
+        """Initialize a linker of the references of root.
+
+        :param root: the configuration, linked in place.
+        :param lines: (id(object), key) -> line of the references, the
+         line of the object is reported for the other references.
+        :param copy: if True, objects that are changed are copied instead
+         of being modified, as they may be shared with other
+         configurations.
+        """
+        self.root = root
+        self.lines = lines
+        self.copy = copy
+        refs = root._reference_keys()
+        # identifier -> top level object, as declared.
+        self.symbols = {key: val for key, val in dict.items(root)
+                        if isinstance(val, HyperConfig) and key not in refs}
+        # identifier -> linked top level object.
+        self.linked = {}
+        # identifiers of the top level objects being linked, in order.
+        self.visiting = {}
+        # (reference definition, object definition) pairs checked before.
+        self.accepted = set()
+
+    def link(self):
+        """Link the references of the root."""
+        root = self.root
+        types = dict(root._types)
+        changes = {}
+        for key, val in dict.items(root):
+            if key in self.symbols:
+                new = self.visit(key)
+            else:
+                frame = self.value_frame(root, types.get(key), key, val)
+                new = val if frame is None else self.run(frame)
+            if new is not val:
+                changes[key] = new
+        for key, val in changes.items():
+            dict.__setitem__(root, key, val)
+        root._hash = None
+        root._type_index = None
+        root._linked = True
+
+    def visit(self, ident: str) -> HyperConfig:
+        """Return the linked top level object ident."""
+        node = self.linked.get(ident)
+        if node is None:
+            frame = self.symbol_frame(ident)
+            node = self.linked[ident] if frame is None else self.run(frame)
+        return node
+
+    def run(self, frame: list):
+        """Return the value linked by a frame and the frames it starts.
+
+        Object frames are [_OBJECT, node, types, items, changes, ident,
+        key, value], where ident is the identifier of top level objects
+        and key and value those of the nested value being linked. List
+        frames are [_LIST, list, elements, next index, index being
+        linked] and reference frames [_REFS, node, key, definition,
+        value, identifiers, targets]. A reference to an object that is not
+        linked yet starts the frame of that object, the reference is
+        linked once it is done.
+        """
+        stack = [frame]
+        result = None
+        while stack:
+            frame = stack[-1]
+            kind = frame[0]
+            if kind == _OBJECT:
+                _, node, types, items, changes, ident, key, val = frame
+                if key is not _missing:
+                    # The nested value is linked.
+                    frame[6] = _missing
+                    if result is not val:
+                        changes[key] = result
+                for key, val in items:
+                    child = self.value_frame(node, types.get(key), key, val)
+                    if child is not None:
+                        frame[6], frame[7] = key, val
+                        stack.append(child)
+                        break
+                else:
+                    stack.pop()
+                    result = self.changed(node, changes)
+                    if ident is not None:
+                        self.visiting.popitem()
+                        self.linked[ident] = result
+            elif kind == _LIST:
+                _, val, elems, start, index = frame
+                if index >= 0:
+                    elems[index] = result
+                for index in range(start, len(elems)):
+                    elem = elems[index]
+                    if isinstance(elem, HyperConfig):
+                        child = self.object_frame(elem, None)
+                        if child is not None:
+                            frame[3], frame[4] = index + 1, index
+                            stack.append(child)
+                            break
+                else:
+                    stack.pop()
+                    if all(new is old for new, old in zip(elems, val)):
+                        result = val
+                    else:
+                        result = elems
+            else:
+                _, node, key, hdef, val, refs, targets = frame
+                while len(targets) < len(refs):
+                    ref = refs[len(targets)]
+                    target = self.target(node, key, hdef, ref)
+                    if target is None:
+                        # Link the referred object first.
+                        child = self.symbol_frame(
+                            ref._id if isinstance(ref, HyperConfig) else ref)
+                        if child is not None:
+                            stack.append(child)
+                            break
+                    else:
+                        targets.append(target)
+                else:
+                    stack.pop()
+                    if not isinstance(val, list):
+                        result = targets[0]
+                    elif all(new is old for new, old in zip(targets, val)):
+                        result = val
+                    else:
+                        result = targets
+        return result
+
+    def symbol_frame(self, ident: str) -> t.Optional[list]:
+        """Return the frame linking the top level object ident.
+
+        :return: None if the object is linked as it is.
+        """
+        symbol = self.symbols[ident]
+        frame = self.object_frame(symbol, ident)
+        if frame is None:
+            self.linked[ident] = symbol
+        else:
+            self.visiting[ident] = None
+        return frame
+
+    def object_frame(self, node: HyperConfig,
+                     ident: str = None) -> t.Optional[list]:
+        """Return the frame linking the values of node, if any."""
+        if node._frozen and not self.copy:
+            # Included files of new configurations are linked already.
+            return None
+        return [_OBJECT, node, dict(node._types), iter(dict.items(node)),
+                {}, ident, _missing, None]
+
+    def value_frame(self, node: HyperConfig, hdef: dsl.HyperDef, key: str,
+                    val) -> t.Optional[list]:
+        """Return the frame linking val, or None if it is not changed.
+
+        :param hdef: the definition of val if it is not an object.
+        """
+        if hdef is not None and hdef.reference is not None:
+            refs = val if isinstance(val, list) else [val]
+            return [_REFS, node, key, hdef, val, refs, []]
+        if isinstance(val, HyperConfig):
+            return self.object_frame(val)
+        if isinstance(val, list) and\
+                any(isinstance(elem, HyperConfig) for elem in val):
+            return [_LIST, val, list(val), 0, -1]
+        return None
+
+    def changed(self, node: HyperConfig, changes: dict) -> HyperConfig:
+        """Return node, or a copy if node is copied, with the changes."""
+        if not changes:
+            return node
+        if self.copy:
+            node = node._shallow_copy()
+        else:
+            node._hash = None
+        for key, val in changes.items():
+            dict.__setitem__(node, key, val)
+        return node
+
+    def target(self, node: HyperConfig, key: str, hdef: dsl.HyperDef,
+               ref) -> t.Optional[HyperConfig]:
+        """Return the linked object referred by ref.
+
+        :param ref: an identifier or an object linked before.
+        :return: None if the object is not linked yet.
+        """
+        ident = ref._id if isinstance(ref, HyperConfig) else ref
+        line = self.lines.get((id(node), key), node._line)
+        target = self.symbols.get(ident)
+        if target is None:
+            raise err.ConfigurationError(
+                f"Undefined reference '{ident}' for option '{key}'.",
+                line=line, fname=node._file)
+        if (hdef, target.__def__) not in self.accepted:
+            ref_type = dsl.ConfigDefs.get(hdef.reference)
+            if target.__def__ is None or ref_type is None or\
+               ref_type not in target.__def__.resolved.chain:
+                raise err.ConfigurationError(
+                    f"Invalid reference '{ident}' for option '{key}', "
+                    f"expecting a '{hdef.reference}' object.",
+                    line=line, fname=node._file)
+            self.accepted.add((hdef, target.__def__))
+        if ident in self.visiting:
+            cycle = list(self.visiting)
+            cycle = cycle[cycle.index(ident):] + [ident]
+            raise err.ConfigurationError(
+                f"Circular reference: {' -> '.join(cycle)}.",
+                line=line, fname=node._file)
+        return self.linked.get(ident)
+
+
+def _hash_of(node: HyperConfig) -> str:
+    """Return the content hash of node, the cached one if valid."""
+    if node._frozen or node._hashed == _generation:
+        return node._hash
+    return node.content_hash
+
+
+def _ref_ids(val):
+    """Return the identifiers of linked references."""
+    if isinstance(val, HyperConfig):
+        return val._id
+    if isinstance(val, list):
+        return [elem._id if isinstance(elem, HyperConfig) else elem
+                for elem in val]
+    return val
+
+
+class _Interpolation:
+    """A value with `${path}` references, interpolated once the
+    configuration is parsed."""
+
+    __slots__ = ("template", "parts", "hdef", "line", "fname", "path",
+                 "value")
+
+    def __init__(self, template: str, hdef: dsl.HyperDef, line: int,
+                 fname: str):
+        """Parse the references of template.
+
+        :param hdef: the definition of the option, which validates and
+         converts the interpolated value.
+        """
+        self.template = template
+        self.hdef = hdef
+        self.line = line
+        self.fname = fname
+        # Literal strings and paths, tuples of keys and list indexes.
+        self.parts = parts = []
+        pos = 0
+        for match in _INTERPOLATION.finditer(template):
+            start, end = match.span()
+            if start > pos:
+                parts.append(template[pos:start])
+            escape, name = match.groups()
+            if escape:
+                parts.append("${" + name + "}")
+            else:
+                keys = name.strip().split(".")
+                if not keys[0]:
+                    raise err.ConfigurationError(
+                        f"Empty interpolation in '{template}'.",
+                        line=line, fname=fname)
+                for i, key in enumerate(keys):
+                    if key.isdigit():
+                        keys[i] = int(key)
+                parts.append(tuple(keys))
+            pos = end
+        if pos < len(template):
+            parts.append(template[pos:])
+        # Set by _Interpolator.collect().
+        self.path = None
+        self.value = _missing
+
+    def copy(self) -> "_Interpolation":
+        """Return a copy that is not interpolated yet."""
+        return _Interpolation(self.template, self.hdef, self.line,
+                              self.fname)
+
+    def __repr__(self):
+        """Return the template, for debugging."""
+        return f"_Interpolation({self.template!r})"
+
+
+class _Interpolator:
+    """Interpolate the values of a configuration.
+
+    Values are interpolated in dependency order: the pending values a
+    value refers to are interpolated before it, with an explicit stack
+    that detects circular references. Each value is interpolated once
+    and written back to the objects that contain it.
+    """
+
+    def __init__(self, root: HyperConfig, interps: t.List[_Interpolation]):
+        """Initialize an interpolator of the values of root.
+
+        :param interps: the values to interpolate, in document order.
+        """
+        self.root = root
+        self.interps = interps
+        # id(value) -> (object, key) locations of the value.
+        self.sites = {}
+        # id(object) -> [object, number of pending values].
+        self.pending = {}
+        # The objects of the configuration, when lazy.
+        self.nodes = []
+
+    def start(self, lazy: bool):
+        """Interpolate the values now or, if lazy, when they are read."""
+        self.root._templates = tuple(self.collect())
+        if not lazy:
+            self.resolve_all()
+            return
+        for node in self.nodes:
+            node._interpolator = self
+        for node, _ in self.pending.values():
+            node.__class__ = _PendingConfig
+
+    def collect(self) -> t.List[tuple]:
+        """Find the locations of the values, in document order.
+
+        :return: the (path, value) pairs of the locations.
+        """
+        templates = []
+        seen = set()
+        stack = [(self.root, ())]
+        while stack:
+            node, path = stack.pop()
+            if id(node) in seen or node._frozen:
+                # Frozen objects, e.g. included files, are interpolated.
+                continue
+            seen.add(id(node))
+            self.nodes.append(node)
+            refs = node._reference_keys()
+            children = []
+            for key, val in dict.items(node):
+                if val.__class__ is _Interpolation:
+                    val_path = path + (key,)
+                    if val.path is None:
+                        val.path = val_path
+                    self.sites.setdefault(id(val), []).append((node, key))
+                    templates.append((val_path, val))
+                    entry = self.pending.setdefault(id(node), [node, 0])
+                    entry[1] += 1
+                elif key in refs:
+                    # Referred objects are found where they are declared.
+                    continue
+                elif isinstance(val, HyperConfig):
+                    children.append((val, path + (key,)))
+                elif isinstance(val, list):
+                    children.extend((elem, path + (key, i))
+                                    for i, elem in enumerate(val)
+                                    if isinstance(elem, HyperConfig))
+            stack.extend(reversed(children))
+        return templates
+
+    def resolve_all(self):
+        """Interpolate the pending values."""
+        for interp in self.interps:
+            if interp.value is _missing:
+                self.resolve(interp)
+        for node in self.nodes:
+            node.__dict__.pop("_interpolator", None)
+        self.nodes = []
+
+    def resolve(self, interp: _Interpolation):
+        """Return the interpolated value, interpolating it if needed."""
+        if interp.value is not _missing:
+            return interp.value
+        stack = [interp]
+        while stack:
+            current = stack[-1]
+            values = []
+            dep = self.lookup_all(current, values)
+            if dep is None:
+                stack.pop()
+                self.compute(current, values)
+            elif dep in stack:
+                cycle = stack[stack.index(dep):] + [dep]
+                raise err.ConfigurationError(
+                    "Circular interpolation: " +
+                    " -> ".join(_path_name(i.path) for i in cycle) + ".",
+                    line=dep.line, fname=dep.fname)
+            else:
+                stack.append(dep)
+        return interp.value
+
+    def lookup_all(self, interp: _Interpolation, values: list):
+        """Add the parts of interp to values, looking up the references.
+
+        :return: the first pending value referred by interp, if any.
+        """
+        for part in interp.parts:
+            if part.__class__ is tuple:
+                part = self.lookup(interp, part)
+                if part.__class__ is _Interpolation:
+                    if part.value is _missing:
+                        return part
+                    part = part.value
+            values.append(part)
+        return None
+
+    def lookup(self, interp: _Interpolation, path: tuple):
+        """Return the value at path, referred by interp."""
+        val = self.root
+        for key in path:
+            if isinstance(val, HyperConfig):
+                val = dict.get(val, key, _missing)
+            elif isinstance(val, (list, ColumnList)) and\
+                    key.__class__ is int and key < len(val):
+                val = val[key]
+            else:
+                val = _missing
+            if val is _missing:
+                break
+        if val is _missing or val is None:
+            raise err.ConfigurationError(
+                f"Undefined interpolation '${{{_path_name(path)}}}' "
+                f"in '{_path_name(interp.path)}'.",
+                line=interp.line, fname=interp.fname)
+        if isinstance(val, (HyperConfig, list, ColumnList)):
+            raise err.ConfigurationError(
+                f"Cannot interpolate '${{{_path_name(path)}}}' in "
+                f"'{_path_name(interp.path)}', it is not a scalar value.",
+                line=interp.line, fname=interp.fname)
+        return val
+
+    def compute(self, interp: _Interpolation, values: list):
+        """Interpolate a value from the values of its parts."""
+        if len(values) == 1 and interp.parts[0].__class__ is tuple:
+            # A single reference keeps the type of the referred value.
+            val = values[0]
+        else:
+            val = "".join(str(part) for part in values)
+        hdef = interp.hdef
+        hdef.validate(val, interp.line, interp.fname)
+        val = hdef.convert(val, interp.line, interp.fname)
+        interp.value = val
+        for node, key in self.sites.get(id(interp), ()):
+            if dict.get(node, key) is interp:
+                dict.__setitem__(node, key, val)
+            entry = self.pending.get(id(node))
+            if entry is not None:
+                entry[1] -= 1
+                if not entry[1]:
+                    node.__class__ = HyperConfig
+
+
+def _references(value: str) -> t.Tuple[str, ...]:
+    """Return the top level identifiers that a YAML value may refer to.
+
+    Any value may be the identifier of a referred object, the schemas are
+    not known when the declarations to load are selected.
+    """
+    return (value,)
+
+
+def _dependencies(value: str) -> t.Tuple[str, ...]:
+    """Return the top level identifiers that a YAML value may refer to or
+    be interpolated from, see :func:`_references`.
+
+    Values with `${path}` references refer to the first key of each path.
+    """
+    if "${" not in value:
+        return (value,)
+    return tuple(name.strip().split(".", 1)[0]
+                 for escape, name in _INTERPOLATION.findall(value)
+                 if not escape)
+
+
+def _elem_def(elems: t.Sequence):
+    """Return the definition of the last object of a list, if any."""
+    return next((elem.__def__ for elem in reversed(elems)
+                 if isinstance(elem, HyperConfig)), None)
+
+
+def _path_name(path: tuple) -> str:
+    """Return a path as written in `${path}` references."""
+    return ".".join(str(key) for key in path)
+
+
+def _declares(values: dict, path: tuple) -> bool:
+    """Check if the parsed declarations set the value at path.
+
+    Declarations that replace an object on the path set the value too.
+    """
+    for key in path:
+        if not isinstance(values, dict):
+            return True
+        for decl_name, val in values.items():
+            if decl_name == key or isinstance(decl_name, str) and\
+                    decl_name.split("=", 1)[0] == key:
+                values = val
+                break
+        else:
+            return False
+    return True
+
+
+def _typed_column(values: list) -> t.Sequence:
+    """Return values as an array if they are all ints or all floats."""
+    if values:
+        kind = type(values[0])
+        typecode = _ARRAY_TYPES.get(kind)
+        if typecode is not None and all(type(v) is kind for v in values):
+            try:
+                return array.array(typecode, values)
+            except OverflowError:
+                pass
+    return values
+
+
+_missing = object()
+
+# Incremented when an object is modified. Hashes and type indexes cached
+# by objects that are not frozen are only valid in the generation they
+# were computed in.
+_generation = 0
+
+# Included files, see HyperConfig.fragment_cache.
+_fragments = FragmentCache()
+# (path, definition, name) of the files being included, to detect
+# circular includes.
+_including = contextvars.ContextVar("hyperconf_including", default=())
+
+# ${path} references, $${ is a literal ${.
+_INTERPOLATION = re.compile(r"\$(\$)?\{([^{}]*)\}")
+
+# Kinds of pickled nested values.
+_NODE, _NODE_LIST, _NODE_COLUMNS = range(3)
+
+# Kinds of construction and linking frames.
+_OBJECT, _LIST, _REFS = range(3)
+
+# Kinds of the events of plain values, see HyperConfig._plain_events.
+_MAPPING, _SEQUENCE, _END, _VALUE = range(4)
+
+
+def _encode_types(types: tuple, hdefs: dict, tables: dict) -> tuple:
+    """Replace the definitions of a type tuple by their indexes."""
+    # The type tuples are shared, encode each of them once.
+    encoded = tables.get(id(types))
+    if encoded is None:
+        encoded = tables[id(types)] = tuple(
+            (key, hdefs.setdefault(h, len(hdefs))) for key, h in types)
+    return encoded
+
+
+def _decode_types(encoded: tuple, hdefs: list, tables: dict) -> tuple:
+    """Rebuild a type tuple encoded by :func:`_encode_types`."""
+    types = tables.get(id(encoded))
+    if types is None:
+        types = tables[id(encoded)] = dsl.ConfigDefs.intern_types(
+            tuple((key, hdefs[i]) for key, i in encoded))
+    return types
+
+
+def _unpickle(namespace: str, schema_paths: t.List[str],
+              def_names: t.List[t.Tuple[str, str]],
+              fname: str, line: int, strict: bool, ident: str,
+              tree: t.List[tuple], linked: bool = False):
+    """Rebuild a pickled HyperConfig, see :meth:`HyperConfig.__reduce__`."""
+    # Load built-in types.
+    dsl.ConfigDefs.load_builtins()
+
+    with dsl.ConfigDefs.namespace(namespace):
+        schemas = tuple(dsl.ConfigDefs.use(path) for path in schema_paths)
+        hdefs = []
+        for name, fingerprint in def_names:
+            hdef = dsl.ConfigDefs.get(name)
+            if hdef is None:
+                raise err.UndefinedTagError(name, line, fname)
+            if hdef.fingerprint != fingerprint:
+                raise err.SchemaMismatchError(name, hdef.def_file)
+            hdefs.append(hdef)
+
+    # Nodes share the location of the root, like loaded child objects.
+    template = HyperConfig.__new__(HyperConfig)
+    template.__dict__.update(_line=line, _id=None, _strict=strict,
+                             _file=fname, _namespace=namespace,
+                             _hash=None, _type_index=None, _types=(),
+                             __def__=None, _schemas=())
+    with dsl.ConfigDefs.namespace(namespace):
+        config = HyperConfig._decode(ident, tree, hdefs, {}, template)
+        if linked:
+            _Linker(config, {}).link()
+    config._schemas = schemas
+    if schemas:
+        dsl.ConfigDefs.acquire(config, schemas)
+    return config
+
+
+class _Dumper(getattr(yaml, "CSafeDumper", yaml.SafeDumper)):
+    """Safe YAML dumper for configuration values."""
+
+    def ignore_aliases(self, data):
+        """Write repeated values in full instead of using anchors."""
+        return True
+
+
+_Dumper.add_multi_representer(
+    PurePath, lambda dumper, path: dumper.represent_str(path.as_posix()))
+
+
+def _emit_yaml(events: t.Iterable[tuple], dumper: _Dumper):
+    """Write a document of plain value events with a YAML dumper."""
+    dumper.open()
+    dumper.emit(yaml.DocumentStartEvent(explicit=False))
+    # True for the open mappings, whose keys are written, False for lists.
+    mappings = []
+    for event in events:
+        kind = event[0]
+        if kind == _END:
+            dumper.emit(yaml.MappingEndEvent() if mappings.pop()
+                        else yaml.SequenceEndEvent())
+            continue
+        if mappings and mappings[-1]:
+            _emit_node(dumper, dumper.represent_data(event[1]))
+        if kind == _MAPPING:
+            dumper.emit(yaml.MappingStartEvent(None, "tag:yaml.org,2002:map",
+                                               True, flow_style=False))
+            mappings.append(True)
+        elif kind == _SEQUENCE:
+            dumper.emit(yaml.SequenceStartEvent(None,
+                                                "tag:yaml.org,2002:seq",
+                                                True, flow_style=False))
+            mappings.append(False)
+        else:
+            _emit_node(dumper, dumper.represent_data(event[2]))
+    dumper.emit(yaml.DocumentEndEvent(explicit=False))
+    dumper.close()
+
+
+def _emit_node(dumper: _Dumper, node: yaml.Node):
+    """Write a represented value, like the serializer of the dumper."""
+    if isinstance(node, yaml.ScalarNode):
+        detected = dumper.resolve(yaml.ScalarNode, node.value, (True, False))
+        default = dumper.resolve(yaml.ScalarNode, node.value, (False, True))
+        dumper.emit(yaml.ScalarEvent(
+            None, node.tag, (node.tag == detected, node.tag == default),
+            node.value, style=node.style))
+    elif isinstance(node, yaml.SequenceNode):
+        implicit = node.tag == dumper.resolve(yaml.SequenceNode,
+                                              node.value, True)
+        dumper.emit(yaml.SequenceStartEvent(None, node.tag, implicit,
+                                            flow_style=node.flow_style))
+        for item in node.value:
+            _emit_node(dumper, item)
+        dumper.emit(yaml.SequenceEndEvent())
+    else:
+        implicit = node.tag == dumper.resolve(yaml.MappingNode,
+                                              node.value, True)
+        dumper.emit(yaml.MappingStartEvent(None, node.tag, implicit,
+                                           flow_style=node.flow_style))
+        for key, val in node.value:
+            _emit_node(dumper, key)
+            _emit_node(dumper, val)
+        dumper.emit(yaml.MappingEndEvent())
+
+
+def _write_json(events: t.Iterable[tuple], write: t.Callable[[str], t.Any],
+                indent: int = None):
+    """Write plain value events as JSON, formatted like json.dump."""
+    encoder = json.JSONEncoder(default=_json_value, indent=indent)
+    encode_key = json.encoder.encode_basestring_ascii
+    if indent is None:
+        separator = ", "
+    else:
+        separator = ","
+        if not isinstance(indent, str):
+            indent = " " * indent
+    # [is a mapping, number of items] of the open dicts and lists.
+    stack = []
+    for event in events:
+        kind = event[0]
+        if kind == _END:
+            mapping, count = stack.pop()
+            close = "}" if mapping else "]"
+            if count and indent is not None:
+                close = "\n" + indent * len(stack) + close
+            write(close)
+            continue
+        prefix = ""
+        if stack:
+            parent = stack[-1]
+            if parent[1]:
+                prefix = separator
+            parent[1] += 1
+            if indent is not None:
+                prefix += "\n" + indent * len(stack)
+            if parent[0]:
+                prefix += encode_key(event[1]) + ": "
+        if kind == _MAPPING:
+            write(prefix + "{")
+            stack.append([True, 0])
+        elif kind == _SEQUENCE:
+            write(prefix + "[")
+            stack.append([False, 0])
+        else:
+            val = event[2]
+            if val.__class__ is str:
+                text = encode_key(val)
+            elif val.__class__ is int:
+                text = int.__repr__(val)
+            else:
+                text = encoder.encode(val)
+                if indent is not None and stack:
+                    text = text.replace("\n", "\n" + indent * len(stack))
+            write(prefix + text)
+
+
+def _json_value(value):
+    """Return a JSON serializable form of converted values."""
+    if isinstance(value, PurePath):
+        return value.as_posix()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {value.__class__.__name__} "
+                    "is not JSON serializable")
+
+
 if __name__ == "__main__":
     config = HyperConfig.load_yaml("test_config.yaml")
@@ -0,0 +1,138 @@
+"""Discover schema files provided by installed packages.
+
+Packages advertise their schemas with an entry point of the
+`hyperconf.schemas` group whose value is the name of the package that
+contains the schema YAML files, e.g. in pyproject.toml::
+
+    [project.entry-points."hyperconf.schemas"]
+    ships = "my_package.schemas"
+
+The schema files of all packages are indexed by file name. The index is
+cached on disk, keyed by the Python environment and the modification
+times of the directories of the import path, which change when
+distributions are installed or removed. The current directory is not
+part of the key, it changes whenever a file is edited.
+"""
+import hashlib
+import json
+import os
+import sys
+import typing as t
+from pathlib import Path
+
+try:
+    from importlib import metadata
+except ImportError:
+    metadata = None
+from importlib import resources
+
+ENTRY_POINT_GROUP = "hyperconf.schemas"
+_CACHE_VERSION = 1
+
+
+def cache_dir() -> Path:
+    """Return the directory of the index cache.
+
+    The directory can be set with the HYPERCONF_CACHE_DIR environment
+    variable.
+    """
+    path = os.environ.get("HYPERCONF_CACHE_DIR")
+    if path:
+        return Path(path)
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))\
+        / "hyperconf"
+
+
+def entry_point_packages() -> t.List[str]:
+    """Return the schema packages advertised by installed distributions."""
+    if metadata is None:
+        return []
+    eps = metadata.entry_points()
+    if hasattr(eps, "select"):
+        eps = eps.select(group=ENTRY_POINT_GROUP)
+    else:
+        # Python < 3.10
+        eps = eps.get(ENTRY_POINT_GROUP, [])
+    packages = []
+    for ep in sorted(eps, key=lambda ep: ep.name):
+        package = ep.value.split(":", 1)[0].strip()
+        if package not in packages:
+            packages.append(package)
+    return packages
+
+
+def environment_key() -> str:
+    """Return a key that changes when distributions are installed."""
+    parts = [sys.prefix, sys.version, str(_CACHE_VERSION)]
+    cwd = os.getcwd()
+    for entry in sys.path:
+        if not entry or os.path.abspath(entry) == cwd:
+            continue
+        try:
+            mtime = os.stat(entry or ".").st_mtime_ns
+        except OSError:
+            mtime = None
+        parts.append(f"{entry}:{mtime}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32]
+
+
+def scan(packages: t.Iterable[str]) -> t.Dict[str, str]:
+    """Index the schema files of packages by file name.
+
+    Files of later packages replace files with the same name of earlier
+    packages. Packages that cannot be imported are skipped.
+
+    :return: a dict mapping file names to file paths.
+    """
+    index = {}
+    for package in packages:
+        try:
+            files = resources.files(package)
+            entries = list(files.iterdir())
+        except (ImportError, TypeError, OSError):
+            continue
+        for entry in entries:
+            if entry.name.endswith(".yaml") and entry.is_file():
+                index[entry.name] = str(entry)
+    return index
+
+
+def build_index(packages: t.Sequence[str],
+                refresh: bool = False) -> t.Dict[str, str]:
+    """Return the index of the schema files of packages.
+
+    The packages advertised by entry points are indexed after the given
+    packages, so their files replace files with the same name.
+
+    :param packages: the packages to index first.
+    :param refresh: if True, scan the packages instead of reading the
+     cached index. The cache is updated in both cases and the indexes of
+     other environment keys are removed.
+    :return: a dict mapping file names to file paths.
+    """
+    packages = list(packages)
+    cache_path = cache_dir() / f"schema-index-{environment_key()}.json"
+    if not refresh:
+        try:
+            cached = json.loads(cache_path.read_text())
+            if cached.get("packages") == packages:
+                return cached["index"]
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+
+    index = scan(packages + [p for p in entry_point_packages()
+                             if p not in packages])
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(
+            f"{cache_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"packages": packages,
+                                        "index": index}))
+        os.replace(tmp_path, cache_path)
+        for stale in cache_path.parent.glob("schema-index-*.json"):
+            if stale != cache_path:
+                stale.unlink(missing_ok=True)
+    except OSError:
+        # The cache is optional, e.g. on read-only file systems.
+        pass
+    return index
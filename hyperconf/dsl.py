@@ -1,31 +1,30 @@
 """Defing the HyperConf template language."""
 import re
 import yaml
+import os
+import hashlib
 import importlib
+import threading
+import contextlib
+import contextvars
+import concurrent.futures
+import weakref
 import typing as t
 
-from yaml.loader import SafeLoader
-
-from pathlib import Path
-try:
-    from importlib import resources
-except ImportError:
-    raise ImportError("Could not find module importlib.resources."
-                      "Python versions <3.7 are not supported.")
+from pathlib import Path, PurePath
 import hyperconf.errors as err
-
-
-class _LineInfoLoader(SafeLoader):
-    """Adds line numbers to parsed yaml dicts."""
-
-    def construct_mapping(self, node, deep=False):
-        """Augument parsed nodes."""
-        mapping = super().construct_mapping(node, deep=deep)
-        mapping['__line__'] = node.start_mark.line + 1
-        return mapping
+import hyperconf.source as source
+import hyperconf.registry as registry
+import hyperconf.schema_sources as schema_sources
+import hyperconf.discovery as discovery
+from hyperconf.cache import ValueCache
+from hyperconf.compiler import compile_expr
 
 
 _id_synth = re.compile("^([_A-Za-z]+[_0-9A-Za-z]+)=?(.*)")
+_ref_synth = re.compile(r"^ref\[([_A-Za-z][_0-9A-Za-z]*)\]$")
+
+_not_cached = object()
 
 _module_names = ["re", "math", "pathlib"]
 _eval_imports = {
@@ -43,16 +42,60 @@ class Keywords:
     required = "required"
     default = "default"
     allow_multiple = "allow_many"
-    line = "__line__"
+    columnar = "columnar"
     use = "use"
-    HDef = [validator, converter, typename, required, allow_multiple, default]
+    include = "include"
+    pure = "pure"
+    HDef = [validator, converter, typename, required, allow_multiple, default,
+            pure, columnar]
+
+
+class ResolvedType:
+    """Flattened definition of a type and its base types.
+
+    A definition can extend another definition by naming it as its type,
+    e.g. `dir` has the type `str`. Resolving a definition follows these
+    references up to a root definition and composes the chain:
+
+    - validators run from the root to the most derived definition,
+    - converters are applied in the same order, each one converting the
+      result of the previous one,
+    - the most derived default value is used,
+    - options are merged, derived definitions override base options.
+    """
+
+    __slots__ = ("hdef", "chain", "validators", "converters",
+                 "default", "options", "pure")
+
+    def __init__(self, chain: t.List["HyperDef"]):
+        """Flatten a definition chain.
+
+        :param chain: the definitions, from the root to the most derived.
+        """
+        self.hdef = chain[-1]
+        self.chain = tuple(chain)
+        self.validators = tuple(h.compiled_validator for h in chain
+                                if h.validator is not None)
+        self.converters = tuple(h.compiled_converter for h in chain
+                                if h.converter)
+        self.default = next((h.default for h in reversed(chain)
+                             if h.default is not None), None)
+        self.options = {}
+        for hdef in chain:
+            self.options.update(hdef.options)
+        self.pure = all(h.pure for h in chain)
+
+    def __repr__(self):
+        """Debug str representation."""
+        return " -> ".join(h.name for h in self.chain)
 
 
 class HyperDef:
     """Provide type attributes."""
 
     @staticmethod
-    def parse(tname: str, tdef: dict, fname: str = None):
+    def parse(tname: str, tdef: dict, fname: str = None,
+              line: int = 0, source_map: "source.SourceMap" = None):
         """Parse a configuration object definition.
 
         :param tname: The name of the configuration object type.
@@ -61,6 +104,11 @@ class HyperDef:
         :type tdef: dict
         :param fname: The file name used for error reporting.
         :type fname: str
+        :param line: The line of the definition, used for error reporting.
+        :type line: int
+        :param source_map: The source locations of the parsed YAML, used to
+         report option line numbers.
+        :type source_map: SourceMap
 
         :raises ValueError: If preconditions are not met.
 
@@ -92,63 +140,65 @@ class HyperDef:
         if tdef is None:
             raise ValueError("tdef is None")
 
-        _tdef = tdef.copy()
-        if Keywords.line in _tdef:
-            def_line = _tdef[Keywords.line]
-            del _tdef[Keywords.line]
-
-        if tname is None:
-            raise ValueError("tname is None")
-        if _tdef is None or not isinstance(_tdef, dict):
+        if not isinstance(tdef, dict):
             raise ValueError("tdef must be a dictionary")
 
-        type_name = _tdef.get(Keywords.typename, tname)
-        is_required = _tdef.get(Keywords.required, False)
-        validator = _tdef.get(Keywords.validator, None)
-        converter = _tdef.get(Keywords.converter, None)
-        default = _tdef.get(Keywords.default, None)
+        def key_line(mapping, key, default):
+            if source_map is None:
+                return default
+            return source_map.key_line(mapping, key, default)
 
-        for k in Keywords.HDef:
-            if k in _tdef:
-                del _tdef[k]
+        type_name = tdef.get(Keywords.typename, tname)
+        is_required = tdef.get(Keywords.required, False)
+        validator = tdef.get(Keywords.validator, None)
+        converter = tdef.get(Keywords.converter, None)
+        default = tdef.get(Keywords.default, None)
+        allow_many = tdef.get(Keywords.allow_multiple, False)
+        is_pure = tdef.get(Keywords.pure, False)
 
         # Parse options.
         opts = []
-        for aname, aval in _tdef.items():
+        for aname, aval in tdef.items():
+            if aname in Keywords.HDef:
+                continue
+            opt_line = key_line(tdef, aname, line)
+
             if aval.__class__ not in [str, dict]:
                 raise err.TemplateDefinitionError(
                     name=tname,
-                    line=def_line,
+                    line=opt_line,
+                    config_path=fname,
                     message="Invalid type definition. Unsupported "
-                    f"YAML type '{_tdef.__class__}' for option definition.")
+                    f"YAML type '{aval.__class__}' for option definition.")
 
             if isinstance(aval, dict):
-                opt_line = def_line
-                if Keywords.line in aval:
-                    opt_line = aval[Keywords.line]
-                    del aval[Keywords.line]
-
                 # An option specified as dict.
                 for akey in aval.keys():
                     if akey not in Keywords.HDef:
                         raise err.TemplateDefinitionError(
                             name=tname,
-                            line=opt_line,
+                            line=key_line(aval, akey, opt_line),
+                            config_path=fname,
                             message="Invalid option definition: "
                             f"found unexpected key '{akey}'. "
                             "Please note that nesting definitions is "
                             "not allowed.")
                 opts.append(HyperDef(
                     name=aname,
-                    typename=aval.get(Keywords.typename, str),
+                    typename=aval.get(Keywords.typename, "str"),
                     required=aval.get(Keywords.required, False),
                     validator=aval.get(Keywords.validator, None),
                     converter=aval.get(Keywords.converter, None),
                     default=aval.get(Keywords.default, None),
+                    allow_multiple_values=aval.get(
+                        Keywords.allow_multiple, False),
+                    columnar=aval.get(Keywords.columnar, False),
+                    pure=aval.get(Keywords.pure, False),
                     line=opt_line,
                     fpath=fname))
             else:
-                opts.append(HyperDef(name=aname, typename=aval))
+                opts.append(HyperDef(name=aname, typename=aval,
+                                     line=opt_line, fpath=fname))
 
         return HyperDef(name=tname,
                         typename=type_name,
@@ -156,6 +206,10 @@ class HyperDef:
                         validator=validator,
                         converter=converter,
                         default=default,
+                        allow_multiple_values=allow_many,
+                        pure=is_pure,
+                        line=line,
+                        fpath=fname,
                         options=opts)
 
     @staticmethod
@@ -178,6 +232,11 @@ class HyperDef:
         but with different tags, 'database_config' and 'database_config1'
         respectively.
 
+        Inferred definitions are cached until the registry changes, by
+        type for 'ident=type' tags and by (decl_tag, hdef) otherwise. Only
+        the tags of defined types and options are cached, so that the
+        cache does not grow with the identifiers of the configurations.
+
         :param decl_tag:
         the object or option name.
         :param decl:
@@ -188,24 +247,48 @@ class HyperDef:
         if decl_tag is None:
             raise ValueError("decl_tag is None")
 
-        # Try to determine type from the tag.
-        ident, htype = _id_synth.match(decl_tag).groups()
-        if not htype and ConfigDefs.contains(ident):
-            htype = ident
-
-        if not htype and hdef:
-            # Failed to determine type from name/tag.
-            # Search the definition of the enclosing decl
-            # for an option with that name.
-            opt = [o for o_name, o in hdef.options.items() if o.name == ident]
-            if opt:
-                htype = opt[0].typename
-
-        if not htype:
+        infer_cache = ConfigDefs._ns().infer_cache
+        ident = None
+        if "=" in decl_tag:
+            ident, htype = _id_synth.match(decl_tag).groups()
+            key = ("=", htype)
+        else:
+            key = (decl_tag, hdef)
+        inferred = infer_cache.get(key)
+        if inferred is None:
+            if ident is None:
+                # Try to determine type from the tag.
+                ident, htype = _id_synth.match(decl_tag).groups()
+            if not htype and hdef:
+                # References are usually named after the referred type,
+                # e.g. 'fleet: ref[fleet]', the option type is used.
+                opt = hdef.resolved.options.get(ident)
+                if opt is not None and isinstance(opt.typename, str) and\
+                   _ref_synth.match(opt.typename):
+                    htype = opt.typename
+            if not htype and ConfigDefs.contains(ident):
+                htype = ident
+
+            if not htype and hdef:
+                # Failed to determine type from name/tag.
+                # Search the definition of the enclosing decl
+                # for an option with that name.
+                opt = hdef.resolved.options.get(ident)
+                if opt is not None:
+                    htype = opt.typename
+
+            inferred = (ident, bool(htype),
+                        ConfigDefs.get(htype) if htype else None)
+            if inferred[2] is not None:
+                infer_cache[key] = inferred
+
+        if ident is None:
+            ident = inferred[0]
+        _, resolved, found = inferred
+        if not resolved:
             # Default to the actual datatype.
-            htype = decl.__class__.__name__
-
-        return ident, ConfigDefs.get(htype) if htype else None
+            found = ConfigDefs.get(decl.__class__.__name__)
+        return ident, found
 
     def __init__(self, name,
                  typename=None,
@@ -216,7 +299,10 @@ class HyperDef:
                  converter: str = None,
                  default: str = None,
                  allow_multiple_values: bool = False,
-                 options: t.List = []):
+                 pure: bool = False,
+                 columnar: bool = False,
+                 options: t.List = [],
+                 reference: str = None):
         """ Initialize a configuration object definition.
 
         :param name:
@@ -231,6 +317,17 @@ class HyperDef:
          the path to the file containing this definition.
         :param line:
          the line at which the definition is specified.
+        :param pure:
+         whether the validator and converter results depend only on
+         the value, which allows caching them. Default: False.
+        :param columnar:
+         whether lists of objects declared for this option are stored
+         column by column, see :class:`hyperconf.config.ColumnList`.
+         Default: False.
+        :param reference:
+         the name of the type of the objects referred by values of this
+         type, for the 'ref[type]' definitions, see
+         :meth:`ConfigDefs.get`.
         """
         self.name = name
         self.typename = typename
@@ -242,12 +339,91 @@ class HyperDef:
         self.default = default
         self.options = {o.name: o for o in options}
         self.allow_multiple_values = allow_multiple_values
+        self.pure = pure
+        self.columnar = columnar
+        self.reference = reference
+        # Set when the definition is registered.
+        self.namespace = None
+        self._compiled_exprs = {}
+        self._fingerprint = None
 
     def __repr__(self):
         """Debug str representation."""
         return f"({self.name} "\
             f"{list(self.options.keys())})"
 
+    @property
+    def fingerprint(self) -> str:
+        """Return a digest of the definition and its options.
+
+        Definitions with equal fingerprints are parsed from the same
+        schema text, also in different processes.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(repr(self._signature()).encode(),
+                                     digest_size=12)
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def _signature(self) -> tuple:
+        """Return the attributes that define the type."""
+        return (self.name, repr(self.typename), self.required,
+                self.validator, self.converter, repr(self.default),
+                bool(self.allow_multiple_values), self.pure,
+                tuple(o._signature() for o in self.options.values()),
+                bool(self.columnar))
+
+    @property
+    def base(self) -> t.Optional[str]:
+        """Return the name of the base type or None for root types."""
+        if isinstance(self.typename, str) and self.typename != self.name:
+            return self.typename
+        return None
+
+    @property
+    def resolved(self) -> ResolvedType:
+        """Return the flattened definition of this type.
+
+        :raises TemplateDefinitionError: if a base type is not defined
+         or the type chain is circular.
+        """
+        return ConfigDefs.resolve(self)
+
+    @property
+    def compiled_validator(self):
+        """Return the validator compiled to a callable or None."""
+        return self._compiled(Keywords.validator, self.validator)
+
+    @property
+    def compiled_converter(self):
+        """Return the converter compiled to a callable or None."""
+        return self._compiled(Keywords.converter, self.converter)
+
+    @property
+    def validator_pattern(self):
+        """Return the recognised validator pattern or None.
+
+        See :class:`hyperconf.compiler.Pattern`.
+        """
+        compiled = self.compiled_validator
+        return compiled.pattern if compiled is not None else None
+
+    @property
+    def converter_pattern(self):
+        """Return the recognised converter pattern or None."""
+        compiled = self.compiled_converter
+        return compiled.pattern if compiled is not None else None
+
+    def _compiled(self, kind: str, source: str):
+        """Compile an expression once and cache it by source text."""
+        if source is None:
+            return None
+        compiled = self._compiled_exprs.get(kind)
+        if compiled is None or compiled.source is not source:
+            compiled = compile_expr(source, _eval_imports)
+            self._compiled_exprs[kind] = compiled
+        return compiled
+
     def set_defaults(self, decl: dict, in_place: bool = True):
         """Set default values for unspecified options.
 
@@ -264,7 +440,7 @@ class HyperDef:
             raise ValueError("expecting a dict instance for decl")
 
         opts = decl if in_place else decl.copy()
-        for opt_name, opt in self.options.items():
+        for opt_name, opt in self.resolved.options.items():
             if opt.required:
                 continue
             if opt_name not in opts:
@@ -274,100 +450,312 @@ class HyperDef:
 
 
     def validate(self, decl: dict, line: int=0, filename: str=None):
-        """Validate the structure and values from declaration."""
+        """Validate the structure and values from declaration.
+
+        The value is checked by the validators of this type and of
+        its base types, see :class:`ResolvedType`.
+        """
+        resolved = self.resolved
         # validate structure
         if type(decl) is dict:
-            decl_opts = list(decl.keys())
-            if Keywords.line in decl_opts:
-                decl_opts.remove(Keywords.line)
-
+            options = resolved.options
             # any required opt not specified => error
-            for opt_name, opt in self.options.items():
-                if opt_name in decl_opts:
-                    decl_opts.remove(opt_name)
-                elif opt.required:
+            for opt_name, opt in options.items():
+                if opt.required and opt_name not in decl:
                     raise err.ConfigurationError(
                         f"Missing required option {opt}",
                         line=line, fname=filename)
 
-
             # check if remaining are valid opt names
-            if any([opt not in self.options.keys()
-                    for opt in decl_opts]):
-                opt_names = [o for o in decl_opts
-                             if not o in self.options]
+            opt_names = [o for o in decl if o not in options]
+            if opt_names:
                 raise err.ConfigurationError(
                     f"Unkown options {opt_names} for definition {self}.",
                     line=line,
                     fname=filename
                 )
 
-        is_valid = True
-        err_msg = None
+        if not resolved.validators:
+            return
 
-        try:
-            context = _eval_imports.copy()
-            context.update({
-                "htype": self,
-                "hval": decl,
-            })
-            val_result = eval(
-                self.validator,
-                context
-            )
-            if isinstance(val_result, tuple):
-                is_valid, err_msg = val_result
+        cache = ConfigDefs._value_cache
+        if cache is not None and resolved.pure and cache.cacheable(decl):
+            key = (Keywords.validator, self, decl.__class__, decl)
+            outcome = cache.get(key)
+            if outcome is None:
+                outcome = self._check(resolved, decl)
+                cache.put(key, outcome)
+        else:
+            outcome = self._check(resolved, decl)
+
+        is_valid, err_msg = outcome
+        if not is_valid:
+            raise self._invalid(decl, err_msg, line, filename)
+
+    def validate_many(self, values: t.Sequence, line: int = 0,
+                      filename: str = None):
+        """Validate the values of a column of scalar values.
+
+        The values are checked like :meth:`validate` checks values that
+        are not dicts, the definition is resolved once for all values.
+
+        :raises ConfigurationError: for the first invalid value, the
+         position of the value is set as the index attribute of the error.
+        """
+        resolved = self.resolved
+        if not resolved.validators:
+            return
+        cache = ConfigDefs._value_cache
+        if cache is not None and not resolved.pure:
+            cache = None
+        check = self._check
+        for i, decl in enumerate(values):
+            if cache is not None and cache.cacheable(decl):
+                key = (Keywords.validator, self, decl.__class__, decl)
+                outcome = cache.get(key)
+                if outcome is None:
+                    outcome = check(resolved, decl)
+                    cache.put(key, outcome)
             else:
-                is_valid = val_result
+                outcome = check(resolved, decl)
+            if not outcome[0]:
+                e = self._invalid(decl, outcome[1], line, filename)
+                e.index = i
+                raise e
+
+    def _invalid(self, decl, err_msg, line: int, filename: str):
+        """Return the error raised for an invalid value."""
+        return err.ConfigurationError(
+            f"Invalid configuration value '{decl}' "
+            f"for type {self} "
+            f"{': ' + (str(err_msg) if err_msg else '')}",
+            line=line,
+            fname=filename
+        )
 
-            # Consider only bool values for False.
-            if not is_valid and\
-               not isinstance(is_valid, bool):
-                is_valid = True
-        except Exception as e:
-            err_msg = e
+    def _check(self, resolved: ResolvedType, decl):
+        """Run the validators on a value.
 
-        if not is_valid:
-            raise err.ConfigurationError(
-                f"Invalid configuration value '{decl}' "
-                f"for type {self} "
-                f"{': ' + (str(err_msg) if err_msg else '')}",
-                line=line,
-                fname=filename
-            )
+        :return: a (is_valid, error message) tuple.
+        """
+        for validator in resolved.validators:
+            is_valid = True
+            err_msg = None
+
+            try:
+                val_result = validator(decl, self)
+                if isinstance(val_result, tuple):
+                    is_valid, err_msg = val_result
+                else:
+                    is_valid = val_result
+
+                # Consider only bool values for False.
+                if not is_valid and\
+                   not isinstance(is_valid, bool):
+                    is_valid = True
+            except Exception as e:
+                err_msg = e
+            if not is_valid:
+                return is_valid, err_msg
+        return True, None
 
     def convert(self, decl, line: int=0, filename: str = None):
-        """Convert option value."""
+        """Convert option value.
+
+        The converters of the base types are applied first, see
+        :class:`ResolvedType`.
+        """
         if decl is None:
             raise ValueError("decl is None")
-        if not self.converter:
+        resolved = self.resolved
+        if not resolved.converters:
             return decl
+
+        cache = ConfigDefs._value_cache
+        cached = cache is not None and resolved.pure and\
+            cache.cacheable(decl)
+        if cached:
+            key = (Keywords.converter, self, decl.__class__, decl)
+            res = cache.get(key, _not_cached)
+            if res is not _not_cached:
+                return res
         try:
-            context = _eval_imports.copy()
-            context.update({
-                "htype": self,
-                "hval": decl,
-            })
-            res = eval(
-                self.converter,
-                context
-            )
-            return res
+            res = decl
+            for converter in resolved.converters:
+                res = converter(res, self)
         except Exception as e:
-            raise err.ConfigurationError(
-                f"Could not convert value '{decl}' "
-                f"for type {self}: {e}",
-                line=line,
-                fname=filename
-            )
+            raise self._not_converted(decl, e, line, filename)
+        if cached:
+            cache.put(key, res)
+        return res
+
+    def convert_many(self, values: t.Sequence, line: int = 0,
+                     filename: str = None) -> list:
+        """Convert the values of a column, see :meth:`convert`.
+
+        :raises ConfigurationError: for the first value that cannot be
+         converted, the position of the value is set as the index
+         attribute of the error.
+        """
+        if any(decl is None for decl in values):
+            raise ValueError("decl is None")
+        resolved = self.resolved
+        converters = resolved.converters
+        if not converters:
+            return list(values)
+        cache = ConfigDefs._value_cache
+        if cache is not None and not resolved.pure:
+            cache = None
+
+        converted = []
+        for i, decl in enumerate(values):
+            key = None
+            if cache is not None and cache.cacheable(decl):
+                key = (Keywords.converter, self, decl.__class__, decl)
+                res = cache.get(key, _not_cached)
+                if res is not _not_cached:
+                    converted.append(res)
+                    continue
+            try:
+                res = decl
+                for converter in converters:
+                    res = converter(res, self)
+            except Exception as e:
+                error = self._not_converted(decl, e, line, filename)
+                error.index = i
+                raise error
+            if key is not None:
+                cache.put(key, res)
+            converted.append(res)
+        return converted
+
+    def _not_converted(self, decl, cause: Exception, line: int,
+                       filename: str):
+        """Return the error raised for a value that cannot be converted."""
+        return err.ConfigurationError(
+            f"Could not convert value '{decl}' "
+            f"for type {self}: {cause}",
+            line=line,
+            fname=filename
+        )
 
 
-class ConfigDefs:
-    """Template definition parser and type registry."""
+# path -> (stamp, values, source map) of the schema files parsed ahead
+# by the schema file being loaded, see ConfigDefs.set_executor.
+_parsed_files = contextvars.ContextVar("hyperconf_parsed_files",
+                                       default=None)
+
+
+def _parse_schema_file(path: str, fname: str):
+    """Parse a schema file, in a worker of the executor.
+
+    :param path: the absolute path of the file.
+    :param fname: the path of the file as it is registered.
+    :return: the parsed values and their source map, without the YAML
+     nodes.
+    """
+    with open(path) as tfile:
+        defs, source_map = source.load(tfile, fname)
+    return defs, source_map.detach()
 
-    _typedefs = {}
-    _loaded_files = []
+
+class ConfigDefs:
+    """Template definition parser and type registry.
+
+    Definitions are registered in namespaces. The namespace used by
+    the current context is selected with :meth:`namespace`; names that
+    are not defined in a namespace are looked up in the default
+    namespace, which also holds the built-in types.
+    """
+
+    _namespaces = {
+        registry.DEFAULT_NAMESPACE:
+        registry.Namespace(registry.DEFAULT_NAMESPACE)
+    }
+    # Maximum number of definitions loaded from files or None.
+    _budget = None
+    _lock = threading.RLock()
+    # Sources of schemas that are not local files, e.g. URLs.
+    _sources = []
+    # Opt-in cache of validation and conversion results.
+    _value_cache = None
+    # Executor parsing the schema files used by a file, see set_executor.
+    _executor = None
     _search_packages = [__name__.split(".")[0]]
+    # Schema file name -> path, for the packages of the search path
+    # and the packages advertised by entry points.
+    _package_index = None
+    # True once the index was rebuilt by this process.
+    _package_rescanned = False
+
+    @staticmethod
+    def _ns(name: str = None) -> registry.Namespace:
+        """Return a namespace, by default the active one."""
+        if name is None:
+            name = registry.active()
+        ns = ConfigDefs._namespaces.get(name)
+        if ns is None:
+            ns = ConfigDefs._namespaces.setdefault(
+                name, registry.Namespace(name))
+        return ns
+
+    @staticmethod
+    @contextlib.contextmanager
+    def namespace(name: str):
+        """Use a namespace for registering and looking up definitions.
+
+        :param name: the namespace name, e.g. a tenant id.
+
+        :Example:
+
+        >>> with ConfigDefs.namespace("tenant-a"):
+        ...     config = HyperConfig.load_yaml("tenant-a/config.yaml")
+        """
+        if name is None:
+            raise ValueError("name is None")
+        token = registry._active.set(name)
+        try:
+            yield ConfigDefs._ns(name)
+        finally:
+            registry._active.reset(token)
+
+    @staticmethod
+    def current_namespace() -> str:
+        """Return the name of the active namespace."""
+        return registry.active()
+
+    @staticmethod
+    def intern_types(types: tuple) -> tuple:
+        """Return a shared copy of a tuple of (key, definition) pairs.
+
+        Configuration objects of the same type usually have children of
+        the same types, sharing the tuples saves memory.
+        """
+        if not types:
+            return ()
+        return ConfigDefs._ns().type_tables.setdefault(types, types)
+
+    @staticmethod
+    def drop_namespace(name: str):
+        """Remove a namespace and all its definitions."""
+        if name is None:
+            raise ValueError("name is None")
+        with ConfigDefs._lock:
+            if name == registry.DEFAULT_NAMESPACE:
+                ConfigDefs._namespaces[name] = registry.Namespace(name)
+                ConfigDefs._clear_caches()
+            else:
+                ConfigDefs._namespaces.pop(name, None)
+
+    @staticmethod
+    def _clear_caches(ns: registry.Namespace = None):
+        """Drop lookup results that may depend on ns."""
+        if ns is not None and ns.name != registry.DEFAULT_NAMESPACE:
+            ns.clear_caches()
+        else:
+            # Other namespaces fall back to the default one.
+            for other in ConfigDefs._namespaces.values():
+                other.clear_caches()
 
     @staticmethod
     def add(hdefs):
@@ -381,19 +769,59 @@ class ConfigDefs:
         if not isinstance(hdefs, list):
             hdefs = [hdefs]
 
+        ns = ConfigDefs._ns()
         for hdef in hdefs:
-            if hdef.name in ConfigDefs._typedefs:
+            if hdef.name in ns.typedefs:
                 raise err.DuplicateDefError(
-                    ConfigDefs._typedefs[hdef.name], hdef
+                    ns.typedefs[hdef.name], hdef
                 )
-            ConfigDefs._typedefs[hdef.name] = hdef
+            hdef.namespace = ns.name
+            for opt in hdef.options.values():
+                opt.namespace = ns.name
+            ns.typedefs[hdef.name] = hdef
+        ConfigDefs._clear_caches(ns)
 
     @staticmethod
     def get(tag: str):
-        """Return the definition for the tag or None."""
+        """Return the definition for the tag or None.
+
+        Tags of the form 'ref[type]' name a definition for references to
+        the top level objects of that type. Their values are the
+        identifiers of the objects, which are replaced by the objects once
+        the configuration is parsed, see :class:`HyperConfig`.
+        """
         if tag is None:
             raise ValueError("tag is None")
-        return ConfigDefs._typedefs.get(tag, None)
+        return ConfigDefs._lookup(ConfigDefs._ns(), tag)
+
+    @staticmethod
+    def _lookup(ns: registry.Namespace, tag: str):
+        """Find a definition, reloading it if it was evicted."""
+        hdef = ns.typedefs.get(tag)
+        if hdef is not None:
+            origin = ns.origins.get(tag)
+            if origin is not None:
+                origin.touch()
+            return hdef
+
+        path = ns.evicted.get(tag)
+        if path is not None:
+            with ConfigDefs.namespace(ns.name):
+                ConfigDefs._load_file(path)
+            return ns.typedefs.get(tag)
+        hdef = ns.references.get(tag)
+        if hdef is not None:
+            return hdef
+        match = _ref_synth.match(tag)
+        if match is not None:
+            hdef = HyperDef(name=tag, typename="str", pure=True,
+                            reference=match.group(1))
+            hdef.namespace = ns.name
+            return ns.references.setdefault(tag, hdef)
+        if ns.name != registry.DEFAULT_NAMESPACE:
+            return ConfigDefs._lookup(
+                ConfigDefs._ns(registry.DEFAULT_NAMESPACE), tag)
+        return None
 
     @staticmethod
     def contains(def_name: str):
@@ -404,18 +832,329 @@ class ConfigDefs:
         """
         if def_name is None:
             raise ValueError("def_name is None")
-        return def_name in ConfigDefs._typedefs
+        return ConfigDefs.get(def_name) is not None
 
     @staticmethod
     def clear():
-        """Remove all known type bindings."""
-        ConfigDefs._typedefs.clear()
-        ConfigDefs._loaded_files.clear()
+        """Remove all known type bindings, in every namespace."""
+        with ConfigDefs._lock:
+            ConfigDefs._namespaces.clear()
+            ConfigDefs._ns(registry.DEFAULT_NAMESPACE)
+        if ConfigDefs._value_cache is not None:
+            ConfigDefs._value_cache.clear()
+
+    @staticmethod
+    def resolve(hdef: HyperDef) -> ResolvedType:
+        """Return the flattened definition of a type.
+
+        Resolved definitions are cached until the registry changes.
+        Base types are looked up in the namespace of the definition.
+
+        :param hdef: a definition or a registered type name.
+        :raises TemplateDefinitionError: if a base type is not defined
+         or the type chain is circular.
+        """
+        if hdef is None:
+            raise ValueError("hdef is None")
+        if isinstance(hdef, str):
+            name = hdef
+            hdef = ConfigDefs.get(name)
+            if hdef is None:
+                raise err.TemplateDefinitionError(
+                    name=name, line=0,
+                    message=f"Undefined type '{name}'.")
+
+        ns = ConfigDefs._ns(hdef.namespace)
+        resolved = ns.resolved.get(hdef)
+        if resolved is not None:
+            return resolved
+
+        chain = [hdef]
+        while chain[-1].base is not None:
+            current = chain[-1]
+            base = ConfigDefs._lookup(
+                ConfigDefs._ns(current.namespace or ns.name), current.base)
+            if base is None:
+                raise err.TemplateDefinitionError(
+                    name=current.name,
+                    line=current.line,
+                    config_path=current.def_file,
+                    message=f"Undefined base type '{current.base}'.")
+            if base in chain:
+                names = [h.name for h in chain] + [base.name]
+                raise err.TemplateDefinitionError(
+                    name=hdef.name,
+                    line=hdef.line,
+                    config_path=hdef.def_file,
+                    message="Circular type definition: "
+                    f"{' -> '.join(names)}.")
+            chain.append(base)
+
+        resolved = ResolvedType(list(reversed(chain)))
+        ns.resolved[hdef] = resolved
+        return resolved
+
+    @staticmethod
+    def link() -> t.Dict[str, ResolvedType]:
+        """Resolve all definitions of the active namespace.
+
+        Linking checks that every base type is defined and that no type
+        chain is circular.
+
+        :return: a dict mapping type names to resolved definitions.
+        :raises TemplateDefinitionError: for undefined or circular
+         base types.
+        """
+        ns = ConfigDefs._ns()
+        return {name: ConfigDefs.resolve(hdef)
+                for name, hdef in list(ns.typedefs.items())}
+
+    @staticmethod
+    def set_budget(max_definitions: int = None):
+        """Limit the number of definitions loaded from schema files.
+
+        When the limit is exceeded, the least recently used schema files
+        that are not used by any live configuration are evicted. Their
+        definitions are loaded again the next time they are looked up.
+        Built-in types and definitions parsed from strings or dicts are
+        never evicted.
+
+        :param max_definitions: the limit, counting type and option
+         definitions, or None to disable eviction.
+        """
+        if max_definitions is not None and max_definitions < 0:
+            raise ValueError("max_definitions must not be negative")
+        ConfigDefs._budget = max_definitions
+        ConfigDefs._enforce_budget()
+
+    @staticmethod
+    def _enforce_budget():
+        """Evict unused schema files until the budget is met."""
+        budget = ConfigDefs._budget
+        if budget is None:
+            return
+        with ConfigDefs._lock:
+            namespaces = list(ConfigDefs._namespaces.values())
+            loaded = sum(ns.loaded_size for ns in namespaces)
+            if loaded <= budget:
+                return
+            candidates = sorted(
+                (f for ns in namespaces for f in ns.evictable()),
+                key=lambda f: f.last_used)
+            for schema in candidates:
+                ConfigDefs._evict(schema)
+                loaded -= schema.size
+                if loaded <= budget:
+                    break
+
+    @staticmethod
+    def _evict(schema: registry.SchemaFile):
+        """Remove the definitions of a schema file."""
+        ns = ConfigDefs._ns(schema.namespace)
+        if ns.files.get(schema.path) is not schema:
+            return
+        del ns.files[schema.path]
+        for name in schema.names:
+            if ns.origins.get(name) is schema:
+                del ns.origins[name]
+                ns.typedefs.pop(name, None)
+                ns.evicted[name] = schema.path
+        ConfigDefs._clear_caches(ns)
+
+    @staticmethod
+    def refresh() -> t.List[str]:
+        """Evict the schema files changed since they were loaded.
+
+        The definitions of a changed file are loaded again from the file
+        when they are next used. Pinned files and schemas from other
+        sources are not checked. Configurations that were already
+        parsed keep the definitions they were parsed with.
+
+        :return: the paths of the evicted files.
+        """
+        changed = []
+        with ConfigDefs._lock:
+            for ns in list(ConfigDefs._namespaces.values()):
+                for schema in list(ns.files.values()):
+                    if schema.stamp is None or schema.pinned:
+                        continue
+                    if registry.file_stamp(schema.path) != schema.stamp:
+                        ConfigDefs._evict(schema)
+                        changed.append(schema.path)
+        return changed
+
+    @staticmethod
+    def files() -> t.Dict[str, registry.SchemaFile]:
+        """Return the schema files loaded in the active namespace."""
+        return dict(ConfigDefs._ns().files)
+
+    @staticmethod
+    def use(template_path: str, line: int = 0,
+            ref_file: str = None) -> registry.SchemaFile:
+        """Load the definitions referred by a use directive.
+
+        Unlike :meth:`parse_yaml`, files that are already loaded are not
+        skipped, their record is returned.
+
+        :param template_path: the path or resource name of the file.
+        :param line: the line at which the use directive occurs.
+        :param ref_file: the file that contains the use directive.
+        :return: the schema file record, to be passed to :meth:`acquire`.
+        """
+        return ConfigDefs._load_files([template_path], line, ref_file)[0][0]
+
+    @staticmethod
+    def use_all(refs, line: int = 0,
+                ref_file: str = None) -> t.List[registry.SchemaFile]:
+        """Load the definitions referred by a use directive.
+
+        Remote schemas of a directive that lists several files are
+        fetched concurrently, then all the files are loaded in order.
+
+        :param refs: a path or a list of paths, see :meth:`use`.
+        :param line: the line at which the use directive occurs.
+        :param ref_file: the file that contains the use directive.
+        :return: the schema file records.
+        """
+        if isinstance(refs, str):
+            refs = [refs]
+        if not isinstance(refs, list) or\
+           not all(isinstance(ref, str) for ref in refs):
+            raise err.TemplateDefinitionError(
+                name=Keywords.use,
+                message=f"The built-in '{Keywords.use}' directive "
+                "must specify a file path or a list of file paths.",
+                line=line,
+                config_path=ref_file)
+
+        if len(refs) > 1 and ConfigDefs._sources:
+            loaded = ConfigDefs._ns().files
+            remote = {}
+            for ref in refs:
+                found = ConfigDefs._source_for(ref, ref_file)
+                if found is not None and found[1] not in loaded:
+                    remote.setdefault(found[0], []).append(found[1])
+            for schema_source, urls in remote.items():
+                schema_source.prefetch(urls)
+        return [schema for schema, _ in
+                ConfigDefs._load_files(refs, line, ref_file)]
+
+    @staticmethod
+    def add_source(schema_source: schema_sources.SchemaSource):
+        """Register a source of schemas, e.g. an HTTP server.
+
+        References of use directives that a source handles are loaded
+        from that source instead of the file system.
+
+        :param schema_source: the source.
+        """
+        if schema_source is None:
+            raise ValueError("schema_source is None")
+        if schema_source not in ConfigDefs._sources:
+            ConfigDefs._sources.append(schema_source)
+
+    @staticmethod
+    def remove_source(schema_source: schema_sources.SchemaSource):
+        """Unregister a source of schemas."""
+        if schema_source in ConfigDefs._sources:
+            ConfigDefs._sources.remove(schema_source)
+
+    @staticmethod
+    def _source_for(ref: str, ref_file: str = None):
+        """Find the source handling a reference.
+
+        :return: the source and the resolved reference or None for
+         local files.
+        """
+        ref = ConfigDefs._schema_ref(ref)
+        for schema_source in ConfigDefs._sources:
+            resolved = schema_source.resolve(ref, ref_file)
+            if schema_source.handles(resolved):
+                return schema_source, resolved
+        return None
+
+    @staticmethod
+    def _schema_ref(template_path) -> str:
+        """Return the reference to a schema, with the .yaml suffix."""
+        ref = template_path.as_posix()\
+            if isinstance(template_path, PurePath) else str(template_path)
+        return ref if ref.endswith(".yaml") else ref + ".yaml"
+
+    @staticmethod
+    def acquire(owner, schemas: t.Iterable[registry.SchemaFile]):
+        """Keep schema files loaded for as long as owner is alive.
+
+        The files, and the files they use, are not evicted until owner
+        is garbage collected.
+
+        :param owner: an object that supports weak references, e.g.
+         a HyperConfig.
+        :param schemas: the records returned by :meth:`use`.
+        """
+        with ConfigDefs._lock:
+            held = {}
+            pending = list(schemas)
+            while pending:
+                schema = pending.pop()
+                if schema.path in held:
+                    continue
+                held[schema.path] = schema
+                ns = ConfigDefs._ns(schema.namespace)
+                for path in schema.uses:
+                    dep = ns.files.get(path)
+                    if dep is None:
+                        with ConfigDefs.namespace(ns.name):
+                            dep = ConfigDefs._load_file(path)[0]
+                    pending.append(dep)
+
+            for schema in held.values():
+                schema.refs += 1
+                schema.touch()
+            weakref.finalize(owner, ConfigDefs._release,
+                             list(held.values()))
+        ConfigDefs._enforce_budget()
+
+    @staticmethod
+    def _release(schemas: t.List[registry.SchemaFile]):
+        """Drop references taken by :meth:`acquire`.
+
+        This runs from garbage collection, the files are evicted by the
+        next call that enforces the budget.
+        """
+        for schema in schemas:
+            schema.refs -= 1
+
+    @staticmethod
+    def enable_value_cache(maxsize: int = 4096) -> ValueCache:
+        """Cache validation and conversion results of pure types.
+
+        Results are cached for scalar values of definitions marked
+        with `pure: true`. Other values are validated and converted
+        on every use.
+
+        :param maxsize: maximum number of cached results.
+        :return: the cache, which provides hit and miss counters.
+        """
+        ConfigDefs._value_cache = ValueCache(maxsize)
+        return ConfigDefs._value_cache
+
+    @staticmethod
+    def disable_value_cache():
+        """Stop caching validation and conversion results."""
+        ConfigDefs._value_cache = None
+
+    @staticmethod
+    def value_cache():
+        """Return the value cache or None if caching is disabled."""
+        return ConfigDefs._value_cache
 
     @staticmethod
     def add_package(package_name: str):
         """Add a package to the def search path.
 
+        Packages advertised by `hyperconf.schemas` entry points are
+        found without being added, see :mod:`hyperconf.discovery`.
+
         Args:
         package_name (str): a Python package name.
         """
@@ -423,13 +1162,57 @@ class ConfigDefs:
             raise ValueError("package_name is None")
         if not package_name in ConfigDefs._search_packages:
             ConfigDefs._search_packages.append(package_name)
+            if ConfigDefs._package_index is not None:
+                ConfigDefs._package_index.update(
+                    discovery.scan([package_name]))
+
+    @staticmethod
+    def discover(refresh: bool = False) -> t.Dict[str, str]:
+        """Return the index of the schema files of packages.
+
+        The index is built once per interpreter from the search path
+        packages and the packages advertised by entry points. The part
+        for entry points is cached on disk.
+
+        :param refresh: if True, rebuild the index without the cache,
+         e.g. after installing a package.
+        :return: a dict mapping schema file names to paths.
+        """
+        index = ConfigDefs._package_index
+        if index is None or refresh:
+            packages = ConfigDefs._search_packages
+            index = discovery.build_index(packages[:1], refresh=refresh)
+            index.update(discovery.scan(packages[1:]))
+            ConfigDefs._package_index = index
+            if refresh:
+                ConfigDefs._package_rescanned = True
+        return index
+
+    @staticmethod
+    def _find_resource(name: str) -> t.Optional[str]:
+        """Return the path of a schema file provided by a package.
+
+        The packages are scanned again at most once per process, when a
+        file is not found in the index, so that missing files are not
+        looked up by every load. Use :meth:`discover` to scan them again.
+        """
+        path = ConfigDefs.discover().get(name)
+        if (path is None or not os.path.exists(path)) and\
+           not ConfigDefs._package_rescanned:
+            # Installed packages may have changed since indexing.
+            path = ConfigDefs.discover(refresh=True).get(name)
+        return path
 
     @staticmethod
-    def parse_dict(defs: t.Dict, fname: str = None):
+    def parse_dict(defs: t.Dict, fname: str = None,
+                   source_map: source.SourceMap = None):
         """Parse type definitions.
 
         :param defs: a dictionary containing type structure
         information (as nested dictionaries).
+        :param fname: the file containing the definitions.
+        :param source_map: the source locations of defs, if parsed
+        from YAML.
 
         :return: a list of :class:TypeDef definitions.
         """
@@ -445,32 +1228,30 @@ class ConfigDefs:
                 "definitions as top level YAML objects")
 
         typedefs = []
-        def_line = 0
 
         for tname, tdef in defs.items():
-            if tname == Keywords.line:
-                def_line = tdef
-                continue
+            def_line = source_map.key_line(defs, tname) if source_map else 0
 
             if tname == "use":
                 # Load referenced definitions.
-                if not isinstance(tdef, str):
-                    raise err.TemplateDefinitionError(
-                        name=Keywords.use,
-                        message=f"The built-in '{Keywords.use}' directive"
-                        "must specify a file path.",
-                        line=def_line)
-                ConfigDefs.parse_yaml(tdef, line=def_line, ref_file=fname)
+                deps = ConfigDefs.use_all(tdef, line=def_line, ref_file=fname)
+                parent = ConfigDefs._ns().files.get(fname)
+                if parent is not None:
+                    parent.uses.extend(dep.path for dep in deps
+                                       if dep.path not in parent.uses)
                 continue
 
             if isinstance(tdef, dict):
-                typedefs.append(HyperDef.parse(tname, tdef, fname))
+                typedefs.append(HyperDef.parse(tname, tdef, fname,
+                                               def_line, source_map))
             elif isinstance(tdef, str):
-                typedefs.append(HyperDef(name=tname, typename=tdef))
+                typedefs.append(HyperDef(name=tname, typename=tdef,
+                                         line=def_line, fpath=fname))
             else:
                 raise err.TemplateDefinitionError(
                     name=tname,
                     line=def_line,
+                    config_path=fname,
                     message="Invalid type definition. Unsupported "
                     f"YAML type {tdef.__class__} for type definition.")
 
@@ -479,9 +1260,9 @@ class ConfigDefs:
 
     @staticmethod
     def load_builtins():
-        """Load built-in types."""
-        ConfigDefs.parse_yaml("builtins")
-
+        """Load built-in types into the default namespace."""
+        with ConfigDefs.namespace(registry.DEFAULT_NAMESPACE):
+            ConfigDefs._load_file("builtins", pinned=True)
 
     @staticmethod
     def parse_yaml(template_path: str,
@@ -496,49 +1277,212 @@ class ConfigDefs:
         the line at which the use directive occurs.
         :param ref_file:
         the file that contains the use directive.
+        :return: the parsed definitions or None if the file was
+        already loaded.
         """
-        if template_path is None:
-            raise ValueError("template_path is None")
-        if not template_path.endswith(".yaml"):
-            template_path = template_path + ".yaml"
+        typedefs = ConfigDefs._load_files([template_path], line,
+                                          ref_file)[0][1]
+        ConfigDefs._enforce_budget()
+        return typedefs
 
-        template_path = Path(template_path)
+    @staticmethod
+    def set_executor(executor: concurrent.futures.Executor = None):
+        """Parse schema files concurrently.
+
+        When a schema file is loaded, the local files it uses, directly
+        or through other files, are read and parsed by the executor,
+        following the `use` directives of the parsed files. The
+        definitions are then registered in the same order as without an
+        executor, so that the same errors are raised, e.g.
+        :class:`DuplicateDefError`. Files are parsed in parallel by a
+        ProcessPoolExecutor, a ThreadPoolExecutor only overlaps reading
+        the files.
+
+        :param executor: the executor, which is not shut down by
+         ConfigDefs, or None to parse files one by one.
+
+        :Example:
+
+        >>> with ProcessPoolExecutor() as executor:
+        ...     ConfigDefs.set_executor(executor)
+        ...     ConfigDefs.parse_yaml("schemas/all.yaml")
+        """
+        ConfigDefs._executor = executor
 
-        if not template_path.exists():
-            # File not found. Search for a package resource
-            # in one of the packages listed in _search_path.
-            found_in_package = False
+    @staticmethod
+    def _load_files(refs: t.List[str], line: int = 0,
+                    ref_file: str = None) -> t.List[tuple]:
+        """Load schema files, parsing the files they use first.
 
-            for package_name in ConfigDefs._search_packages:
-                pkg_files = resources.files(package_name)
+        :return: the (schema file record, definitions) of the files, see
+         :meth:`_load_file`.
+        """
+        executor = ConfigDefs._executor
+        if executor is None or _parsed_files.get() is not None:
+            # Files used by a file are parsed with it.
+            return [ConfigDefs._load_file(ref, line, ref_file)
+                    for ref in refs]
+        token = _parsed_files.set(
+            ConfigDefs._parse_graph(refs, ref_file, executor))
+        try:
+            return [ConfigDefs._load_file(ref, line, ref_file)
+                    for ref in refs]
+        finally:
+            _parsed_files.reset(token)
 
-                package_path = pkg_files / template_path.name
-                if package_path.exists():
-                    found_in_package = True
-                    template_path = package_path
+    @staticmethod
+    def _parse_graph(refs: t.List[str], ref_file: str,
+                     executor: concurrent.futures.Executor) -> dict:
+        """Parse the local schema files reachable from refs.
 
-            if not found_in_package:
-                raise err.TemplateDefinitionError(
-                    name=Keywords.use,
-                    message=f"Failed to load template '{template_path}'. "
-                    "Could not find a file or a resource with that name.",
-                    line=line,
-                    config_path=ref_file)
+        Files are parsed as soon as a parsed file is found to use them.
+        Files that cannot be found or parsed are skipped, they fail when
+        they are loaded.
+
+        :return: path -> (stamp, values, source map) of the files that
+         are not loaded in the active namespace.
+        """
+        loaded = ConfigDefs._ns().files
+        parsed = {}
+        submitted = set()
+        futures = {}
+
+        def submit(ref, ref_file: str):
+            if not isinstance(ref, str) or\
+               ConfigDefs._source_for(ref, ref_file) is not None:
+                return
+            template_path = ConfigDefs._local_path(ref)
+            if template_path is None:
+                return
+            path = template_path.as_posix()
+            if path in submitted or path in loaded:
+                return
+            submitted.add(path)
+            # Stamp the file before it is read, so that a change made while
+            # it is parsed is seen as a change later.
+            stamp = registry.file_stamp(path)
+            # Workers may run in another directory.
+            future = executor.submit(_parse_schema_file,
+                                     os.path.abspath(path), path)
+            futures[future] = (path, stamp)
+
+        for ref in refs:
+            submit(ref, ref_file)
+        while futures:
+            done, _ = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                path, stamp = futures.pop(future)
+                try:
+                    defs, source_map = future.result()
+                except Exception:
+                    continue
+                parsed[path] = (stamp, defs, source_map)
+                uses = defs.get(Keywords.use)\
+                    if isinstance(defs, dict) else None
+                for ref in uses if isinstance(uses, list) else [uses]:
+                    submit(ref, path)
+        return parsed
+
+    @staticmethod
+    def _load_file(template_path, line: int = 0, ref_file: str = None,
+                   pinned: bool = False):
+        """Load a schema file into the active namespace.
 
-        if not template_path.as_posix() in ConfigDefs._loaded_files:
-            ConfigDefs._loaded_files.append(template_path.as_posix())
-            with open(template_path) as tfile:
+        :return: the schema file record and the parsed definitions or
+         None if the file was already loaded.
+        """
+        if template_path is None:
+            raise ValueError("template_path is None")
+
+        text = None
+        found = ConfigDefs._source_for(template_path, ref_file)
+        if found is not None:
+            schema_source, path = found
+            schema = ConfigDefs._ns().files.get(path)
+            if schema is None:
+                # Fetch outside of the lock, other threads can go on.
                 try:
-                    return ConfigDefs.parse_dict(
-                        yaml.load(tfile, Loader=_LineInfoLoader),
-                        fname=template_path.as_posix()
-                    )
-                except yaml.scanner.ScannerError as e:
+                    text = schema_source.fetch(path)
+                except OSError as e:
                     raise err.TemplateDefinitionError(
                         name=Keywords.use,
-                        message=f"Invalid YAML file: {e}",
+                        message=f"Failed to load template '{path}': {e}",
                         line=line,
                         config_path=ref_file)
+        else:
+            local_path = ConfigDefs._local_path(template_path)
+            if local_path is None:
+                raise err.TemplateDefinitionError(
+                    name=Keywords.use,
+                    message="Failed to load template "
+                    f"'{ConfigDefs._schema_ref(template_path)}'. Could "
+                    "not find a file or a resource with that name.",
+                    line=line,
+                    config_path=ref_file)
+            template_path = local_path
+            path = template_path.as_posix()
+
+        with ConfigDefs._lock:
+            ns = ConfigDefs._ns()
+            schema = ns.files.get(path)
+            if schema is not None:
+                schema.touch()
+                return schema, None
+
+            # Register the file first, use directives may refer back to it.
+            schema = registry.SchemaFile(path, ns.name, pinned)
+            parsed = _parsed_files.get()
+            prefetched = parsed.pop(path, None)\
+                if parsed is not None and text is None else None
+            if prefetched is not None:
+                schema.stamp = prefetched[0]
+            elif text is None:
+                schema.stamp = registry.file_stamp(path)
+            ns.files[path] = schema
+            try:
+                if prefetched is not None:
+                    defs, source_map = prefetched[1:]
+                elif text is not None:
+                    defs, source_map = source.load(text, path)
+                else:
+                    with open(template_path) as tfile:
+                        defs, source_map = source.load(tfile, path)
+                typedefs = ConfigDefs.parse_dict(
+                    defs, fname=path, source_map=source_map)
+            except yaml.scanner.ScannerError as e:
+                del ns.files[path]
+                raise err.TemplateDefinitionError(
+                    name=Keywords.use,
+                    message=f"Invalid YAML file: {e}",
+                    line=line,
+                    config_path=ref_file)
+            except BaseException:
+                del ns.files[path]
+                raise
+
+            schema.names = [hdef.name for hdef in typedefs]
+            schema.size = sum(1 + len(hdef.options) for hdef in typedefs)
+            for name in schema.names:
+                ns.origins[name] = schema
+                ns.evicted.pop(name, None)
+            return schema, typedefs
+
+    @staticmethod
+    def _local_path(template_path) -> t.Optional[Path]:
+        """Return the path of a local schema file or package resource.
+
+        :return: the path or None if the file is not found.
+        """
+        template_path = Path(ConfigDefs._schema_ref(template_path))
+        if not template_path.exists():
+            # File not found. Search for a package resource
+            # in the indexed packages.
+            package_path = ConfigDefs._find_resource(template_path.name)
+            if package_path is None:
+                return None
+            template_path = Path(package_path)
+        return template_path
 
     @staticmethod
     def parse_str(text: str):
@@ -550,6 +1494,5 @@ class ConfigDefs:
         if text is None:
             raise ValueError("text is None")
 
-        return ConfigDefs.parse_dict(
-            yaml.load(text, Loader=_LineInfoLoader)
-        )
+        defs, source_map = source.load(text)
+        return ConfigDefs.parse_dict(defs, source_map=source_map)
@@ -11,15 +11,40 @@ class HyperConfError(Exception):
         Args:
         message (str): the tag name where the error occurs.
         """
+        self.message = message
+        self.line = line
+        self.config_path = config_path
+        self.located = False
+        super().__init__(self._format())
+
+    def _format(self) -> str:
+        """Format the message and location."""
         line_info = ""
+        if self.line:
+            line_info += f"at line {str(self.line)}"
+        if self.config_path:
+            line_info += f", in '{str(self.config_path)}'"
+        return f"{self.message} ({line_info})" if\
+            line_info != "" else self.message
+
+    def locate(self, line: int, config_path: str = None):
+        """Set the location of the error.
+
+        Errors are located by the innermost declaration that fails,
+        once located the location does not change.
+
+        Args:
+        line (int): the line of the failing declaration.
+        config_path (str): the file containing the declaration.
+        """
+        if self.located:
+            return
+        self.located = True
         if line:
-            line_info += f"at line {str(line)}"
+            self.line = line
         if config_path:
-            line_info += f", in '{str(config_path)}'"
-        message = f"{message} ({line_info})" if\
-            line_info != "" else message
-
-        super().__init__(message)
+            self.config_path = config_path
+        self.args = (self._format(),)
 
 
 class TemplateDefinitionError(HyperConfError):
@@ -72,8 +97,7 @@ class UndefinedTagError(HyperConfError):
         line (int): line number where the definition occurs.
         config_path (str): template definition file path.
         """
-        super().__init__
-        (
+        super().__init__(
             f"Could not find a definition for tag {name}",
             line, config_path
         )
@@ -89,8 +113,7 @@ class UnknownDataTypeError(HyperConfError):
         Arguments:
         type_name (str): the unknown type name.
         """
-        super().__init__
-        (
+        super().__init__(
             f"The data type {type_name} is not supported.",
             line, config_path
         )
@@ -106,8 +129,7 @@ class UnkownOptionError(HyperConfError):
         object_name (str): configuration object name.
         opt_name (str): option name.
         """
-        super().__init__
-        (
+        super().__init__(
             f"The object {object_name} does not support "
             f"option {arg_name}."
         )
@@ -127,6 +149,23 @@ class ConfigurationError(HyperConfError):
         super().__init__(message, line, fname)
 
 
+class SchemaMismatchError(HyperConfError):
+    """Signals that a definition differs from the one that was expected."""
+
+    def __init__(self, name: str, config_path: str = None):
+        """Initialize a SchemaMismatchError.
+
+        Arguments:
+        name (str): the definition name.
+        config_path (str): the file containing the definition.
+        """
+        super().__init__(
+            f"The definition of type {name} does not match the "
+            "definition used by the configuration.",
+            None, config_path
+        )
+
+
 class DuplicateMappingError(HyperConfError):
     """Signals that a tag is already mapped to a class."""
 
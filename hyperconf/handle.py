@@ -0,0 +1,97 @@
+"""Share configurations with threads of long running services."""
+import threading
+import typing as t
+
+from hyperconf.config import HyperConfig
+
+
+class ConfigHandle:
+    """A reference to the current configuration of a service.
+
+    The handle holds a frozen configuration that is replaced as a whole
+    when the configuration is reloaded. Readers never lock, they get the
+    configuration published last and keep using the same snapshot, which
+    cannot change, for as long as they need a consistent view. Writers
+    are serialized.
+
+    :Example:
+
+    >>> handle = ConfigHandle(HyperConfig.load_yaml("service.yaml"))
+    >>> def handle_request(request):
+    ...     config = handle.config
+    ...     return config.db.host, config.db.port
+    >>> handle.publish(HyperConfig.load_yaml("service.yaml"))
+    >>> handle.overlay({"db": {"port": 5433}})
+    """
+
+    def __init__(self, config: HyperConfig):
+        """Initialize a handle publishing config.
+
+        :param config: the initial configuration, it is frozen.
+        """
+        if config is None or not isinstance(config, HyperConfig):
+            raise ValueError("config must be a HyperConfig instance.")
+        self._lock = threading.Lock()
+        # The configuration and its version are swapped together.
+        self._current = (config.freeze(), 0)
+
+    @property
+    def config(self) -> HyperConfig:
+        """Return the current configuration."""
+        return self._current[0]
+
+    @property
+    def version(self) -> int:
+        """Return the number of configurations published after the first."""
+        return self._current[1]
+
+    def snapshot(self) -> t.Tuple[HyperConfig, int]:
+        """Return the current configuration and its version."""
+        return self._current
+
+    def publish(self, config: HyperConfig) -> HyperConfig:
+        """Replace the current configuration.
+
+        :param config: the new configuration, it is frozen before being
+         published.
+        :return: the replaced configuration.
+        """
+        if config is None or not isinstance(config, HyperConfig):
+            raise ValueError("config must be a HyperConfig instance.")
+        config.freeze()
+        with self._lock:
+            previous, version = self._current
+            self._current = (config, version + 1)
+        return previous
+
+    def update(self, func: t.Callable[[HyperConfig], HyperConfig]) ->\
+            HyperConfig:
+        """Replace the configuration by a configuration derived from it.
+
+        func is called while other writers wait, so that no update is
+        lost.
+
+        :param func: a function returning the new configuration given the
+         current one.
+        :return: the new configuration.
+        """
+        with self._lock:
+            current, version = self._current
+            config = func(current)
+            if config is None or not isinstance(config, HyperConfig):
+                raise ValueError("func must return a HyperConfig instance.")
+            config.freeze()
+            self._current = (config, version + 1)
+        return config
+
+    def overlay(self, *overlays) -> HyperConfig:
+        """Apply overlays to the current configuration and publish it.
+
+        Only the objects changed by the overlays are copied and frozen,
+        see :meth:`HyperConfig.overlay`.
+
+        :param overlays: dicts or YAML file paths.
+        :return: the new configuration.
+        """
+        return self.update(lambda config: HyperConfig.overlay(config,
+                                                              *overlays))
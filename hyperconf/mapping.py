@@ -1,6 +1,7 @@
 """Provide support for mapping configuration tags to classes."""
+import inspect
 from typing import Type
-from hyperconf.config import HyperConfig
+from hyperconf.config import ColumnList, HyperConfig
 from hyperconf.errors import DuplicateMappingError
 
 
@@ -9,12 +10,59 @@ def hypermap(tag: str):
     """
     if tag is None:
         raise ValueError("tag is None")
-    
+
     def _decorator(cls: Type):
         HyperMap.register(tag, cls)
+        return cls
     return _decorator
 
 
+class _ConstructorPlan:
+    """Constructor information for a mapped class and definition.
+
+    Plans are computed once per (class, definition) pair so that
+    instantiating many objects of the same type does not inspect
+    the class constructor again.
+    """
+
+    __slots__ = ("cls", "hdef", "fields", "var_kw")
+
+    def __init__(self, cls: Type, hdef):
+        """Inspect the constructor of cls against the options of hdef.
+
+        :param cls: the mapped class.
+        :param hdef: the definition of the configuration objects.
+        """
+        self.cls = cls
+        self.hdef = hdef
+
+        params = inspect.signature(cls).parameters
+        self.var_kw = any(p.kind == inspect.Parameter.VAR_KEYWORD
+                          for p in params.values())
+        accepted = {name for name, p in params.items()
+                    if p.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                                  inspect.Parameter.KEYWORD_ONLY)}
+
+        # Each field is (option name, argument name, nested class, many).
+        fields = []
+        options = hdef.resolved.options if hdef is not None else {}
+        for opt_name, opt in options.items():
+            if opt_name in accepted:
+                arg = opt_name
+            elif opt_name + "_" in accepted:
+                # Options named after Python keywords, e.g. 'class'.
+                arg = opt_name + "_"
+            elif self.var_kw:
+                arg = opt_name
+            else:
+                continue
+            nested = HyperMap.get_class(opt.typename)\
+                if isinstance(opt.typename, str) else None
+            fields.append((opt_name, arg, nested,
+                           bool(opt.allow_multiple_values)))
+        self.fields = tuple(fields)
+
+
 class HyperMap:
     """Maintain a class registry.
 
@@ -26,6 +74,7 @@ class HyperMap:
 
     _tag2class = {}
     _class2tag = {}
+    _plans = {}
 
     @staticmethod
     def register(tag: str, cls: Type):
@@ -43,12 +92,14 @@ class HyperMap:
             raise DuplicateMappingError(
                 tag, HyperMap._tag2class
             )
-            
+
         HyperMap._tag2class[tag] = cls
         if cls not in HyperMap._class2tag:
             HyperMap._class2tag[cls] = [tag]
         else:
             HyperMap._class2tag[cls].append(tag)
+        # Nested types of existing plans may have changed.
+        HyperMap._plans.clear()
 
     @staticmethod
     def get_class(tag: str):
@@ -65,7 +116,85 @@ class HyperMap:
             else:
                 # not a str or a hyperconf object
                 raise ValueError("tag must be str or HyperConfig instance")
-            
+
         if tag not in HyperMap._tag2class:
             return None
         return HyperMap._tag2class[tag]
+
+    @staticmethod
+    def clear():
+        """Remove all tag to class mappings."""
+        HyperMap._tag2class.clear()
+        HyperMap._class2tag.clear()
+        HyperMap._plans.clear()
+
+    @staticmethod
+    def instantiate(config):
+        """Build objects from configuration values.
+
+        Every configuration object whose definition is mapped to a class
+        is replaced by an instance of that class. Options are passed to
+        the constructor as keyword arguments, nested mapped objects and
+        `allow_many` lists are instantiated first. Options named after
+        Python keywords are passed with a trailing underscore, e.g. the
+        option 'class' is passed as 'class_'. Objects of unmapped types
+        are returned unchanged.
+
+        :param config: a HyperConfig object or a list of HyperConfig
+         objects.
+        :return: the instantiated object, a list of objects for lists or
+         a dict of top level objects when config is a configuration root.
+        """
+        if config is None:
+            raise ValueError("config is None")
+        if isinstance(config, (list, ColumnList)):
+            return [HyperMap._build(c) for c in config]
+        if not isinstance(config, HyperConfig):
+            raise ValueError("config must be a HyperConfig instance or list")
+
+        if config.__def__ is None:
+            # The configuration root, instantiate top level objects.
+            return {ident: HyperMap._build(val)
+                    for ident, val in config.items()}
+        return HyperMap._build(config)
+
+    @staticmethod
+    def _plan(cls: Type, hdef) -> _ConstructorPlan:
+        """Return the cached constructor plan for cls and hdef."""
+        key = (cls, hdef.name)
+        plan = HyperMap._plans.get(key)
+        if plan is None or plan.hdef is not hdef:
+            plan = _ConstructorPlan(cls, hdef)
+            HyperMap._plans[key] = plan
+        return plan
+
+    @staticmethod
+    def _build(value):
+        """Instantiate value if it is a mapped configuration object."""
+        if isinstance(value, (list, ColumnList)):
+            return [HyperMap._build(v) for v in value]
+        if not isinstance(value, HyperConfig) or value.__def__ is None:
+            return value
+        cls = HyperMap._tag2class.get(value.__def__.name)
+        if cls is None:
+            return value
+        return HyperMap._construct(cls, value)
+
+    @staticmethod
+    def _construct(cls: Type, node: HyperConfig):
+        """Create an instance of cls from a configuration object."""
+        plan = HyperMap._plan(cls, node.__def__)
+        kwargs = {}
+        for opt_name, arg, nested, many in plan.fields:
+            if opt_name not in node:
+                continue
+            val = node[opt_name]
+            if many or isinstance(val, (list, ColumnList)):
+                val = [HyperMap._build(v) for v in val]\
+                    if val is not None else val
+            elif nested is not None and isinstance(val, HyperConfig):
+                val = HyperMap._construct(nested, val)
+            else:
+                val = HyperMap._build(val)
+            kwargs[arg] = val
+        return cls(**kwargs)
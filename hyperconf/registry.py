@@ -0,0 +1,117 @@
+"""Namespaces and schema file records of the definition registry."""
+import contextvars
+import itertools
+import os
+import typing as t
+
+DEFAULT_NAMESPACE = ""
+
+_active = contextvars.ContextVar("hyperconf_namespace",
+                                 default=DEFAULT_NAMESPACE)
+_clock = itertools.count()
+
+
+def active() -> str:
+    """Return the name of the namespace used by the current context."""
+    return _active.get()
+
+
+def file_stamp(path: str) -> t.Optional[tuple]:
+    """Return the modification time and size of a file or None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SchemaFile:
+    """A loaded schema file and the number of configurations using it.
+
+    Files that are not referenced by any configuration can be evicted
+    from the registry, their definitions are loaded again when needed.
+    """
+
+    __slots__ = ("path", "namespace", "names", "uses", "size",
+                 "refs", "pinned", "last_used", "stamp")
+
+    def __init__(self, path: str, namespace: str, pinned: bool = False):
+        """Initialize a record for a file that is being loaded.
+
+        :param path: the posix path of the file.
+        :param namespace: the namespace the definitions are added to.
+        :param pinned: if True, the file is never evicted.
+        """
+        self.path = path
+        self.namespace = namespace
+        # Names of the definitions of the file.
+        self.names = []
+        # Paths of the files referred by use directives.
+        self.uses = []
+        # Number of definitions, including options.
+        self.size = 0
+        self.refs = 0
+        self.pinned = pinned
+        # File stamp when loaded, None for schemas from other sources.
+        self.stamp = None
+        self.touch()
+
+    def __repr__(self):
+        """Debug str representation."""
+        return f"SchemaFile({self.path!r}, refs={self.refs})"
+
+    def touch(self):
+        """Mark the file as recently used."""
+        self.last_used = next(_clock)
+
+
+class Namespace:
+    """Definitions registered under one name.
+
+    Every namespace has its own definitions, loaded files and lookup
+    caches, so the same type name can be defined in several namespaces.
+    """
+
+    __slots__ = ("name", "typedefs", "files", "origins", "evicted",
+                 "references", "infer_cache", "resolved", "type_tables")
+
+    def __init__(self, name: str):
+        """Initialize an empty namespace."""
+        self.name = name
+        self.typedefs = {}
+        # path -> SchemaFile
+        self.files = {}
+        # definition name -> SchemaFile
+        self.origins = {}
+        # definition name -> path of the evicted file defining it
+        self.evicted = {}
+        # 'ref[type]' -> reference definition, created when looked up
+        self.references = {}
+        # (decl_tag, parent definition) or ('=', type name) ->
+        # (ident, resolved, definition), see HyperDef.infer_type.
+        self.infer_cache = {}
+        # definition -> ResolvedType
+        self.resolved = {}
+        # Child definitions of configuration objects, shared by the
+        # objects with the same children.
+        self.type_tables = {}
+
+    def __repr__(self):
+        """Debug str representation."""
+        return f"Namespace({self.name!r}, {len(self.typedefs)} types)"
+
+    @property
+    def loaded_size(self) -> int:
+        """Return the number of definitions loaded from files."""
+        return sum(f.size for f in self.files.values())
+
+    def clear_caches(self):
+        """Drop the lookup results of the namespace."""
+        self.infer_cache.clear()
+        self.resolved.clear()
+        self.type_tables.clear()
+
+    def evictable(self) -> t.Iterator[SchemaFile]:
+        """Iterate over the files that are not used by configurations."""
+        return (f for f in self.files.values()
+                if not f.refs and not f.pinned)
@@ -0,0 +1,292 @@
+"""Load schema files referred by `use` directives from remote sources.
+
+A schema source handles the references of a `use` directive that local
+paths and package resources cannot resolve, e.g. URLs. Sources are
+registered with :meth:`hyperconf.ConfigDefs.add_source`.
+"""
+import hashlib
+import http.client
+import json
+import os
+import queue
+import threading
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from hyperconf.cache import ValueCache
+
+
+class SchemaSource:
+    """Base class of schema sources."""
+
+    def handles(self, ref: str) -> bool:
+        """Check if the reference is loaded by this source."""
+        raise NotImplementedError()
+
+    def resolve(self, ref: str, ref_file: str = None) -> str:
+        """Return the reference relative to the file that contains it.
+
+        :param ref: the reference found in a use directive.
+        :param ref_file: the file containing the directive, if any.
+        """
+        return ref
+
+    def fetch(self, ref: str) -> str:
+        """Return the YAML text of a schema.
+
+        :raises OSError: if the schema cannot be loaded.
+        """
+        raise NotImplementedError()
+
+    def prefetch(self, refs: t.Sequence[str]):
+        """Prepare several schemas that are loaded next.
+
+        Sources can override this to fetch the schemas concurrently.
+        """
+
+
+class _CachedSchema(t.NamedTuple):
+    """A fetched schema and its validators."""
+
+    text: str
+    etag: t.Optional[str]
+    last_modified: t.Optional[str]
+
+
+class _ConnectionPool:
+    """Keep-alive connections to one host."""
+
+    def __init__(self, scheme: str, netloc: str, size: int, timeout: float):
+        """Initialize an empty pool."""
+        self.scheme = scheme
+        self.netloc = netloc
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        # Number of connections opened, for monitoring.
+        self.opened = 0
+
+    def get(self) -> http.client.HTTPConnection:
+        """Return an idle connection or open a new one."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            self.opened += 1
+            conn_class = http.client.HTTPSConnection\
+                if self.scheme == "https" else http.client.HTTPConnection
+            return conn_class(self.netloc, timeout=self.timeout)
+
+    def put(self, conn: http.client.HTTPConnection):
+        """Return a connection to the pool, closing it if full."""
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        """Close the idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HttpSchemaSource(SchemaSource):
+    """Load schemas over HTTP or HTTPS.
+
+    Connections are kept alive and reused. Fetched schemas are cached
+    and revalidated with If-None-Match and If-Modified-Since requests,
+    so unchanged schemas are not downloaded again. With a cache
+    directory, the cache is kept across processes. Cached schemas are
+    used when the server cannot be reached or fails with a 5xx status.
+
+    Relative references in remote schemas, e.g. `use: common`, are
+    resolved against the URL of the schema.
+
+    :Example:
+
+    >>> ConfigDefs.add_source(HttpSchemaSource(cache_dir="~/.cache/schemas"))
+    >>> config = HyperConfig.load_str("use: https://schemas.local/ships")
+    """
+
+    schemes = ("http", "https")
+
+    def __init__(self, cache_dir: str = None, max_connections: int = 4,
+                 timeout: float = 10.0, headers: t.Dict[str, str] = None,
+                 max_cached: int = 256):
+        """Initialize an HTTP schema source.
+
+        :param cache_dir: a directory for caching schemas across
+         processes or None to cache them in memory only.
+        :param max_connections: the maximum number of idle connections
+         kept per host and of concurrent requests.
+        :param timeout: the connection timeout in seconds.
+        :param headers: additional request headers, e.g. Authorization.
+        :param max_cached: the maximum number of schemas cached in memory,
+         the cache directory is not bounded.
+        """
+        if max_connections is None or max_connections <= 0:
+            raise ValueError("max_connections must be a positive integer")
+        self.cache_dir = Path(cache_dir).expanduser()\
+            if cache_dir is not None else None
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self._pools = {}
+        self._cache = ValueCache(max_cached)
+        # Schemas fetched by prefetch and not loaded yet.
+        self._prefetched = {}
+        self._lock = threading.Lock()
+
+    def handles(self, ref: str) -> bool:
+        """Check if ref is an HTTP URL."""
+        return urlsplit(ref).scheme in HttpSchemaSource.schemes
+
+    def resolve(self, ref: str, ref_file: str = None) -> str:
+        """Resolve references relative to remote schemas."""
+        if ref_file is not None and not self.handles(ref) and\
+           self.handles(ref_file) and not os.path.isabs(ref):
+            return urljoin(ref_file, ref)
+        return ref
+
+    def fetch(self, ref: str) -> str:
+        """Return the schema text, revalidating cached copies."""
+        with self._lock:
+            text = self._prefetched.pop(ref, None)
+        if text is not None:
+            return text
+        return self._fetch(ref)
+
+    def prefetch(self, refs: t.Sequence[str]):
+        """Fetch schemas concurrently."""
+        refs = [ref for ref in dict.fromkeys(refs) if self.handles(ref)]
+        if len(refs) < 2:
+            return
+        workers = min(len(refs), self.max_connections)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {ref: executor.submit(self._fetch, ref)
+                       for ref in refs}
+        for ref, future in futures.items():
+            # Failures are reported when the schema is loaded.
+            if future.exception() is None:
+                with self._lock:
+                    self._prefetched[ref] = future.result()
+
+    def pool(self, url: str) -> _ConnectionPool:
+        """Return the connection pool of the host of url."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _ConnectionPool(
+                    parts.scheme, parts.netloc,
+                    self.max_connections, self.timeout)
+        return pool
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close()
+
+    def _fetch(self, url: str) -> str:
+        """Send a, possibly conditional, GET request."""
+        cached = self._cached(url)
+        headers = dict(self.headers)
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            status, reason, resp_headers, body = self._request(url, headers)
+        except OSError:
+            if cached is not None:
+                # Offline, use the cached copy.
+                return cached.text
+            raise
+
+        if cached is not None and (status == 304 or status >= 500):
+            # Not modified or a server outage, use the cached copy.
+            return cached.text
+        if status != 200:
+            raise OSError(f"GET {url} failed: {status} {reason}")
+
+        text = body.decode(resp_headers.get_content_charset() or "utf-8")
+        self._store(url, _CachedSchema(text, resp_headers.get("ETag"),
+                                       resp_headers.get("Last-Modified")))
+        return text
+
+    def _request(self, url: str, headers: t.Dict[str, str]):
+        """Send a GET request over a pooled connection."""
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        pool = self.pool(url)
+
+        # A kept-alive connection may have been closed by the server,
+        # retry once with a new connection.
+        for attempt in range(2):
+            conn = pool.get()
+            try:
+                conn.request("GET", target, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if not attempt:
+                    continue
+                if isinstance(e, OSError):
+                    raise
+                # e.g. a malformed response, fetch only raises OSError.
+                raise OSError(f"GET {url} failed: {e!r}") from e
+            if response.will_close:
+                conn.close()
+            else:
+                pool.put(conn)
+            return response.status, response.reason, response.headers, body
+
+    def _cache_paths(self, url: str) -> t.Tuple[Path, Path]:
+        """Return the paths of the cached text and metadata."""
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return (self.cache_dir / f"{key}.yaml",
+                self.cache_dir / f"{key}.json")
+
+    def _cached(self, url: str) -> t.Optional[_CachedSchema]:
+        """Return the cached schema or None."""
+        cached = self._cache.get(url)
+        if cached is not None or self.cache_dir is None:
+            return cached
+        text_path, meta_path = self._cache_paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            cached = _CachedSchema(text_path.read_text(encoding="utf-8"),
+                                   meta.get("etag"),
+                                   meta.get("last_modified"))
+        except (OSError, ValueError):
+            return None
+        self._cache.put(url, cached)
+        return cached
+
+    def _store(self, url: str, cached: _CachedSchema):
+        """Cache a fetched schema."""
+        self._cache.put(url, cached)
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        text_path, meta_path = self._cache_paths(url)
+        meta = {"url": url, "etag": cached.etag,
+                "last_modified": cached.last_modified}
+        for path, content in [(text_path, cached.text),
+                              (meta_path, json.dumps(meta))]:
+            tmp_path = path.with_name(
+                f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(content, encoding="utf-8")
+            os.replace(tmp_path, path)
@@ -0,0 +1,175 @@
+"""Validate configurations in a resident process over a Unix socket.
+
+The server keeps the built-in types and the schema files used by the
+validated configurations loaded between requests, so that a validation
+costs only the parsing of the configuration. Schema files changed on
+disk are loaded again, see :meth:`ConfigDefs.refresh`.
+
+A client connects, writes one JSON request on a line and reads one
+JSON response line. Requests are:
+
+ - ``{"op": "validate", "path": "app.yaml", "cwd": "/src/app"}``
+ - ``{"op": "validate", "text": "...", "cwd": "/src/app"}``
+ - ``{"op": "ping"}``
+ - ``{"op": "shutdown"}``
+
+The paths of a request, including the paths of `use` directives, are
+relative to cwd. Validate requests with ``"interpolate": true``
+interpolate the `${path}` references of the configuration, see
+:meth:`HyperConfig.load_yaml`. Responses are ``{"ok": true}`` or, for
+configurations that are not valid, ``{"ok": false, "error": {"type":
+..., "message": ..., "line": ..., "file": ...}}``.
+"""
+import json
+import os
+import socketserver
+import stat
+import threading
+from collections import OrderedDict
+
+import yaml
+
+from hyperconf import errors as err
+from hyperconf import client
+from hyperconf.config import HyperConfig
+from hyperconf.dsl import ConfigDefs
+
+
+def validate(path: str = None, text: str = None,
+             cwd: str = None, interpolate: bool = False) -> dict:
+    """Validate a configuration file or text.
+
+    :param path: the path of the configuration file.
+    :param text: the configuration, used if path is None.
+    :param cwd: the directory relative paths are resolved from, the
+     current directory if None.
+    :param interpolate: if True, interpolate `${path}` references.
+    :return: the response, see the module documentation.
+    """
+    if (path is None) == (text is None):
+        return _failure("ValueError", "Expecting either a path or a text.")
+    ConfigDefs.load_builtins()
+    previous = os.getcwd()
+    try:
+        if cwd is not None:
+            os.chdir(cwd)
+        if path is not None:
+            HyperConfig.load_yaml(path, interpolate=interpolate)
+        else:
+            HyperConfig.load_str(text, interpolate=interpolate)
+    except err.HyperConfError as e:
+        return _failure(e.__class__.__name__, e.message, e.line,
+                        e.config_path or path)
+    except yaml.MarkedYAMLError as e:
+        mark = e.problem_mark
+        return _failure(e.__class__.__name__, str(e),
+                        mark.line + 1 if mark is not None else None, path)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        return _failure(e.__class__.__name__, str(e), None, path)
+    finally:
+        os.chdir(previous)
+    return {"ok": True}
+
+
+def _failure(kind: str, message: str, line: int = None,
+             fname: str = None) -> dict:
+    """Return the response for an invalid configuration."""
+    return {"ok": False, "error": {"type": kind, "message": message,
+                                   "line": line, "file": fname}}
+
+
+class ValidationServer(socketserver.UnixStreamServer):
+    """Serve validation requests, one at a time.
+
+    Requests are handled in the thread running :meth:`serve_forever`,
+    the working directory of the process is changed while a request is
+    handled.
+
+    Configurations are validated in a namespace for each client
+    directory, so that relative schema paths of different projects do
+    not conflict. The namespaces of the directories that sent no request
+    for the longest time are dropped once there are more than
+    max_namespaces of them.
+
+    :Example:
+
+    >>> with ValidationServer(client.default_socket_path()) as server:
+    ...     server.serve_forever()
+    """
+
+    def __init__(self, socket_path: str, max_namespaces: int = 16):
+        """Listen on socket_path.
+
+        :param socket_path: the path of the Unix socket. A socket file
+         left by a server that is no longer running is replaced.
+        :param max_namespaces: the number of client directories whose
+         schemas are kept loaded.
+        :raises OSError: if a server is already listening on the path or
+         the path exists and is not a socket.
+        """
+        if client.ping(socket_path):
+            raise OSError(f"A server is already listening on {socket_path}")
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise OSError(f"{socket_path} exists and is not a socket")
+            os.unlink(socket_path)
+        if max_namespaces < 1:
+            raise ValueError("max_namespaces must be positive")
+        ConfigDefs.load_builtins()
+        self.max_namespaces = max_namespaces
+        # Client directories, least recently used first.
+        self._namespaces = OrderedDict()
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_close(self):
+        """Close the socket and remove the socket file."""
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+    def process(self, request: dict) -> dict:
+        """Return the response to a request."""
+        op = request.get("op", "validate")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "shutdown":
+            # shutdown waits for serve_forever, which runs this request.
+            threading.Thread(target=self.shutdown).start()
+            return {"ok": True}
+        if op != "validate":
+            return _failure("ValueError", f"Unknown operation '{op}'.")
+
+        ConfigDefs.refresh()
+        cwd = request.get("cwd") or os.getcwd()
+        self._namespaces[cwd] = True
+        self._namespaces.move_to_end(cwd)
+        while len(self._namespaces) > self.max_namespaces:
+            idle, _ = self._namespaces.popitem(last=False)
+            ConfigDefs.drop_namespace(idle)
+        with ConfigDefs.namespace(cwd):
+            return validate(request.get("path"), request.get("text"), cwd,
+                            bool(request.get("interpolate")))
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Read a JSON request line and write the JSON response line."""
+
+    def handle(self):
+        """Handle a connection."""
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError as e:
+            response = _failure("ValueError", f"Invalid request: {e}")
+        else:
+            if isinstance(request, dict):
+                response = self.server.process(request)
+            else:
+                response = _failure("ValueError",
+                                    "Requests must be JSON objects.")
+        self.wfile.write(json.dumps(response).encode() + b"\n")
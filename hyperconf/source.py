@@ -0,0 +1,472 @@
+"""Parse YAML documents and keep track of source locations.
+
+Line and column information is not stored in the parsed values. The
+loaders record the YAML node of every parsed mapping and sequence in a
+:class:`SourceMap`, which is only consulted to report locations, e.g.
+when raising errors.
+"""
+import typing as t
+
+import yaml
+from yaml.composer import Composer
+from yaml.constructor import SafeConstructor
+from yaml.loader import SafeLoader
+from yaml.resolver import Resolver
+
+
+class SourceMap:
+    """Map parsed YAML mappings and sequences to their source nodes.
+
+    Entries are keyed by object identity. The table keeps the parsed
+    objects alive, so it should only be kept for as long as locations
+    are needed, e.g. while validating a configuration.
+
+    Source maps are pickled with the parsed values, e.g. by files parsed
+    in other processes, as the locations of the objects without the
+    YAML nodes. :meth:`node` returns None for unpickled maps.
+    """
+
+    __slots__ = ("fname", "_nodes", "_key_lines", "_spans")
+
+    def __init__(self, fname: str = None):
+        """Initialize an empty source map.
+
+        :param fname: the path of the parsed file, if any.
+        """
+        self.fname = fname
+        self._nodes = {}
+        self._key_lines = {}
+        # id(obj) -> (obj, start, end, item lines) of unpickled maps.
+        self._spans = {}
+
+    def __len__(self):
+        """Return the number of tracked objects."""
+        return len(self._nodes) + len(self._spans)
+
+    def __reduce__(self):
+        """Pickle the locations of the objects, without the nodes."""
+        return (_unpickle_map, (self.fname, self._locations()))
+
+    def detach(self) -> "SourceMap":
+        """Return a copy that keeps the locations but not the nodes.
+
+        The copy uses less memory, e.g. to keep many parsed files.
+        """
+        return _unpickle_map(self.fname, self._locations())
+
+    def _locations(self) -> list:
+        """Return the (object, start, end, key lines, item lines) list."""
+        spans = []
+        for obj, node in self._nodes.values():
+            start, end = node.start_mark, node.end_mark
+            items = [item.start_mark.line + 1 for item in node.value]\
+                if isinstance(node, yaml.SequenceNode) else None
+            if isinstance(node, yaml.MappingNode):
+                self.key_line(obj, None)
+            spans.append((obj, (start.line + 1, start.column + 1),
+                          (end.line + 1, end.column + 1)
+                          if end is not None else None,
+                          self._key_lines.get(id(obj)), items))
+        for obj, start, end, items in self._spans.values():
+            spans.append((obj, start, end, self._key_lines.get(id(obj)),
+                          items))
+        return spans
+
+    def add(self, obj, node: yaml.Node):
+        """Record the source node of a parsed mapping or sequence."""
+        self._nodes[id(obj)] = (obj, node)
+
+    def node(self, obj) -> t.Optional[yaml.Node]:
+        """Return the source node of a parsed object or None."""
+        entry = self._nodes.get(id(obj))
+        return entry[1] if entry is not None and entry[0] is obj else None
+
+    def span(self, obj) -> t.Optional[t.Tuple[t.Tuple[int, int],
+                                              t.Tuple[int, int]]]:
+        """Return the ((line, column), (end line, end column)) of obj.
+
+        Lines and columns are 1-based.
+        """
+        node = self.node(obj)
+        if node is None:
+            entry = self._spans.get(id(obj))
+            if entry is None or entry[0] is not obj:
+                return None
+            return entry[1], entry[2]
+        start, end = node.start_mark, node.end_mark
+        return ((start.line + 1, start.column + 1),
+                (end.line + 1, end.column + 1) if end is not None else None)
+
+    def line(self, obj, default: int = 0) -> int:
+        """Return the line at which a parsed object starts."""
+        node = self.node(obj)
+        if node is None:
+            entry = self._spans.get(id(obj))
+            return entry[1][0] if entry is not None and entry[0] is obj\
+                else default
+        return node.start_mark.line + 1
+
+    def key_line(self, mapping: dict, key, default: int = 0) -> int:
+        """Return the line of a key in a parsed mapping."""
+        lines = self._key_lines.get(id(mapping))
+        if lines is None:
+            node = self.node(mapping)
+            if node is None:
+                return default
+            lines = {}
+            for key_node, _ in node.value:
+                if isinstance(key_node, yaml.ScalarNode):
+                    lines.setdefault(key_node.value,
+                                     key_node.start_mark.line + 1)
+            self._key_lines[id(mapping)] = lines
+        return lines.get(str(key), default)
+
+    def item_line(self, seq: list, index: int, default: int = 0) -> int:
+        """Return the line of an item of a parsed sequence."""
+        node = self.node(seq)
+        if node is None:
+            entry = self._spans.get(id(seq))
+            if entry is None or entry[0] is not seq or\
+               not 0 <= index < len(entry[3]):
+                return default
+            return entry[3][index]
+        if not 0 <= index < len(node.value):
+            return default
+        return node.value[index].start_mark.line + 1
+
+
+def _unpickle_map(fname: str, spans: list) -> SourceMap:
+    """Rebuild a source map pickled by :meth:`SourceMap.__reduce__`."""
+    source_map = SourceMap(fname)
+    for obj, start, end, key_lines, items in spans:
+        source_map._spans[id(obj)] = (obj, start, end, items)
+        if key_lines is not None:
+            source_map._key_lines[id(obj)] = key_lines
+    return source_map
+
+
+class _SourceTracking:
+    """Record the nodes of constructed mappings and sequences."""
+
+    def construct_source_map(self, node):
+        """Construct a dict and record its node."""
+        data = {}
+        self.source_map.add(data, node)
+        yield data
+        value = self.construct_mapping(node)
+        data.update(value)
+
+    def construct_source_seq(self, node):
+        """Construct a list and record its node."""
+        data = []
+        self.source_map.add(data, node)
+        yield data
+        data.extend(self.construct_sequence(node))
+
+
+class _Loader(_SourceTracking,
+              getattr(yaml, "CSafeLoader", SafeLoader)):
+    """Safe YAML loader recording source locations."""
+
+    def __init__(self, stream, fname: str = None):
+        """Initialize the loader."""
+        super().__init__(stream)
+        self.source_map = SourceMap(fname)
+
+
+_Loader.add_constructor("tag:yaml.org,2002:map",
+                        _Loader.construct_source_map)
+_Loader.add_constructor("tag:yaml.org,2002:seq",
+                        _Loader.construct_source_seq)
+
+
+if getattr(yaml, "__with_libyaml__", False):
+    import yaml._yaml as _yaml
+
+    class _EventLoader(Composer, _yaml.CParser, SafeConstructor, Resolver):
+        """Compose nodes in Python from events of the libyaml parser."""
+
+        def __init__(self, stream):
+            """Initialize the loader."""
+            _yaml.CParser.__init__(self, stream)
+            Composer.__init__(self)
+            SafeConstructor.__init__(self)
+            Resolver.__init__(self)
+else:
+    _EventLoader = SafeLoader
+
+
+class _SkippedAliasError(Exception):
+    """Raised when a selected node refers to an anchor that was skipped."""
+
+
+class _SelectiveLoader(_SourceTracking, _EventLoader):
+    """Compose only the selected top level declarations.
+
+    Declarations that are not selected are skipped at the event level,
+    no YAML nodes or Python objects are created for them.
+    """
+
+    def __init__(self, stream, selected: t.Collection[str],
+                 always: t.Collection[str] = (), fname: str = None,
+                 depends: t.Callable[[str], t.Iterable[str]] = None,
+                 scan: bool = False):
+        """Initialize a selective loader.
+
+        :param stream: the YAML text or file.
+        :param selected: the top level identifiers to load.
+        :param always: top level keys that are always loaded.
+        :param fname: the path of the parsed file, if any.
+        :param depends: if given, a function returning the identifiers
+         that a scalar value may refer to. The top level identifiers and
+         the dependencies of the selected keys are recorded.
+        :param scan: if True, record the dependencies of the skipped keys
+         too.
+        """
+        super().__init__(stream)
+        self.source_map = SourceMap(fname)
+        self.selected = set(selected)
+        self.always = set(always)
+        self.found = set()
+        self.depends = depends
+        self.scan = scan
+        # The top level identifiers, if depends is given.
+        self.idents = set()
+        # top level identifier -> identifiers its values may refer to.
+        self.dependencies = {}
+        self._root_pending = False
+        self._skipped_anchors = set()
+
+    def compose_document(self):
+        """Compose the root node, filtering a root mapping."""
+        # Drop the DOCUMENT-START event.
+        self.get_event()
+        self._root_pending = self.check_event(yaml.MappingStartEvent)
+        node = self.compose_node(None, None)
+        # Drop the DOCUMENT-END event.
+        self.get_event()
+        self.anchors = {}
+        return node
+
+    def compose_node(self, parent, index):
+        """Compose a node, failing on aliases of skipped anchors."""
+        if self.check_event(yaml.AliasEvent) and\
+           self.peek_event().anchor in self._skipped_anchors:
+            raise _SkippedAliasError()
+        return super().compose_node(parent, index)
+
+    def compose_mapping_node(self, anchor):
+        """Compose a mapping, skipping unselected root keys."""
+        if not self._root_pending:
+            return super().compose_mapping_node(anchor)
+        self._root_pending = False
+
+        start_event = self.get_event()
+        tag = start_event.tag
+        if tag is None or tag == '!':
+            tag = self.resolve(yaml.MappingNode, None, start_event.implicit)
+        node = yaml.MappingNode(tag, [],
+                                start_event.start_mark, None,
+                                flow_style=start_event.flow_style)
+        if anchor is not None:
+            self.anchors[anchor] = node
+        while not self.check_event(yaml.MappingEndEvent):
+            item_key = self.compose_node(node, None)
+            deps = None
+            if isinstance(item_key, yaml.ScalarNode) and\
+               item_key.value not in self.always:
+                ident = item_key.value.split("=", 1)[0]
+                selected = ident in self.selected
+                if self.depends is not None:
+                    self.idents.add(ident)
+                    if selected or self.scan:
+                        deps = self.dependencies.setdefault(ident, set())
+                if not selected:
+                    if deps is None:
+                        self._skip_node()
+                    else:
+                        self._scan_node(deps)
+                    continue
+                self.found.add(ident)
+            item_value = self.compose_node(node, item_key)
+            if deps is not None:
+                self._add_node_dependencies(item_value, deps)
+            node.value.append((item_key, item_value))
+        end_event = self.get_event()
+        node.end_mark = end_event.end_mark
+        return node
+
+    def _skip_node(self):
+        """Consume the events of the next node."""
+        depth = 0
+        while True:
+            event = self.get_event()
+            anchor = getattr(event, "anchor", None)
+            if anchor is not None and\
+               not isinstance(event, yaml.AliasEvent):
+                self._skipped_anchors.add(anchor)
+            if isinstance(event, (yaml.MappingStartEvent,
+                                  yaml.SequenceStartEvent)):
+                depth += 1
+            elif isinstance(event, (yaml.MappingEndEvent,
+                                    yaml.SequenceEndEvent)):
+                depth -= 1
+            if depth == 0:
+                return
+
+    def _scan_node(self, deps: set):
+        """Consume the events of the next node, see :meth:`_skip_node`.
+
+        The dependencies of the scalar values of the node are added to
+        deps.
+        """
+        # For the open collections, None for sequences and True for
+        # mappings if their next node is a key.
+        keys = []
+        while True:
+            event = self.get_event()
+            anchor = getattr(event, "anchor", None)
+            if anchor is not None and\
+               not isinstance(event, yaml.AliasEvent):
+                self._skipped_anchors.add(anchor)
+            if isinstance(event, (yaml.MappingEndEvent,
+                                  yaml.SequenceEndEvent)):
+                keys.pop()
+            else:
+                is_key = False
+                if keys and keys[-1] is not None:
+                    is_key = keys[-1]
+                    keys[-1] = not is_key
+                if isinstance(event, yaml.MappingStartEvent):
+                    keys.append(True)
+                elif isinstance(event, yaml.SequenceStartEvent):
+                    keys.append(None)
+                elif not is_key and isinstance(event, yaml.ScalarEvent):
+                    deps.update(self.depends(event.value))
+            if not keys:
+                return
+
+    def _add_node_dependencies(self, node: yaml.Node, deps: set):
+        """Add the dependencies of the scalar values of a node to deps."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, yaml.ScalarNode):
+                deps.update(self.depends(node.value))
+            elif isinstance(node, yaml.SequenceNode):
+                stack.extend(node.value)
+            elif isinstance(node, yaml.MappingNode):
+                stack.extend(val for _, val in node.value)
+
+
+for _tag, _constructor in [
+        ("tag:yaml.org,2002:map", _SourceTracking.construct_source_map),
+        ("tag:yaml.org,2002:seq", _SourceTracking.construct_source_seq)]:
+    _SelectiveLoader.add_constructor(_tag, _constructor)
+
+
+def load(stream, fname: str = None) -> t.Tuple[t.Any, SourceMap]:
+    """Parse a YAML document.
+
+    :param stream: the YAML text or file.
+    :param fname: the path of the parsed file, if any.
+    :return: the parsed values and their source map.
+    """
+    loader = _Loader(stream, fname)
+    try:
+        return loader.get_single_data(), loader.source_map
+    finally:
+        loader.dispose()
+
+
+def load_selected(text: str, selected: t.Collection[str],
+                  always: t.Collection[str] = (), fname: str = None,
+                  depends: t.Callable[[str], t.Iterable[str]] = None):
+    """Parse YAML text, loading only the selected top level keys.
+
+    Top level keys are matched by identifier, i.e. the 'ident' part of
+    'ident=type' keys.
+
+    :param text: the YAML text.
+    :param selected: the identifiers of the top level keys to load.
+    :param always: top level keys that are always loaded.
+    :param fname: the path of the parsed file, if any.
+    :param depends: if given, a function returning the top level
+     identifiers that a scalar value may refer to, e.g. the value itself
+     for references. The keys referred by the values of the loaded keys
+     are loaded too, transitively.
+    :return: the parsed values, the set of selected identifiers that
+     were found and the source map.
+    """
+    scan = False
+    while True:
+        loader = _SelectiveLoader(text, selected, always, fname, depends,
+                                  scan)
+        try:
+            values = loader.get_single_data()
+        except _SkippedAliasError:
+            # Selected values refer to skipped anchors, load everything.
+            values, source_map = load(text, fname)
+            values, found = _select(values, selected, always, depends)
+            return values, found, source_map
+        finally:
+            loader.dispose()
+        found = loader.found
+        if depends is None:
+            break
+        needed = _closure(found, loader.dependencies, loader.idents)
+        if needed.issubset(found):
+            break
+        # Load the referred keys, and find the keys they refer to.
+        selected = needed
+        scan = True
+    return values, found, loader.source_map
+
+
+def _select(values, selected: t.Collection[str], always: t.Collection[str],
+            depends: t.Callable[[str], t.Iterable[str]] = None):
+    """Remove the top level keys that are not selected from values.
+
+    :return: the values and the set of selected identifiers found.
+    """
+    if not isinstance(values, dict):
+        return values, set()
+    # identifier -> identifiers its values may refer to.
+    dependencies = {}
+    for key, val in values.items():
+        if key in always:
+            continue
+        deps = dependencies.setdefault(str(key).split("=", 1)[0], set())
+        stack = [val] if depends is not None else []
+        while stack:
+            val = stack.pop()
+            if isinstance(val, str):
+                deps.update(depends(val))
+            elif isinstance(val, list):
+                stack.extend(val)
+            elif isinstance(val, dict):
+                stack.extend(val.values())
+    found = {ident for ident in selected if ident in dependencies}
+    loaded = _closure(found, dependencies, dependencies.keys())
+    for key in list(values.keys()):
+        if key not in always and str(key).split("=", 1)[0] not in loaded:
+            del values[key]
+    return values, found
+
+
+def _closure(selected: t.Iterable[str],
+             dependencies: t.Dict[str, t.Set[str]],
+             idents: t.Collection[str]) -> t.Set[str]:
+    """Return the identifiers selected and those they depend on.
+
+    :param dependencies: identifier -> identifiers it may refer to.
+    :param idents: the identifiers that can be returned.
+    """
+    result = set(selected)
+    stack = list(result)
+    while stack:
+        for dep in dependencies.get(stack.pop(), ()):
+            if dep in idents and dep not in result:
+                result.add(dep)
+                stack.append(dep)
+    return result
@@ -0,0 +1,86 @@
+import pytest
+
+from hyperconf.compiler import compile_expr
+from hyperconf.dsl import ConfigDefs, _eval_imports
+
+
+@pytest.fixture(autouse=True)
+def cleaup_before_test():
+    ConfigDefs.clear()
+    yield
+
+
+def _eval(source, value):
+    context = _eval_imports.copy()
+    context.update({"hval": value, "htype": None})
+    try:
+        return eval(source, context)
+    except Exception as e:
+        return type(e)
+
+
+def _call(compiled, value):
+    try:
+        return compiled(value)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("source,kind", [
+    ("100 <= hval <= 1000", "range"),
+    ("0 <= float(hval) <= 1, 'Expecting a float'", "range"),
+    ("int(hval) > 0, 'Not a positive integer'", "range"),
+    ("hval == 3", "compare"),
+    ("hval.lower() in ['red', 'blue', 'gray']", "member"),
+    ("hval not in ('a', 'b')", "member"),
+    ("isinstance(hval, str)", "isinstance"),
+    ("re.match(r'^[A-Z_]+$', hval) != None, 'Invalid'", "regex"),
+    ("hval.isalpha()", "value"),
+    ("pathlib.Path(hval)", "value"),
+    ("int(hval)", "value"),
+    ("len(hval) > 2 and hval[0] == 'a'", "generic"),
+    ("value > 3", "generic"),
+])
+def test_equivalent_to_eval(source, kind):
+    compiled = compile_expr(source, _eval_imports)
+    assert compiled.pattern.kind == kind
+
+    values = [0, 1, 3, 99, 100, 500, 1000, 1001, -4, 0.5, 1.5, "7",
+              "RED", "gray", "a", "abc", "LBL_NAME", "lbl", [1], None]
+    for value in values:
+        assert _call(compiled, value) == _eval(source, value), value
+
+
+def test_range_metadata():
+    pattern = compile_expr("1000 >= hval > 100").pattern
+    assert pattern.kind == "range"
+    assert pattern.params["low"] == 100
+    assert pattern.params["high"] == 1000
+    assert not pattern.params["low_inclusive"]
+    assert pattern.params["high_inclusive"]
+
+
+def test_member_metadata():
+    pattern = compile_expr(
+        "hval.lower() in ['red', 'blue'], 'bad color'").pattern
+    assert pattern.params["values"] == frozenset(["red", "blue"])
+    assert pattern.params["transform"] == "lower"
+    assert pattern.message == "bad color"
+
+
+def test_invalid_syntax_raises_on_call():
+    compiled = compile_expr("hval >")
+    with pytest.raises(SyntaxError):
+        compiled(1)
+
+
+def test_hyperdef_patterns():
+    ConfigDefs.parse_str("""
+    engine_power:
+      validator: 100 <= hval <= 1000
+      converter: int(hval)
+    """)
+    hdef = ConfigDefs.get("engine_power")
+    assert hdef.validator_pattern.kind == "range"
+    assert hdef.converter_pattern.params["transform"] == "int"
+    assert hdef.convert("500") == 500
@@ -1,7 +1,12 @@
+import array
+import json
+import pickle
+import sys
 import yaml
 import pytest
 
-from hyperconf import HyperConfig
+from hyperconf import HyperConfig, ConfigHandle
+from hyperconf.config import ColumnList
 from hyperconf import errors as err
 from hyperconf.dsl import ConfigDefs
 
@@ -99,3 +104,1018 @@ def test_ships():
     """
     config = HyperConfig.load_str(defs)
     print(config.ncc1701.captain)
+
+
+@pytest.fixture()
+def fleet_yaml():
+    return """
+    use: tests/ships
+
+    ncc1701=ship:
+      captain: James T. Kirk
+      crew: 156
+      class: galaxy
+      color: gray
+      shields: 1.0
+      engines: 900
+    ncc1701d=ship:
+      captain: Jean-Luc Picard
+      crew: 1014
+      class: galaxy
+      color: gray
+      shields: 1.0
+      engines: 950
+    """
+
+
+def test_overlay_shares_untouched_nodes(fleet_yaml):
+    base = HyperConfig.load_str(fleet_yaml)
+    variant = HyperConfig.overlay(base, {"ncc1701": {"engines": 500}},
+                                  {"ncc1701": {"color": "red"}})
+
+    assert variant.ncc1701.engines == 500
+    assert variant.ncc1701.color == "red"
+    assert variant.ncc1701.captain == "James T. Kirk"
+    assert variant.ncc1701d is base.ncc1701d
+    assert base.ncc1701.engines == 900 and base.ncc1701.color == "gray"
+
+
+def test_overlay_validates_overrides(fleet_yaml):
+    base = HyperConfig.load_str(fleet_yaml)
+    with pytest.raises(err.ConfigurationError):
+        HyperConfig.overlay(base, {"ncc1701": {"engines": 5000}})
+    with pytest.raises(err.ConfigurationError):
+        HyperConfig.overlay(base, {"ncc1701": {"warp": 9}})
+
+
+def test_overlay_from_file(fleet_yaml, tmp_path):
+    base = HyperConfig.load_str(fleet_yaml)
+    overlay = tmp_path / "prod.yaml"
+    overlay.write_text("""
+ncc1701:
+  crew: 430
+ncc1701a=ship:
+  captain: James T. Kirk
+  crew: 430
+  class: constitution
+  color: gray
+  shields: 0.5
+  engines: 900
+""")
+    variant = HyperConfig.overlay(base, overlay)
+    assert variant.ncc1701.crew == 430
+    assert variant.ncc1701a.shields == 0.5
+    assert "ncc1701a" not in base
+
+
+def test_load_only_selected(fleet_yaml):
+    config = HyperConfig.load_str(fleet_yaml + """
+    broken=ship:
+      engines: 5000
+    """, only=["ncc1701d"])
+
+    assert list(config.keys()) == ["ncc1701d"]
+    assert config.ncc1701d.captain == "Jean-Luc Picard"
+
+
+def test_load_only_skipped_anchor(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("""
+use: tests/test_defs.yaml
+base=train: &defaults
+  num_epoch: 3
+  learning_rate: 0.1
+tuned=train:
+  <<: *defaults
+  num_epoch: 10
+""")
+    config = HyperConfig.load_yaml(path, only=["tuned"])
+    assert list(config.keys()) == ["tuned"]
+    assert config.tuned.learning_rate == 0.1
+
+
+def test_load_only_references():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(REF_DEFS)
+    text = """
+    first=fleet:
+      name: First Fleet
+    second=fleet:
+      name: Second Fleet
+    enterprise=ship:
+      captain: Kirk
+      fleet: first
+      escorts: [defiant]
+    defiant=ship:
+      captain: Sisko
+      fleet: second
+      escorts: []
+    voyager=ship:
+      captain: Janeway
+      fleet: second
+      escorts: []
+    """
+    # Referred objects are loaded too, transitively.
+    config = HyperConfig.load_str(text, only=["enterprise"])
+    assert sorted(config.keys()) == ["defiant", "enterprise", "first",
+                                     "second"]
+    assert config.enterprise.escorts[0].fleet is config.second
+
+    # Also when the selected objects refer to skipped anchors.
+    config = HyperConfig.load_str(text.replace(
+        "name: First Fleet", "name: &name First Fleet").replace(
+        "captain: Sisko", "captain: *name"), only=["defiant"])
+    assert sorted(config.keys()) == ["defiant", "second"]
+    assert config.defiant.captain == "First Fleet"
+
+
+def test_load_only_missing(fleet_yaml):
+    with pytest.raises(err.HyperConfError, match=".*ncc1864.*"):
+        HyperConfig.load_str(fleet_yaml, only=["ncc1864"])
+
+
+def test_no_line_keys(fleet_yaml):
+    config = HyperConfig.load_str(fleet_yaml)
+    assert "__line__" not in config
+    assert "__line__" not in config.ncc1701
+
+
+def test_nested_error_line():
+    defs = """
+    use: tests/ships
+
+    ncc1701=ship:
+      captain: James T. Kirk
+      crew: 156
+      class: galaxy
+      color: gray
+      shields: 1.0
+      engines: 9000
+    """
+    with pytest.raises(err.ConfigurationError, match=r".*at line 10\b.*"):
+        HyperConfig.load_str(defs)
+
+
+def test_list_element_error_line():
+    defs = """
+    use: tests/test_defs.yaml
+
+    model1=detector:
+      stem: some_class_name
+      heads:
+        - head:
+            name: head1
+        - head:
+            name: head2
+            unknown: 1
+    """
+    with pytest.raises(err.ConfigurationError, match=r".*at line 9\b.*"):
+        HyperConfig.load_str(defs)
+
+
+def test_deeply_nested_config():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str("""
+    link:
+      value: int
+      origins:
+        type: ref[link]
+        allow_many: True
+      next:
+        type: link
+        allow_many: True
+    """)
+    depth = 3 * sys.getrecursionlimit()
+    lines = ["chain=link:"]
+    for i in range(depth):
+        indent = "      " * i
+        lines.append(f"{indent}  value: {i}")
+        lines.append(f"{indent}  origins: " +
+                     ("[r0]" if i == depth - 1 else "[]"))
+        lines.append(f"{indent}  next:" + (" []" if i == depth - 1 else ""))
+        if i < depth - 1:
+            lines.append(f"{indent}    - link:")
+    # A chain of references between top level objects.
+    refs = []
+    for i in range(depth):
+        origins = f"[r{i + 1}]" if i < depth - 1 else "[]"
+        refs.append(f"r{i}=link:\n  value: {i}\n  origins: {origins}\n"
+                    "  next: []")
+    config = HyperConfig.load_str("\n".join(lines + refs))
+    node = config.chain
+    for i in range(depth - 1):
+        node = node.next[0]
+    assert node.value == depth - 1 and node.next == []
+    assert node.origins[0] is config.r0
+    assert config.r0.origins[0].origins[0] is config.r2
+
+    values = config.to_dict()
+    assert values["r0"] == {"value": 0, "origins": ["r1"], "next": []}
+    text = config.dump_json()
+    assert text.startswith('{"chain": {"value": 0, "origins": [], "next": '
+                           '[{"link": {"value": 1, ')
+    assert text.count('"value"') == 2 * depth
+    text = config.dump_yaml()
+    assert text.startswith("chain:\n  value: 0\n  origins: []\n  next:\n"
+                           "  - link:\n      value: 1\n")
+    assert text.count("value:") == 2 * depth
+    assert len(config.find_by_type("link")) == 2 * depth
+    assert pickle.loads(pickle.dumps(config)).content_hash ==\
+        config.content_hash
+
+    copy = pickle.loads(pickle.dumps(config))
+    inner = copy.chain
+    for i in range(depth - 1):
+        inner = inner.next[0]
+    inner["value"] = -1
+    path = ("chain",) + ("next", 0) * (depth - 1) + ("value",)
+    assert HyperConfig.diff(config, copy).changed == [path]
+    changed = HyperConfig.overlay(config, {"r1": {"value": -1}})
+    assert HyperConfig.diff(config, changed).changed == [("r1", "value")]
+    handle = ConfigHandle(config)
+    assert handle.config.frozen and node.frozen
+    with pytest.raises(NotImplementedError):
+        node.value = 0
+    handle.overlay({"r0": {"value": -1}})
+    assert handle.config.r0.value == -1
+
+    # errors are located at the innermost declaration
+    lines[-3] = lines[-3].replace(f"value: {depth - 1}", "value: x")
+    with pytest.raises(err.ConfigurationError,
+                       match=rf".*at line {len(lines) - 2}\b.*"):
+        HyperConfig.load_str("\n".join(lines + refs))
+
+
+def _write_schema(path, color):
+    path.write_text(f"""
+color:
+  validator: hval == '{color}'
+ship:
+  name: str
+  color: color
+""")
+    return path.as_posix()
+
+
+def test_namespaces(tmp_path):
+    red = _write_schema(tmp_path / "red.yaml", "red")
+    blue = _write_schema(tmp_path / "blue.yaml", "blue")
+
+    with ConfigDefs.namespace("tenant_a"):
+        config_a = HyperConfig.load_str(f"""
+        use: {red}
+        ship:
+          name: s1
+          color: red
+        """)
+    with ConfigDefs.namespace("tenant_b"):
+        config_b = HyperConfig.load_str(f"""
+        use: {blue}
+        ship:
+          name: s2
+          color: blue
+        """)
+        with pytest.raises(err.ConfigurationError):
+            HyperConfig.load_str("ship: {name: s3, color: red}")
+
+    assert config_a.ship.color == "red"
+    assert config_b.ship.color == "blue"
+    assert ConfigDefs.get("ship") is None
+    assert ConfigDefs.get("str") is not None
+
+
+def test_schema_eviction(tmp_path):
+    red = _write_schema(tmp_path / "red.yaml", "red")
+    blue = _write_schema(tmp_path / "blue.yaml", "blue")
+    decl = "ship: {name: s1, color: %s}"
+    try:
+        ConfigDefs.set_budget(4)
+        with ConfigDefs.namespace("tenant_a"):
+            config = HyperConfig.load_str(f"use: {red}\n" + decl % "red")
+            assert ConfigDefs.files()[red].refs == 1
+        with ConfigDefs.namespace("tenant_b"):
+            HyperConfig.load_str(f"use: {blue}\n" + decl % "blue")
+            # the config is gone, its schema is not held anymore
+            assert ConfigDefs.files()[blue].refs == 0
+
+        with ConfigDefs.namespace("tenant_c"):
+            HyperConfig.load_str(f"use: {blue}\n" + decl % "blue")
+        with ConfigDefs.namespace("tenant_b"):
+            # evicted to stay within the budget
+            assert not ConfigDefs.files()
+            # reloaded when looked up
+            assert ConfigDefs.get("ship").def_file == blue
+            assert blue in ConfigDefs.files()
+
+        with ConfigDefs.namespace("tenant_a"):
+            # referenced by a live config
+            ConfigDefs.set_budget(0)
+            assert ConfigDefs.files()[red].refs == 1
+            del config
+            ConfigDefs.set_budget(0)
+            assert not ConfigDefs.files()
+        assert ConfigDefs.get("str") is not None
+    finally:
+        ConfigDefs.set_budget(None)
+
+
+def test_dump_round_trip(valid_yaml_complex_defs):
+    config = HyperConfig.load_str(valid_yaml_complex_defs)
+    values = config.to_dict(typed=True)
+    assert type(values["model1=detector"]) is dict
+    assert values["model1=detector"]["heads"][0] == \
+        {"head": {"name": "head1", "labels": "labels1.json"}}
+
+    assert HyperConfig.load_str(config.dump_yaml(typed=True)) == config
+    assert HyperConfig.load_str(config.dump_json(typed=True)) == config
+
+
+def test_dump_stream(tmp_path, valid_yaml_complex_defs):
+    config = HyperConfig.load_str(valid_yaml_complex_defs)
+    with open(tmp_path / "dump.yaml", "w") as stream:
+        config.dump_yaml(stream, typed=True)
+    assert HyperConfig.load_yaml(tmp_path / "dump.yaml") == config
+
+    # Dumps are written from the tree like the dumps of to_dict().
+    values = config.to_dict(typed=True)
+    assert config.dump_yaml(typed=True) == yaml.safe_dump(
+        values, sort_keys=False, allow_unicode=True)
+    for indent in [None, 2, "\t"]:
+        assert config.dump_json(indent=indent) == json.dumps(
+            config.to_dict(), indent=indent)
+
+    view = config.to_dict(view=True)
+    assert view["model1"] is config.model1
+    with pytest.raises(TypeError):
+        view["model1"] = None
+
+
+def test_dump_converted_values():
+    config = HyperConfig.load_str("""
+    root=dir: /tmp/data
+    """)
+    assert config.dump_json() == '{"root": "/tmp/data"}'
+    assert config.dump_yaml() == "root: /tmp/data\n"
+
+
+def test_pickle_round_trip(valid_yaml_complex_defs):
+    config = HyperConfig.load_str(valid_yaml_complex_defs)
+    payload = pickle.dumps(config)
+    assert b"HyperDef" not in payload
+
+    # definitions are loaded again from the schema files
+    ConfigDefs.clear()
+    restored = pickle.loads(payload)
+    assert restored == config
+    head = restored.model1.heads[0]
+    assert head.__def__ is ConfigDefs.get("head")
+    assert head.name == "head1"
+    assert ConfigDefs.files()["tests/test_defs.yaml"].refs == 1
+
+
+def test_pickle_schema_mismatch():
+    ConfigDefs.parse_str("""
+    paint:
+      color: str
+    """)
+    payload = pickle.dumps(HyperConfig.load_str("paint: {color: red}"))
+
+    ConfigDefs.clear()
+    ConfigDefs.parse_str("""
+    paint:
+      color: str
+      finish: str
+    """)
+    with pytest.raises(err.SchemaMismatchError):
+        pickle.loads(payload)
+
+
+def test_content_hash(fleet_yaml):
+    config = HyperConfig.load_str(fleet_yaml)
+    other = HyperConfig.load_str(fleet_yaml)
+    assert config.content_hash == other.content_hash
+    assert config.ncc1701.content_hash != config.ncc1701d.content_hash
+
+    variant = HyperConfig.overlay(config, {"ncc1701": {"crew": 157}})
+    assert variant.content_hash != config.content_hash
+    assert variant.ncc1701d.content_hash == config.ncc1701d.content_hash
+
+
+def test_content_hash_modified(fleet_yaml):
+    config = HyperConfig.load_str(fleet_yaml)
+    other = HyperConfig.load_str(fleet_yaml)
+    before = config.content_hash
+    assert HyperConfig.diff(config, other) == ([], [], [])
+
+    # Modifying a nested object changes the hashes of the objects above.
+    config["ncc1701"]["crew"] = 157
+    assert config.content_hash != before
+    assert HyperConfig.diff(config, other).changed == [("ncc1701", "crew")]
+    config["ncc1701"]["crew"] = 156
+    assert config.content_hash == before
+
+    # Frozen objects keep their hashes.
+    other.freeze()
+    assert other.content_hash == before
+    config["ncc1701"]["crew"] = 157
+    assert other.content_hash == before
+
+
+def test_diff(fleet_yaml, valid_yaml_complex_defs):
+    base = HyperConfig.load_str(fleet_yaml)
+    new_ship = dict(captain="Sulu", crew=5, color="red", shields=0.5,
+                    engines=200, **{"class": "excelsior"})
+    variant = HyperConfig.overlay(base, {"ncc1701": {"crew": 157},
+                                         "ncc1702=ship": new_ship})
+    diff = HyperConfig.diff(base, variant)
+    assert diff.changed == [("ncc1701", "crew")]
+    assert diff.added == [("ncc1702",)]
+    assert diff.removed == []
+    assert HyperConfig.diff(variant, base).removed == [("ncc1702",)]
+    assert HyperConfig.diff(base, HyperConfig.load_str(fleet_yaml)) == \
+        ([], [], [])
+
+    config = HyperConfig.load_str(valid_yaml_complex_defs)
+    changed = HyperConfig.load_str(
+        valid_yaml_complex_defs.replace("labels2", "labels3"))
+    assert HyperConfig.diff(config, changed).changed == \
+        [("model1", "heads", 1, "labels")]
+
+
+def test_find_by_type(fleet_yaml, valid_yaml_complex_defs):
+    config = HyperConfig.load_str(fleet_yaml)
+    ships = config.find_by_type("ship")
+    assert ships == [config.ncc1701, config.ncc1701d]
+    assert list(config.iter_type(ConfigDefs.get("ship")))[1] == \
+        (("ncc1701d",), config.ncc1701d)
+    assert config.find_by_type("missing") == []
+
+    model = HyperConfig.load_str(valid_yaml_complex_defs)
+    assert [path for path, _ in model.iter_type("head")] == \
+        [("model1", "heads", 0), ("model1", "heads", 1)]
+    assert [name for _, name in model.iter_type("str")] == \
+        ["some_class_name", "head1", "labels1.json",
+         "head2", "labels2.json"]
+    assert model.model1.find_by_type("detector") == []
+
+
+def test_find_by_type_modified(fleet_yaml):
+    config = HyperConfig.load_str(fleet_yaml)
+    assert len(config.find_by_type("ship")) == 2
+    assert config.find_by_type("ship_color") == ["gray", "gray"]
+
+    # Objects assigned after the first query are found.
+    other = HyperConfig.load_str(fleet_yaml)
+    config["ncc1702"] = other.ncc1701
+    config["ncc1701"]["color"] = "red"
+    assert config.find_by_type("ship") == \
+        [config.ncc1701, config.ncc1701d, config.ncc1702]
+    assert [path for path, _ in config.iter_type("ship_color")] == \
+        [("ncc1701", "color"), ("ncc1701d", "color"), ("ncc1702", "color")]
+    assert config.find_by_type("ship_color") == ["red", "gray", "gray"]
+
+
+def test_find_by_type_explicit_types():
+    config = HyperConfig.load_str("""
+    year: 2023
+    launch=pos_int: 2245
+    """)
+    assert config.find_by_type("int") == [2023]
+    assert config.find_by_type("pos_int") == [2245]
+
+
+def test_find_by_type_overlay_and_pickle(fleet_yaml):
+    base = HyperConfig.load_str(fleet_yaml)
+    assert base.find_by_type("ship_color") == ["gray", "gray"]
+    new_ship = dict(captain="Sulu", crew=5, color="red", shields=0.5,
+                    engines=200, **{"class": "excelsior"})
+    variant = HyperConfig.overlay(base, {"ncc1701": {"color": "red"},
+                                         "ncc1702=ship": new_ship})
+    assert variant.find_by_type("ship_color") == ["red", "gray", "red"]
+    assert base.find_by_type("ship_color") == ["gray", "gray"]
+    assert len(variant.find_by_type("ship")) == 3
+
+    restored = pickle.loads(pickle.dumps(variant))
+    assert list(restored.iter_type("ship_color")) == \
+        list(variant.iter_type("ship_color"))
+
+    only = HyperConfig.load_str(fleet_yaml, only=["ncc1701d"])
+    assert only.find_by_type("ship") == [only.ncc1701d]
+
+
+def test_freeze(valid_yaml_complex_defs):
+    config = HyperConfig.load_str(valid_yaml_complex_defs)
+    content_hash = config.content_hash
+    assert config.freeze() is config
+    assert config.frozen and config.model1.heads[0].frozen
+
+    head = config.model1.heads[0]
+    with pytest.raises(NotImplementedError):
+        head["name"] = "other"
+    with pytest.raises(NotImplementedError):
+        config.model1.update(stem="other")
+    with pytest.raises(NotImplementedError):
+        config.model1.heads.append(head)
+    with pytest.raises(NotImplementedError):
+        head.setdefault("extra", 1)
+    with pytest.raises(NotImplementedError):
+        head.name = "other"
+    with pytest.raises(NotImplementedError):
+        del head.name
+    assert head.name == head["name"] != "other"
+    assert config.content_hash == content_hash
+
+    # overlays copy the changed objects and share the frozen ones
+    variant = HyperConfig.overlay(config, {"model1": {"stem": "other"}})
+    assert not variant.frozen and not variant.model1.frozen
+    assert variant.model1.heads is config.model1.heads
+
+    restored = pickle.loads(pickle.dumps(config))
+    assert restored == config and not restored.frozen
+    restored.model1.heads.append(head)
+    # attributes set values of objects that are not frozen
+    assert restored.find_by_type("str")[0] == "some_class_name"
+    restored_hash = restored.content_hash
+    restored.model1.stem = "other"
+    assert restored.model1["stem"] == "other"
+    # and invalidate the cached hashes and type indexes
+    assert restored.content_hash != restored_hash
+    assert restored.find_by_type("str")[0] == "other"
+    restored.model1.stem = config.model1.stem
+    assert restored.content_hash == restored_hash
+
+
+COLUMNAR_DEFS = """
+reading:
+  sensor: str
+  value: float
+  count: pos_int
+
+series:
+  readings:
+    type: reading
+    allow_many: True
+    columnar: True
+"""
+
+
+def _series(columnar=True):
+    ConfigDefs.load_builtins()
+    defs = COLUMNAR_DEFS if columnar else\
+        COLUMNAR_DEFS.replace("columnar: True", "columnar: False")
+    ConfigDefs.parse_str(defs)
+    return HyperConfig.load_str("""
+    series:
+      readings:
+        - reading:
+            sensor: s1
+            value: 0.5
+            count: 3
+        - reading:
+            sensor: s2
+            value: 1.5
+            count: 4
+    """)
+
+
+def test_columnar_list():
+    config = _series()
+    readings = config.series.readings
+    assert isinstance(readings, ColumnList)
+    assert len(readings) == 2 and readings.ids == ["reading", "reading"]
+    assert readings[1].sensor == "s2" and readings[-1].count == 4
+    assert readings[1].__def__ is ConfigDefs.get("reading")
+    assert readings[0].frozen
+    assert [r.value for r in readings] == [0.5, 1.5]
+    assert isinstance(readings.column("count"), array.array)
+    assert readings.column("sensor") == ["s1", "s2"]
+    assert config.find_by_type("pos_int") == [3, 4]
+
+    restored = pickle.loads(pickle.dumps(config))
+    assert restored == config
+    assert isinstance(restored.series.readings, ColumnList)
+    assert HyperConfig.load_str(config.dump_yaml()) == config
+
+    # lists of objects have the same values and hashes
+    ConfigDefs.clear()
+    rows = _series(columnar=False)
+    assert isinstance(rows.series.readings, list)
+    assert rows == config
+    assert rows.content_hash == config.content_hash
+
+
+def test_columnar_list_errors():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(COLUMNAR_DEFS)
+    with pytest.raises(err.ConfigurationError, match=r".*at line 11\b.*"):
+        HyperConfig.load_str("""
+        series:
+          readings:
+            - reading:
+                sensor: s1
+                value: 0.5
+                count: 3
+            - reading:
+                sensor: s2
+                value: 1.5
+                count: -4
+        """)
+
+    ConfigDefs.parse_str("""
+    sample:
+      reading: reading
+    samples:
+      items:
+        type: sample
+        allow_many: True
+        columnar: True
+    """)
+    with pytest.raises(err.TemplateDefinitionError):
+        HyperConfig.load_str("samples: {items: []}")
+
+
+def test_columnar_numpy():
+    numpy = pytest.importorskip("numpy")
+    readings = _series().series.readings
+    counts = readings.to_numpy("count")
+    assert counts.tolist() == [3, 4]
+    assert not counts.flags.writeable
+    assert numpy.shares_memory(counts, readings.to_numpy()["count"])
+
+
+ALIAS_DEFS = """
+crew_member:
+  name: str
+  rank:
+    type: str
+    default: ensign
+
+team:
+  lead: crew_member
+  members:
+    type: crew_member
+    allow_many: True
+
+link:
+  value: int
+  next: link
+"""
+
+ALIAS_YAML = """
+alpha=team:
+  lead: &kirk
+    name: Kirk
+    rank: captain
+  members:
+    - m1: &spock {name: Spock}
+    - m1: *spock
+    - m2: *kirk
+beta=team:
+  lead: *spock
+  members: []
+"""
+
+
+def test_yaml_aliases_are_shared(monkeypatch):
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(ALIAS_DEFS)
+    crew_member = ConfigDefs.get("crew_member")
+    validated = []
+    validate = type(crew_member).validate
+
+    def counting_validate(self, decl, *args):
+        if self is crew_member:
+            validated.append(decl["name"])
+        return validate(self, decl, *args)
+
+    monkeypatch.setattr(type(crew_member), "validate", counting_validate)
+    values = yaml.safe_load(ALIAS_YAML)
+    config = HyperConfig(None, values)
+
+    members = config.alpha.members
+    assert members[0] is members[1]
+    assert members[2]._id == "m2" and members[2].name == "Kirk"
+    # objects and list elements get their default values differently.
+    assert config.beta.lead.rank == "ensign"
+    assert members[0].rank is None
+    assert sorted(validated) == ["Kirk", "Kirk", "Spock", "Spock"]
+    # the parsed values are not modified.
+    assert values["beta=team"]["lead"] == {"name": "Spock"}
+    assert yaml.safe_load(ALIAS_YAML) == values
+
+
+def test_recursive_alias():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(ALIAS_DEFS)
+    with pytest.raises(err.ConfigurationError, match=r".*at line 4\b.*"):
+        HyperConfig.load_str("""
+        chain=link: &chain
+          value: 1
+          next: *chain
+        """)
+
+
+REF_DEFS = """
+fleet:
+  name: str
+
+ship:
+  captain: str
+  fleet: ref[fleet]
+  escorts:
+    type: ref[ship]
+    allow_many: True
+"""
+
+
+def test_references():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(REF_DEFS)
+    config = HyperConfig.load_str("""
+    enterprise=ship:
+      captain: Kirk
+      fleet: first
+      escorts: [defiant]
+    defiant=ship:
+      captain: Sisko
+      fleet: first
+      escorts: []
+    first=fleet:
+      name: First Fleet
+    """)
+    assert config.enterprise.fleet is config.first
+    assert config.enterprise.escorts[0] is config.defiant
+    assert config.find_by_type("ref[fleet]") == [config.first] * 2
+    assert config.to_dict()["enterprise"]["fleet"] == "first"
+    assert config.to_dict()["enterprise"]["escorts"] == ["defiant"]
+
+    copy = pickle.loads(pickle.dumps(config))
+    assert copy.enterprise.escorts[0] is copy.defiant
+    assert copy.content_hash == config.content_hash
+
+    prod = HyperConfig.overlay(config, {"first": {"name": "Home Fleet"},
+                                        "defiant": {"fleet": "second"},
+                                        "second=fleet": {"name": "Second"}})
+    assert prod.enterprise.fleet is prod.first
+    assert prod.enterprise.fleet.name == "Home Fleet"
+    assert prod.enterprise.escorts[0] is prod.defiant
+    assert prod.defiant.fleet is prod.second
+    assert config.enterprise.fleet.name == "First Fleet"
+    assert HyperConfig.diff(config, prod).changed == [
+        ("defiant", "fleet"), ("first", "name")]
+
+
+def test_reference_errors():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(REF_DEFS)
+    with pytest.raises(err.ConfigurationError,
+                       match=r"Undefined reference 'second'.*line 4\b"):
+        HyperConfig.load_str("""
+        enterprise=ship:
+          captain: Kirk
+          fleet: second
+          escorts: []
+        """)
+    with pytest.raises(err.ConfigurationError,
+                       match=r"expecting a 'fleet' object.*line 4\b"):
+        HyperConfig.load_str("""
+        enterprise=ship:
+          captain: Kirk
+          fleet: enterprise
+          escorts: []
+        """)
+    with pytest.raises(err.ConfigurationError,
+                       match=r"Circular reference: enterprise -> defiant"
+                       r" -> enterprise.*line 11\b"):
+        HyperConfig.load_str("""
+        first=fleet:
+          name: First Fleet
+        enterprise=ship:
+          captain: Kirk
+          fleet: first
+          escorts: [defiant]
+        defiant=ship:
+          captain: Sisko
+          fleet: first
+          escorts: [enterprise]
+        """)
+
+
+INTERP_DEFS = """
+database:
+  host: str
+  port: int
+  url: str
+
+service:
+  db: database
+  endpoint: str
+  timeout:
+    type: int
+    default: 30
+"""
+
+INTERP_YAML = """
+db=database:
+  host: localhost
+  port: 5432
+  url: postgres://${db.host}:${db.port}/app
+service:
+  db:
+    host: ${db.host}
+    port: ${db.port}
+    url: ${db.url}
+  endpoint: $${path} ${service.db.url}
+  timeout: ${db.port}
+"""
+
+
+def test_interpolation():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(INTERP_DEFS)
+    config = HyperConfig.load_str(INTERP_YAML, interpolate=True)
+    assert config.db.url == "postgres://localhost:5432/app"
+    assert config.service.db.port == 5432
+    assert config.service.db.url == config.db.url
+    assert config.service.endpoint == "${path} " + config.db.url
+    assert config.service.timeout == 5432
+
+    lazy = HyperConfig.load_str(INTERP_YAML, lazy=True)
+    assert lazy.service.db.port == 5432
+    assert lazy.to_dict() == config.to_dict()
+    assert lazy.content_hash == config.content_hash
+
+    prod = HyperConfig.overlay(config, {"db": {"host": "prod"}})
+    assert prod.db.url == "postgres://prod:5432/app"
+    assert prod.service.endpoint == "${path} " + prod.db.url
+    assert config.db.url == "postgres://localhost:5432/app"
+    prod = HyperConfig.overlay(prod, {"db": {"url": "sqlite://"}})
+    assert prod.service.db.url == "sqlite://"
+
+
+def test_interpolation_disabled():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(INTERP_DEFS)
+    # Values are not interpolated unless asked for.
+    config = HyperConfig.load_str("""
+    db=database:
+      host: ${HOME}
+      port: 5432
+      url: $${db.host}
+    """)
+    assert config.db.host == "${HOME}"
+    assert config.db.url == "$${db.host}"
+    prod = HyperConfig.overlay(config, {"db": {"url": "${db.port}"}})
+    assert prod.db.url == "${db.port}"
+
+
+def test_load_only_interpolation():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(INTERP_DEFS)
+    text = INTERP_YAML + """
+cache=database:
+  host: cache.example.com
+  port: 6379
+  url: redis://${cache.host}
+"""
+    # The objects whose values are interpolated are loaded too.
+    config = HyperConfig.load_str(text, only=["service"], interpolate=True)
+    assert sorted(config.keys()) == ["db", "service"]
+    assert config.service.endpoint == "${path} postgres://localhost:5432/app"
+
+
+def test_lazy_interpolation():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(INTERP_DEFS)
+    config = HyperConfig.load_str("""
+    db=database:
+      host: ${db.url}
+      port: 5432
+      url: postgres://${db.host}
+    """, lazy=True)
+    # Only the values that are read are interpolated.
+    assert config.db.port == 5432
+    with pytest.raises(err.ConfigurationError,
+                       match=r"Circular interpolation: db.host -> db.url"
+                       r" -> db.host.*line 3\b"):
+        config.db.host
+    with pytest.raises(err.ConfigurationError):
+        config.interpolate()
+
+
+def test_interpolation_errors():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(INTERP_DEFS)
+    with pytest.raises(err.ConfigurationError,
+                       match=r"Undefined interpolation '\${db.name}' in "
+                       r"'db.url'.*line 5\b"):
+        HyperConfig.load_str("""
+        db=database:
+          host: localhost
+          port: 5432
+          url: ${db.name}
+        """, interpolate=True)
+    with pytest.raises(err.ConfigurationError,
+                       match=r"'\${db}' in 'db.url', it is not a scalar"):
+        HyperConfig.load_str("""
+        db=database:
+          host: localhost
+          port: 5432
+          url: ${db}
+        """, interpolate=True)
+    with pytest.raises(err.ConfigurationError,
+                       match=r"Could not convert value 'localhost'.*line 4\b"):
+        HyperConfig.load_str("""
+        db=database:
+          host: localhost
+          port: ${db.host}
+          url: postgres://
+        """, interpolate=True)
+
+
+FRAGMENT_DEFS = """
+logging:
+  level: str
+  format:
+    type: str
+    default: plain
+
+service:
+  name: str
+  logging: logging
+  handlers:
+    type: logging
+    allow_many: True
+"""
+
+
+def test_include(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "logging.yaml").write_text("level: info\n")
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(FRAGMENT_DEFS)
+    cache = HyperConfig.set_fragment_cache(maxsize=8)
+    text = """
+    api=service:
+      name: api
+      logging:
+        include: logging
+      handlers:
+        - file: {include: logging}
+    """
+    first = HyperConfig.load_str(text)
+    second = HyperConfig.load_str(text)
+    assert first.api.logging == {"level": "info", "format": "plain"}
+    assert first.api.handlers[0].level == "info"
+    # The file is parsed once and shared as a frozen object.
+    assert second.api.logging is first.api.logging
+    assert first.api.logging.frozen and not first.api.frozen
+    assert (cache.misses, cache.hits) == (1, 3)
+    with pytest.raises(NotImplementedError):
+        first.api.logging["level"] = "debug"
+    with pytest.raises(NotImplementedError):
+        first.api.logging.level = "debug"
+    assert second.api.logging.level == "info"
+
+    prod = HyperConfig.overlay(first, {"api": {"logging": {"level": "warn"}}})
+    assert prod.api.logging.level == "warn"
+    assert first.api.logging.level == "info"
+
+    # Modified files are parsed again.
+    (tmp_path / "logging.yaml").write_text("level: debug\nformat: json\n")
+    assert HyperConfig.load_str(text).api.logging.format == "json"
+
+
+def test_include_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str(FRAGMENT_DEFS)
+    with pytest.raises(err.ConfigurationError,
+                       match=r"include 'missing.yaml'.*line 4\b"):
+        HyperConfig.load_str("""
+        api=service:
+          name: api
+          logging: {include: missing}
+          handlers: []
+        """)
+    (tmp_path / "bad.yaml").write_text("level: info\nsize: 3\n")
+    with pytest.raises(err.ConfigurationError,
+                       match=r"Unkown options \['size'\]"):
+        HyperConfig.load_str("""
+        api=service:
+          name: api
+          logging: {include: bad}
+          handlers: []
+        """)
+    (tmp_path / "wrapped.yaml").write_text("inner: {include: loop}\n")
+    (tmp_path / "loop.yaml").write_text("outer: {include: wrapped}\n")
+    ConfigDefs.parse_str("""
+    wrapper:
+      inner: looped
+    looped:
+      outer: wrapper
+    """)
+    with pytest.raises(err.ConfigurationError,
+                       match=r"Circular include: wrapped.yaml -> "
+                       r"loop.yaml -> wrapped.yaml"):
+        HyperConfig.load_str("top=wrapper: {include: wrapped}")
@@ -1,8 +1,11 @@
+import concurrent.futures
+
 import pytest
 
 import hyperconf.errors as err
+import hyperconf.discovery as discovery
 
-from hyperconf.dsl import ConfigDefs
+from hyperconf.dsl import ConfigDefs, HyperDef
 
 
 @pytest.fixture(autouse=True)
@@ -96,3 +99,242 @@ def test_parse_valid_use():
     """
     ConfigDefs.parse_str(defs)
     assert ConfigDefs.contains("ref1")
+
+
+def test_infer_type_cache_invalidated():
+    ConfigDefs.parse_str("""
+    wide:
+      opt1: str
+    """)
+    wide = ConfigDefs.get("wide")
+    ident, htype = HyperDef.infer_type("opt1", "x", wide)
+    assert ident == "opt1" and htype is None
+
+    ConfigDefs.parse_str("""
+    str:
+      validator: isinstance(hval, str)
+    """)
+    ident, htype = HyperDef.infer_type("opt1", "x", wide)
+    assert htype is ConfigDefs.get("str")
+
+
+def test_infer_type_cache_size():
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_str("""
+    ship:
+      captain: str
+    """)
+    for i in range(100):
+        ident, htype = HyperDef.infer_type(f"ship{i}=ship", {})
+        assert ident == f"ship{i}" and htype is ConfigDefs.get("ship")
+        HyperDef.infer_type(f"untyped{i}", 1)
+    # Identifiers and tags that are not types do not add entries.
+    assert len(ConfigDefs._ns().infer_cache) == 1
+
+
+def test_infer_type_falls_back_to_value_type():
+    ConfigDefs.parse_str("""
+    int: {}
+    str: {}
+    """)
+    assert HyperDef.infer_type("untyped", 1)[1].name == "int"
+    assert HyperDef.infer_type("untyped", "1")[1].name == "str"
+
+
+def test_value_cache_pure_types():
+    ConfigDefs.parse_str("""
+    color:
+      pure: true
+      validator: hval in ['red', 'gray']
+    impure:
+      validator: hval in ['red', 'gray']
+    """)
+    cache = ConfigDefs.enable_value_cache(maxsize=2)
+    try:
+        color = ConfigDefs.get("color")
+        for _ in range(3):
+            color.validate("red")
+        assert cache.hits == 2 and cache.misses == 1
+
+        with pytest.raises(err.ConfigurationError):
+            color.validate("blue")
+        with pytest.raises(err.ConfigurationError):
+            color.validate("blue")
+        assert cache.hits == 3
+
+        # unhashable and impure values bypass the cache
+        with pytest.raises(err.ConfigurationError):
+            color.validate(["red"])
+        ConfigDefs.get("impure").validate("red")
+        assert cache.hits + cache.misses == 5
+        assert len(cache) == 2
+    finally:
+        ConfigDefs.disable_value_cache()
+
+
+def test_resolved_type_chain():
+    ConfigDefs.parse_str("""
+    float:
+      converter: float(hval)
+    percent:
+      type: float
+      validator: 0 <= hval <= 1, "Expecting a value from [0,1]."
+    shield_level:
+      type: percent
+      validator: hval >= 0.2
+      default: 0.5
+    """)
+    shield = ConfigDefs.get("shield_level")
+    resolved = shield.resolved
+    assert [h.name for h in resolved.chain] == \
+        ["float", "percent", "shield_level"]
+    assert resolved.default == 0.5
+    assert shield.convert("0.7") == 0.7
+
+    shield.validate(0.5)
+    with pytest.raises(err.ConfigurationError):
+        shield.validate(1.5)
+    with pytest.raises(err.ConfigurationError):
+        shield.validate(0.1)
+
+
+def test_resolved_options_inherited():
+    ConfigDefs.parse_str("""
+    str: {}
+    ship:
+      name:
+        required: true
+      class:
+        default: fighter
+    cruiser:
+      type: ship
+      class:
+        default: cruiser
+    """)
+    cruiser = ConfigDefs.get("cruiser")
+    assert set(cruiser.resolved.options) == {"name", "class"}
+    with pytest.raises(err.ConfigurationError):
+        cruiser.validate({"class": "x1"})
+    assert cruiser.set_defaults({"name": "n1"})["class"] == "cruiser"
+
+
+def test_resolve_errors():
+    ConfigDefs.parse_str("""
+    alpha:
+      type: beta
+    beta:
+      type: alpha
+    """)
+    with pytest.raises(err.TemplateDefinitionError, match="Circular"):
+        ConfigDefs.get("alpha").resolved
+
+    ConfigDefs.clear()
+    ConfigDefs.parse_str("""
+    gamma:
+      type: missing
+    """)
+    with pytest.raises(err.TemplateDefinitionError, match="missing"):
+        ConfigDefs.link()
+
+
+def test_entry_point_discovery(tmp_path, monkeypatch):
+    site = tmp_path / "site"
+    package = site / "station_schemas"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "station.yaml").write_text("station:\n  name: str\n")
+    dist_info = site / "station_schemas-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: station-schemas\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text(
+        "[hyperconf.schemas]\nstations = station_schemas\n")
+
+    monkeypatch.syspath_prepend(str(site))
+    monkeypatch.setenv("HYPERCONF_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(ConfigDefs, "_package_index", None)
+
+    ConfigDefs.parse_yaml("station")
+    assert ConfigDefs.get("station").def_file == \
+        (package / "station.yaml").as_posix()
+    assert list((tmp_path / "cache").glob("schema-index-*.json"))
+
+    # the index is read from the cache, packages are not scanned again
+    ConfigDefs.clear()
+    monkeypatch.setattr(ConfigDefs, "_package_index", None)
+    monkeypatch.setattr(discovery, "scan", lambda packages: {})
+    ConfigDefs.parse_yaml("station")
+    assert ConfigDefs.contains("station")
+
+
+def test_discovery_rescan(tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("HYPERCONF_CACHE_DIR", str(cache))
+    monkeypatch.setattr(ConfigDefs, "_package_index", None)
+    monkeypatch.setattr(ConfigDefs, "_package_rescanned", False)
+    scanned = []
+
+    def scan(packages):
+        scanned.append(list(packages))
+        return {}
+
+    monkeypatch.setattr(discovery, "scan", scan)
+    cache.mkdir()
+    (cache / "schema-index-stale.json").write_text("{}")
+
+    # editing the current directory does not change the index key
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend("")
+    key = discovery.environment_key()
+    (tmp_path / "edited.yaml").write_text("")
+    assert discovery.environment_key() == key
+
+    # missing files rescan the packages once per process
+    with pytest.raises(err.TemplateDefinitionError):
+        ConfigDefs.parse_yaml("missing")
+    assert ConfigDefs._package_rescanned
+    num_scans = len(scanned)
+    for _ in range(2):
+        with pytest.raises(err.TemplateDefinitionError):
+            ConfigDefs.parse_yaml("missing")
+    assert len(scanned) == num_scans
+    # stale indexes are removed when the index is written
+    assert [p.name for p in cache.glob("schema-index-*")] == \
+        [f"schema-index-{key}.json"]
+
+
+def test_parse_with_executor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "base.yaml").write_text("ship_name: str\n")
+    (tmp_path / "crew.yaml").write_text("use: base\ncrew: int\n")
+    (tmp_path / "ships.yaml").write_text("""
+use: [base, crew]
+ship:
+  name: ship_name
+  crew: crew
+""")
+    (tmp_path / "fleet.yaml").write_text("use: [ships, crew]\nfleet: str\n")
+    ConfigDefs.load_builtins()
+    ConfigDefs.parse_yaml("fleet")
+    expected = list(ConfigDefs.files())
+    assert ConfigDefs.get("ship").resolved.options["crew"].typename == "crew"
+
+    for executor in [concurrent.futures.ThreadPoolExecutor(2),
+                     concurrent.futures.ProcessPoolExecutor(2)]:
+        with executor:
+            ConfigDefs.clear()
+            ConfigDefs.load_builtins()
+            ConfigDefs.set_executor(executor)
+            try:
+                ConfigDefs.parse_yaml("fleet")
+                # Files are registered in the order they are used.
+                assert list(ConfigDefs.files()) == expected
+                assert ConfigDefs.get("ship").line == 3
+
+                (tmp_path / "dup.yaml").write_text("use: [crew, base]\n"
+                                                   "crew: str\n")
+                with pytest.raises(err.DuplicateDefError,
+                                   match="crew.*line 2"):
+                    ConfigDefs.parse_yaml("dup")
+            finally:
+                ConfigDefs.set_executor(None)
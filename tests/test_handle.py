@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from hyperconf import ConfigHandle, HyperConfig
+from hyperconf.dsl import ConfigDefs
+
+
+@pytest.fixture(autouse=True)
+def cleaup_before_test():
+    ConfigDefs.clear()
+    yield
+
+
+def _fleet(num_ships):
+    ships = "".join(f"""
+s{i}=ship:
+  captain: Captain
+  crew: 1
+  class: galaxy
+  color: gray
+  shields: 1.0
+  engines: 100""" for i in range(num_ships))
+    return f"use: tests/ships{ships}"
+
+
+def test_publish():
+    config = HyperConfig.load_str(_fleet(2))
+    handle = ConfigHandle(config)
+    assert handle.config is config and config.frozen
+    assert handle.version == 0
+
+    new_config = HyperConfig.load_str(_fleet(3))
+    assert handle.publish(new_config) is config
+    assert handle.snapshot() == (new_config, 1)
+    assert new_config.s2.frozen
+
+    updated = handle.overlay({"s0": {"crew": 2}})
+    assert handle.config is updated and handle.version == 2
+    assert updated.s0.crew == 2 and updated.s1 is new_config.s1
+
+    with pytest.raises(ValueError):
+        handle.publish({"s0": {}})
+
+
+def test_concurrent_reads_and_reloads():
+    num_ships = 20
+    handle = ConfigHandle(HyperConfig.load_str(_fleet(num_ships)))
+    done = threading.Event()
+    errors = []
+
+    def read():
+        while not done.is_set():
+            config, version = handle.snapshot()
+            # All the ships of a snapshot are updated by the same overlay.
+            crews = {ship.crew for ship in config.find_by_type("ship")}
+            if crews != {version + 1}:
+                errors.append((version, crews))
+                return
+            # Published snapshots cannot be modified by readers.
+            try:
+                config.s0.crew = 0
+            except NotImplementedError:
+                pass
+            else:
+                errors.append((version, "modified"))
+                return
+
+    def reload():
+        ships = [f"s{i}" for i in range(num_ships)]
+        for _ in range(50):
+            handle.update(lambda config: HyperConfig.overlay(
+                config, {ship: {"crew": config.s0.crew + 1}
+                         for ship in ships}))
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writers = [threading.Thread(target=reload) for _ in range(2)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    # no update is lost
+    assert handle.version == 100
+    assert handle.config.s0.crew == 101
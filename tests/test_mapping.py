@@ -0,0 +1,98 @@
+import pytest
+
+from hyperconf import HyperConfig, HyperMap, hypermap
+from hyperconf.dsl import ConfigDefs
+
+
+@pytest.fixture(autouse=True)
+def cleaup_before_test():
+    ConfigDefs.clear()
+    HyperMap.clear()
+    yield
+
+
+class Head:
+    def __init__(self, name, labels=None):
+        self.name = name
+        self.labels = labels
+
+
+class Detector:
+    def __init__(self, stem, heads):
+        self.stem = stem
+        self.heads = heads
+
+
+class Ship:
+    def __init__(self, captain, crew, class_, **kwargs):
+        self.captain = captain
+        self.crew = crew
+        self.ship_class = class_
+        self.other = kwargs
+
+
+def test_decorator_returns_class():
+    @hypermap("head")
+    class Mapped:
+        pass
+
+    assert Mapped is not None
+    assert HyperMap.get_class("head") is Mapped
+
+
+def test_instantiate_nested_many():
+    HyperMap.register("head", Head)
+    HyperMap.register("detector", Detector)
+    config = HyperConfig.load_str("""
+    use: tests/test_defs.yaml
+
+    model1=detector:
+      stem: some_class_name
+      heads:
+        - head:
+            name: head1
+            labels: labels1.json
+        - head:
+            name: head2
+            labels: labels2.json
+    """)
+    objs = HyperMap.instantiate(config)
+
+    model = objs["model1"]
+    assert isinstance(model, Detector)
+    assert model.stem == "some_class_name"
+    assert [h.name for h in model.heads] == ["head1", "head2"]
+    assert all(isinstance(h, Head) for h in model.heads)
+
+
+def test_instantiate_keyword_options():
+    HyperMap.register("ship", Ship)
+    config = HyperConfig.load_str("""
+    use: tests/ships
+
+    ncc1701=ship:
+      captain: James T. Kirk
+      crew: 156
+      class: galaxy
+      color: gray
+      shields: 1.0
+      engines: 900
+    """)
+    ship = HyperMap.instantiate(config.ncc1701)
+
+    assert isinstance(ship, Ship)
+    assert ship.ship_class == "galaxy"
+    assert ship.crew == 156
+    assert ship.other["engines"] == 900
+
+
+def test_unmapped_objects_unchanged():
+    config = HyperConfig.load_str("""
+    use: tests/test_defs.yaml
+
+    train:
+      num_epoch: 3
+      learning_rate: 0.1
+    """)
+    objs = HyperMap.instantiate(config)
+    assert objs["train"] is config.train
@@ -0,0 +1,200 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from hyperconf import HyperConfig
+from hyperconf import errors as err
+from hyperconf.dsl import ConfigDefs
+from hyperconf.schema_sources import HttpSchemaSource
+
+
+SCHEMAS = {
+    "/schemas/fleet.yaml": """
+use: [ships, colors]
+fleet:
+  flagship: ship
+""",
+    "/schemas/ships.yaml": """
+ship:
+  captain: str
+  color: ship_color
+""",
+    "/schemas/colors.yaml": """
+ship_color:
+  type: str
+  validator: hval in ['red', 'gray']
+""",
+}
+
+
+class SchemaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path,
+                                self.headers.get("If-None-Match")))
+        if server.broken:
+            self.wfile.write(b"garbage\r\n\r\n")
+            self.close_connection = True
+            return
+        if server.status is not None:
+            self.send_response(server.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        text = SCHEMAS.get(self.path)
+        if text is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = f'"{hash(text)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = text.encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def cleaup_before_test():
+    ConfigDefs.clear()
+    yield
+
+
+@pytest.fixture
+def schema_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SchemaHandler)
+    server.requests = []
+    server.broken = False
+    server.status = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def http_source():
+    source = HttpSchemaSource(max_connections=2)
+    ConfigDefs.add_source(source)
+    yield source
+    ConfigDefs.remove_source(source)
+    source.close()
+
+
+def _config(server):
+    url = f"http://127.0.0.1:{server.server_port}/schemas/fleet"
+    return f"""
+    use: {url}
+    fleet:
+      flagship:
+        captain: Kirk
+        color: red
+    """
+
+
+def test_http_use(schema_server, http_source):
+    config = HyperConfig.load_str(_config(schema_server))
+    assert config.fleet.flagship.color == "red"
+    assert sorted(path for path, _ in schema_server.requests) == \
+        ["/schemas/colors.yaml", "/schemas/fleet.yaml",
+         "/schemas/ships.yaml"]
+    # requests to the same host reuse connections
+    pool = http_source.pool(f"http://127.0.0.1:{schema_server.server_port}")
+    assert pool.opened <= 2
+
+
+def test_http_revalidation(schema_server, http_source):
+    HyperConfig.load_str(_config(schema_server))
+    ConfigDefs.clear()
+    schema_server.requests.clear()
+
+    config = HyperConfig.load_str(_config(schema_server))
+    assert config.fleet.flagship.captain == "Kirk"
+    assert len(schema_server.requests) == 3
+    assert all(etag for _, etag in schema_server.requests)
+
+
+def test_http_disk_cache(schema_server, tmp_path):
+    source = HttpSchemaSource(cache_dir=tmp_path)
+    ConfigDefs.add_source(source)
+    try:
+        HyperConfig.load_str(_config(schema_server))
+        source.close()
+        ConfigDefs.clear()
+        schema_server.shutdown()
+        schema_server.server_close()
+
+        # a new source uses the cached copies when offline
+        ConfigDefs.remove_source(source)
+        source = HttpSchemaSource(cache_dir=tmp_path, timeout=1)
+        ConfigDefs.add_source(source)
+        config = HyperConfig.load_str(_config(schema_server))
+        assert config.fleet.flagship.color == "red"
+    finally:
+        ConfigDefs.remove_source(source)
+
+
+def test_http_not_found(schema_server, http_source):
+    url = f"http://127.0.0.1:{schema_server.server_port}/missing"
+    with pytest.raises(err.TemplateDefinitionError, match="404"):
+        HyperConfig.load_str(f"use: {url}")
+
+
+def test_http_bad_response(schema_server, http_source):
+    HyperConfig.load_str(_config(schema_server))
+    ConfigDefs.clear()
+    schema_server.broken = True
+
+    # the cached copies are used when the response is not valid HTTP
+    config = HyperConfig.load_str(_config(schema_server))
+    assert config.fleet.flagship.color == "red"
+
+    url = f"http://127.0.0.1:{schema_server.server_port}/schemas/other"
+    with pytest.raises(err.TemplateDefinitionError,
+                       match="Failed to load template"):
+        HyperConfig.load_str(f"use: {url}")
+
+
+def test_http_server_error(schema_server, http_source):
+    HyperConfig.load_str(_config(schema_server))
+    ConfigDefs.clear()
+    schema_server.status = 503
+
+    # the cached copies are used during server outages
+    config = HyperConfig.load_str(_config(schema_server))
+    assert config.fleet.flagship.color == "red"
+
+    url = f"http://127.0.0.1:{schema_server.server_port}/schemas/other"
+    with pytest.raises(err.TemplateDefinitionError, match="503"):
+        HyperConfig.load_str(f"use: {url}")
+
+    # client errors are not masked by the cache
+    ConfigDefs.clear()
+    schema_server.status = 403
+    with pytest.raises(err.TemplateDefinitionError, match="403"):
+        HyperConfig.load_str(_config(schema_server))
+
+
+def test_http_bounded_cache(schema_server):
+    source = HttpSchemaSource(max_cached=1)
+    ConfigDefs.add_source(source)
+    try:
+        HyperConfig.load_str(_config(schema_server))
+        assert len(source._cache) == 1
+    finally:
+        ConfigDefs.remove_source(source)
+        source.close()
@@ -0,0 +1,171 @@
+import socket
+import threading
+
+import pytest
+
+from hyperconf import cli, client
+from hyperconf.dsl import ConfigDefs
+from hyperconf.server import ValidationServer
+
+
+@pytest.fixture(autouse=True)
+def cleaup_before_test():
+    ConfigDefs.clear()
+    yield
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "crew.yaml").write_text("""
+crew_member:
+  name: str
+  age: int
+""")
+    (tmp_path / "team.yaml").write_text("""
+use: crew.yaml
+lead=crew_member:
+  name: Kirk
+  age: 34
+""")
+    return tmp_path
+
+
+@pytest.fixture
+def server(tmp_path):
+    socket_path = str(tmp_path / "hyperconf.sock")
+    server = ValidationServer(socket_path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def test_server_validate(project, server):
+    cwd = str(project)
+    assert client.ping(server)
+    assert client.send({"op": "validate", "path": "team.yaml", "cwd": cwd},
+                       server) == {"ok": True}
+
+    response = client.send({"op": "validate", "cwd": cwd, "text": """
+use: crew.yaml
+lead=crew_member:
+  name: Kirk
+  age: old
+"""}, server)
+    assert not response["ok"]
+    assert response["error"]["type"] == "ConfigurationError"
+    assert response["error"]["line"] == 5
+
+    # Changed schema files are loaded again.
+    (project / "crew.yaml").write_text("""
+crew_member:
+  name: str
+  age: int
+  rank:
+    type: str
+    default: ensign
+""")
+    response = client.send({"op": "validate", "path": "team.yaml",
+                            "cwd": cwd}, server)
+    assert response["ok"]
+    response = client.send({"op": "validate", "cwd": cwd, "text": """
+use: crew.yaml
+lead=crew_member:
+  name: Kirk
+  age: 34
+  rank: captain
+"""}, server)
+    assert response["ok"]
+
+    with pytest.raises(OSError):
+        ValidationServer(server)
+
+
+def test_server_drops_idle_namespaces(project, tmp_path):
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "crew.yaml").write_text((project / "crew.yaml").read_text())
+    (other / "team.yaml").write_text((project / "team.yaml").read_text())
+    server = ValidationServer(str(tmp_path / "hyperconf.sock"),
+                              max_namespaces=1)
+    try:
+        for cwd in [project, other, other]:
+            assert server.process({"op": "validate", "path": "team.yaml",
+                                   "cwd": str(cwd)}) == {"ok": True}
+        assert sorted(ConfigDefs._namespaces) == ["", str(other)]
+    finally:
+        server.server_close()
+
+
+def test_cli_validate(project, server, monkeypatch, capsys):
+    monkeypatch.chdir(project)
+    (project / "bad.yaml").write_text("""
+use: crew.yaml
+lead=crew_member:
+  name: Kirk
+  rank: captain
+""")
+    (project / "derived.yaml").write_text("""
+use: crew.yaml
+first=crew_member:
+  name: Kirk
+  age: 34
+lead=crew_member:
+  name: ${first.name}
+  age: ${first.age}
+""")
+    for options in [[], ["--no-server"]]:
+        argv = ["--socket", server, "validate", *options]
+        assert cli.main(argv + ["team.yaml"]) == 0
+        assert cli.main(argv + ["team.yaml", "bad.yaml"]) == 1
+        out = capsys.readouterr().out
+        assert out.startswith("bad.yaml:3: ConfigurationError: ")
+        assert cli.main(argv + ["derived.yaml"]) == 1
+        assert cli.main(argv + ["--interpolate", "derived.yaml"]) == 0
+        capsys.readouterr()
+
+    assert cli.main(["--socket", server, "stop"]) == 0
+
+
+def test_server_socket_path(tmp_path):
+    # Only socket files are replaced.
+    path = tmp_path / "notes.txt"
+    path.write_text("keep")
+    with pytest.raises(OSError):
+        ValidationServer(str(path))
+    assert path.read_text() == "keep"
+
+    link = tmp_path / "link.sock"
+    link.symlink_to(path)
+    with pytest.raises(OSError):
+        ValidationServer(str(link))
+    assert path.read_text() == "keep"
+
+    # A socket left by a server that is no longer running.
+    socket_path = str(tmp_path / "hyperconf.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    server = ValidationServer(socket_path)
+    server.server_close()
+
+
+def test_client_no_response(project, monkeypatch, capsys):
+    # A socket that accepts connections but never responds.
+    socket_path = str(project / "silent.sock")
+    silent = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with silent:
+        silent.bind(socket_path)
+        silent.listen()
+        assert client.send({"op": "ping"}, socket_path, timeout=0.1) is None
+        assert not client.ping(socket_path)
+
+        # The files are validated in process.
+        monkeypatch.chdir(project)
+        send = client.send
+        monkeypatch.setattr(client, "send", lambda request, path: send(
+            request, path, timeout=0.1))
+        assert cli.main(["--socket", socket_path, "validate",
+                         "team.yaml"]) == 0